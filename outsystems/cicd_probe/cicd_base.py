@@ -1,12 +1,10 @@
-# Python Modules
-import requests
-
 # Custom Modules
 from outsystems.exceptions.invalid_json_response import InvalidJsonResponseError
 # Variables
 from outsystems.vars.cicd_vars import PROBE_API_SSL_CERT_VERIFY
 # Functions
 from outsystems.vars.vars_base import get_configuration_value
+from outsystems.lifetime.lifetime_base import get_lifetime_client
 
 
 # Method that builds the CICD Probe endpoint based on the environment host
@@ -20,8 +18,8 @@ def send_probe_get_request(probe_api: str, probe_endpoint: str, api_key: str, ur
     request_string = "{}/{}".format(probe_api, probe_endpoint)
     # Set API key header, when provided
     headers = {"X-CICDProbe-Key": api_key} if api_key else None
-    # Send the request
-    response = requests.get(request_string, params=url_params, headers=headers, verify=get_configuration_value("PROBE_API_SSL_CERT_VERIFY", PROBE_API_SSL_CERT_VERIFY))
+    # Send the request (through the shared pooled client, so concurrent calls reuse connections)
+    response = get_lifetime_client().get(request_string, params=url_params, headers=headers, verify=get_configuration_value("PROBE_API_SSL_CERT_VERIFY", PROBE_API_SSL_CERT_VERIFY))
     response_obj = {"http_status": response.status_code, "response": {}}
     if len(response.text) > 0:
         try:
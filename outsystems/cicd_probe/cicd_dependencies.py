@@ -1,16 +1,28 @@
 # Python Modules
-from toposort import toposort_flatten, CircularDependencyError
+import os
 
 # Custom Modules
 # Functions
 from outsystems.cicd_probe.cicd_base import send_probe_get_request
+from outsystems.cicd_probe.cicd_dependency_graph import DependencyGraph
+from outsystems.file_helpers.file import store_data, load_data
 # Variables
 from outsystems.vars.cicd_vars import GET_APPLICATION_DEPENDENCIES_ENDPOINT, PROBE_DEPENDENCIES_SUCCESS_CODE
+from outsystems.vars.file_vars import PROBE_APPLICATION_DEPENDENCIES_FILE, PROBE_FOLDER
 
 
 # Get a set of applications which are producers for a specified application version.
+# The producers of an application version never change, so they are cached by version key under the probe folder
+# and reused by every later call (in this or any other pipeline step sharing the artifacts folder).
 def get_app_dependencies(artifact_dir: str, probe_endpoint: str, api_key: str, application_version_key: str,
                          application_name: str, application_version: str):
+    filename = os.path.join(PROBE_FOLDER, "{}{}".format(application_version_key, PROBE_APPLICATION_DEPENDENCIES_FILE))
+    try:
+        return set(load_data(artifact_dir, filename)["Producers"])
+    except (FileNotFoundError, ValueError, KeyError):
+        # Not cached yet (or unreadable), ask the probe
+        pass
+
     # Builds the API params
     params = {"ApplicationName": application_name, "ApplicationVersion": application_version}
 
@@ -24,6 +36,9 @@ def get_app_dependencies(artifact_dir: str, probe_endpoint: str, api_key: str, a
         dependencies_list = []
         for dependency in response:
             dependencies_list.append(dependency["ApplicationKey"])
+        # Stores the result
+        store_data(artifact_dir, filename, {"ApplicationName": application_name, "ApplicationVersion": application_version,
+                                            "Producers": sorted(set(dependencies_list))})
         return set(dependencies_list)
     else:
         raise NotImplementedError(
@@ -31,9 +46,12 @@ def get_app_dependencies(artifact_dir: str, probe_endpoint: str, api_key: str, a
 
 
 # Topological ordering (linear ordering) of a dependency list
+# Raises DependencyCycleError (a CircularDependencyError) with the applications in each cycle
 def sort_app_dependencies(dep_list: list):
-    try:
-        return toposort_flatten(dep_list)
-    except:
-        raise CircularDependencyError(
-            "There are circular dependencies among the list of applications.")
+    return DependencyGraph(dep_list).get_order()
+
+
+# Topological ordering of a dependency list, by levels: each level only depends on the previous ones, so the
+# applications within a level are independent of each other. Each level is sorted, for a stable order.
+def sort_app_dependencies_by_level(dep_list: list):
+    return DependencyGraph(dep_list).get_levels()
@@ -0,0 +1,184 @@
+# Python Modules
+import os
+
+# Custom Modules
+# Exceptions
+from outsystems.exceptions.dependency_cycle import DependencyCycleError
+# Functions
+from outsystems.file_helpers.file import store_data, load_data
+# Variables
+from outsystems.vars.file_vars import PROBE_FOLDER, PROBE_DEPENDENCY_GRAPH_FILE
+
+
+# Application dependency graph: each application (key) maps to the set of its producers (keys). Producers that are not
+# keys themselves are nodes without dependencies. Applications are sorted by levels with Kahn's algorithm (O(V+E)):
+# level 0 has no dependencies and every other level only depends on previous ones.
+# Levels are kept between sorts: update() only re-sorts the applications whose dependencies changed and their
+# (transitive) consumers.
+class DependencyGraph:
+    def __init__(self, dependencies: dict = None):
+        self.producers = {}
+        self.consumers = {}
+        self.levels_by_node = {}
+        if dependencies:
+            self.update(dependencies)
+
+    # Replaces the graph with the given dependencies, re-sorting only what changed.
+    # Raises DependencyCycleError (and leaves the graph unchanged) if the new dependencies have cycles.
+    def update(self, dependencies: dict):
+        new_producers = {node: set(producers) for node, producers in dependencies.items()}
+        for producers in list(new_producers.values()):
+            for producer in producers:
+                new_producers.setdefault(producer, set())
+        changed = {node for node in new_producers if self.producers.get(node) != new_producers[node]}
+        removed = set(self.producers) - set(new_producers)
+
+        # Changed nodes and everything downstream of a changed or removed node need a new level
+        new_consumers = _reverse(new_producers)
+        affected = set()
+        pending = list(changed) + [consumer for node in removed for consumer in self.consumers.get(node, ())]
+        while pending:
+            node = pending.pop()
+            if node in affected or node not in new_producers:
+                continue
+            affected.add(node)
+            pending.extend(new_consumers.get(node, ()))
+
+        levels_by_node = {node: level for node, level in self.levels_by_node.items() if node in new_producers and node not in affected}
+        levels_by_node.update(_kahn_levels(new_producers, new_consumers, affected, levels_by_node))
+        self.producers = new_producers
+        self.consumers = new_consumers
+        self.levels_by_node = levels_by_node
+        return sorted(affected)
+
+    # Returns the levels: lists of nodes (sorted) that only depend on nodes of previous levels
+    def get_levels(self):
+        levels = []
+        for node, level in self.levels_by_node.items():
+            while len(levels) <= level:
+                levels.append([])
+            levels[level].append(node)
+        return [sorted(level) for level in levels]
+
+    # Returns the flat topological order (level by level)
+    def get_order(self):
+        return [node for level in self.get_levels() for node in level]
+
+    def to_dict(self):
+        return {"Producers": {node: sorted(producers) for node, producers in self.producers.items()}, "Levels": self.levels_by_node}
+
+    @staticmethod
+    def from_dict(data: dict):
+        graph = DependencyGraph()
+        graph.producers = {node: set(producers) for node, producers in data["Producers"].items()}
+        graph.consumers = _reverse(graph.producers)
+        graph.levels_by_node = dict(data["Levels"])
+        return graph
+
+
+# Maps a list of application keys (e.g. a topological order) to their OAP entries, keeping the order.
+# Keys without an OAP entry (producers that are not being deployed) are left out.
+def map_keys_to_oap(app_keys: list, app_oap_list: list):
+    oap_by_key = {}
+    for app_oap in app_oap_list:
+        oap_by_key.setdefault(app_oap["app_key"], []).append(app_oap)
+    return [app_oap for app_key in app_keys for app_oap in oap_by_key.get(app_key, [])]
+
+
+# Loads the dependency graph sorted in a previous run (or step), or an empty one
+def load_dependency_graph(artifact_dir: str):
+    try:
+        return DependencyGraph.from_dict(load_data(artifact_dir, os.path.join(PROBE_FOLDER, PROBE_DEPENDENCY_GRAPH_FILE)))
+    except (FileNotFoundError, ValueError, KeyError):
+        return DependencyGraph()
+
+
+# Stores the dependency graph, so the next run only needs to re-sort what changed
+def store_dependency_graph(artifact_dir: str, graph: DependencyGraph):
+    store_data(artifact_dir, os.path.join(PROBE_FOLDER, PROBE_DEPENDENCY_GRAPH_FILE), graph.to_dict())
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+def _reverse(producers: dict):
+    consumers = {}
+    for node, node_producers in producers.items():
+        for producer in node_producers:
+            consumers.setdefault(producer, set()).add(node)
+    return consumers
+
+
+# Kahn's algorithm over the nodes to sort, given the (fixed) levels of every other node
+def _kahn_levels(producers: dict, consumers: dict, nodes: set, fixed_levels: dict):
+    levels = {}
+    # In-degree counts only producers that still have to be sorted
+    in_degree = {node: sum(1 for producer in producers[node] if producer in nodes) for node in nodes}
+    ready = [node for node, degree in in_degree.items() if degree == 0]
+    while ready:
+        node = ready.pop()
+        levels[node] = max([levels.get(producer, fixed_levels.get(producer, -1)) + 1 for producer in producers[node]], default=0)
+        for consumer in consumers.get(node, ()):
+            if consumer in in_degree:
+                in_degree[consumer] -= 1
+                if in_degree[consumer] == 0:
+                    ready.append(consumer)
+    if len(levels) < len(nodes):
+        raise _cycle_error(producers, {node for node in nodes if node not in levels})
+    return levels
+
+
+# Builds the error for the nodes left by Kahn's algorithm: those in cycles (strongly connected components with more
+# than one node, or a node depending on itself) and those only downstream of a cycle, which are not reported
+def _cycle_error(producers: dict, nodes: set):
+    cycles = [sorted(component) for component in _strongly_connected_components(producers, nodes)
+              if len(component) > 1 or next(iter(component)) in producers[next(iter(component))]]
+    cycles.sort()
+    members = {node for cycle in cycles for node in cycle}
+    data = {node: {producer for producer in producers[node] if producer in members} for node in sorted(members)}
+    return DependencyCycleError(cycles, data)
+
+
+# Tarjan's algorithm (iterative, so deep graphs don't hit the recursion limit) over a subset of the nodes
+def _strongly_connected_components(producers: dict, nodes: set):
+    index = {}
+    low_link = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+    for root in sorted(nodes):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(producers[root] & nodes)))]
+        index[root] = low_link[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, edges = work[-1]
+            advanced = False
+            for producer in edges:
+                if producer not in index:
+                    index[producer] = low_link[producer] = counter
+                    counter += 1
+                    stack.append(producer)
+                    on_stack.add(producer)
+                    work.append((producer, iter(sorted(producers[producer] & nodes))))
+                    advanced = True
+                    break
+                elif producer in on_stack:
+                    low_link[node] = min(low_link[node], index[producer])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                low_link[work[-1][0]] = min(low_link[work[-1][0]], low_link[node])
+            if low_link[node] == index[node]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
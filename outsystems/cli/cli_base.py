@@ -0,0 +1,79 @@
+# Python Modules
+import os
+import sys
+import runpy
+
+# Custom Modules
+# Functions
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.cli_vars import DAEMON_STATE_FILE, DAEMON_FORWARDING_ENABLED
+
+# Pipeline scripts available as subcommands: name -> (module, description).
+# Modules are only imported when their subcommand runs, so the startup cost is the one of that script alone.
+PIPELINE_COMMANDS = {
+    "apply_configuration_values_to_target_env": ("outsystems.pipeline.apply_configuration_values_to_target_env", "Apply the configuration values of a trigger manifest to a target environment."),
+    "continue_deployment_to_target_env": ("outsystems.pipeline.continue_deployment_to_target_env", "Continue a deployment plan waiting for user intervention."),
+    "deploy_apps_to_target_env_with_airgap": ("outsystems.pipeline.deploy_apps_to_target_env_with_airgap", "Deploy application packages to an air-gapped environment with the OSP Tool."),
+    "deploy_latest_tags_to_target_env": ("outsystems.pipeline.deploy_latest_tags_to_target_env", "Deploy the latest tagged versions of applications to a target environment."),
+    "deploy_specific_tags_to_target_env": ("outsystems.pipeline.deploy_specific_tags_to_target_env", "Deploy specific tagged versions of applications to a target environment."),
+    "deploy_tags_to_target_env_with_manifest": ("outsystems.pipeline.deploy_tags_to_target_env_with_manifest", "Deploy the application versions of a trigger manifest to a target environment."),
+    "evaluate_test_results": ("outsystems.pipeline.evaluate_test_results", "Run the BDD test endpoints and write the results in JUnit format."),
+    "fetch_apps_packages": ("outsystems.pipeline.fetch_apps_packages", "Download the application packages (OAP) of the applications to deploy."),
+    "fetch_lifetime_data": ("outsystems.pipeline.fetch_lifetime_data", "Cache the LifeTime applications and environments data."),
+    "fetch_tech_debt": ("outsystems.pipeline.fetch_tech_debt", "Fetch the technical debt of applications from AI Mentor Studio."),
+    "gc_package_store": ("outsystems.pipeline.gc_package_store", "Remove old packages from the local package store."),
+    "generate_unit_testing_assembly": ("outsystems.pipeline.generate_unit_testing_assembly", "Generate the list of BDD test endpoints of the applications."),
+    "scan_test_endpoints": ("outsystems.pipeline.scan_test_endpoints", "Find the BDD test endpoints of the applications with the CI/CD Probe."),
+    "start_deployment_to_target_env": ("outsystems.pipeline.start_deployment_to_target_env", "Start the saved deployment plan of a target environment."),
+    "tag_apps_based_on_manifest_data": ("outsystems.pipeline.tag_apps_based_on_manifest_data", "Tag applications with the versions of a deployment or trigger manifest."),
+    "tag_modified_apps": ("outsystems.pipeline.tag_modified_apps", "Tag the applications modified in an environment."),
+}
+PROGRAM_NAME = "outsystems-pipeline"
+
+
+# Entry point of the outsystems-pipeline command: outsystems-pipeline <command> [script arguments].
+# The script runs as if it was called directly (python -m outsystems.pipeline.<command>), with the remaining arguments.
+# When the pipeline daemon is running (outsystems-pipeline serve), the script runs there instead.
+# Subcommands may also be written with dashes, e.g. fetch-lifetime-data.
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 0 or argv[0] in ("-h", "--help"):
+        _print_usage()
+        return 0 if argv else 2
+
+    if argv[0] == "serve":
+        from outsystems.cli.cli_daemon import serve_main
+        return serve_main(argv[1:])
+
+    command = argv[0].replace("-", "_")
+    if command not in PIPELINE_COMMANDS:
+        print("{}: unknown command '{}'.".format(PROGRAM_NAME, argv[0]), file=sys.stderr)
+        _print_usage(sys.stderr)
+        return 2
+
+    # The daemon client is only loaded when a daemon was started
+    if get_configuration_value("DAEMON_FORWARDING_ENABLED", DAEMON_FORWARDING_ENABLED) and \
+            os.path.isfile(get_configuration_value("DAEMON_STATE_FILE", DAEMON_STATE_FILE)):
+        from outsystems.cli.cli_daemon import forward_to_daemon
+        exit_code = forward_to_daemon(command, argv[1:])
+        if exit_code is not None:
+            return exit_code
+
+    # The script reads its arguments from sys.argv, with the command in the program name for its usage messages
+    sys.argv = ["{} {}".format(PROGRAM_NAME, command)] + argv[1:]
+    runpy.run_module(PIPELINE_COMMANDS[command][0], run_name="__main__")
+    return 0
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+def _print_usage(file=sys.stdout):
+    print("usage: {} <command> [arguments]\n\nCommands:".format(PROGRAM_NAME), file=file)
+    for command, (_, description) in PIPELINE_COMMANDS.items():
+        print("  {:<42} {}".format(command, description), file=file)
+    print("  {:<42} {}".format("serve", "Run the scripts above in a long-running process, with warm caches and connections."), file=file)
+    print("\nRun '{} <command> --help' for the arguments of a command.".format(PROGRAM_NAME), file=file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
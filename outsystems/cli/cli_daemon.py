@@ -0,0 +1,296 @@
+# Python Modules
+import argparse
+import http.client
+import io
+import json
+import os
+import runpy
+import secrets
+import signal
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Custom Modules
+# Functions
+from outsystems.cli.cli_base import PIPELINE_COMMANDS, PROGRAM_NAME
+from outsystems.coordinator.coordinator_base import release_held_tickets
+from outsystems.coordinator.coordinator_batching import fail_open_batches
+from outsystems.vars.vars_base import get_configuration_value, load_configuration_file
+# Variables
+from outsystems.vars.cli_vars import DAEMON_STATE_FILE, DAEMON_HOST, DAEMON_PORT, DAEMON_CONNECT_TIMEOUT_IN_SECS
+
+_RUN_PATH = "/run"
+_SHUTDOWN_PATH = "/shutdown"
+_TOKEN_HEADER = "X-Pipeline-Token"
+
+
+# Runs the pipeline scripts in a long-running process, so the state kept by the modules stays warm between pipeline
+# stages: the LifeTime connection pool, the name/key lookup indexes, the deployments known to be finished and the
+# dependency caches. Scripts are sent by the outsystems-pipeline command over a local HTTP API and run one at a time,
+# with the arguments, working directory and environment of the caller. Their output is streamed back as they run.
+# Scripts sent while another one is running are refused (503), and the caller runs them in its own process instead
+# of waiting for the daemon.
+# Only clients with the access token (written to the state file, readable by the daemon user only) are accepted.
+class PipelineDaemon:
+    def __init__(self, host: str, port: int, state_file: str):
+        self.state_file = state_file
+        self.token = secrets.token_hex(16)
+        self.scripts_run = 0
+        # Reentrant: the request handler reserves the daemon before calling run_script
+        self._run_lock = threading.RLock()
+        self._server = ThreadingHTTPServer((host, port), _build_handler(self))
+        self._server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    # Serves until shutdown is called, advertising the daemon in the state file meanwhile
+    def serve_forever(self):
+        host, port = self.address
+        _write_state_file(self.state_file, {"host": host, "port": port, "token": self.token, "pid": os.getpid()})
+        print("Pipeline daemon listening on {}:{}.".format(host, port), flush=True)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            _remove_state_file(self.state_file, self.token)
+
+    def shutdown(self):
+        self._server.shutdown()
+
+    # Runs a pipeline script as if it was called directly, writing its output to stdout and stderr.
+    # The global state a script may change (arguments, working directory, environment, module path) is restored
+    # afterwards. Returns the exit code of the script.
+    def run_script(self, command: str, args: list, cwd: str, env: dict, stdout, stderr):
+        with self._run_lock:
+            saved_argv, saved_path, saved_env, saved_cwd = sys.argv, list(sys.path), dict(os.environ), os.getcwd()
+            saved_stdout, saved_stderr = sys.stdout, sys.stderr
+            try:
+                os.chdir(cwd)
+                os.environ.clear()
+                os.environ.update(env)
+                sys.argv = ["{} {}".format(PROGRAM_NAME, command)] + args
+                sys.stdout, sys.stderr = stdout, stderr
+                try:
+                    runpy.run_module(PIPELINE_COMMANDS[command][0], run_name="__main__")
+                    exit_code = 0
+                except SystemExit as error:
+                    exit_code = _get_exit_code(error)
+                except Exception:
+                    traceback.print_exc()
+                    exit_code = 1
+                finally:
+                    # What the exit handlers would do if the script ran in its own process
+                    fail_open_batches()
+                    release_held_tickets()
+            finally:
+                sys.argv, sys.path[:] = saved_argv, saved_path
+                sys.stdout, sys.stderr = saved_stdout, saved_stderr
+                os.environ.clear()
+                os.environ.update(saved_env)
+                os.chdir(saved_cwd)
+                self.scripts_run += 1
+            return exit_code
+
+
+# Runs a pipeline script in the daemon, if it's running, with the arguments, working directory and environment of
+# this process, and writes its output here. Returns the exit code, or None if there's no daemon to forward to.
+def forward_to_daemon(command: str, args: list):
+    # Bound now: the output must reach the streams of the caller, whatever the script does with sys.stdout
+    stdout, stderr = sys.stdout, sys.stderr
+    state = _load_state_file(get_configuration_value("DAEMON_STATE_FILE", DAEMON_STATE_FILE))
+    if state is None:
+        return None
+    body = json.dumps({"command": command, "args": args, "cwd": os.getcwd(), "env": dict(os.environ)})
+    conn = http.client.HTTPConnection(state["host"], state["port"], timeout=get_configuration_value("DAEMON_CONNECT_TIMEOUT_IN_SECS", DAEMON_CONNECT_TIMEOUT_IN_SECS))
+    try:
+        conn.connect()
+        # Scripts may run for a long time (the daemon refuses them right away when it's busy)
+        conn.sock.settimeout(None)
+        conn.request("POST", _RUN_PATH, body, {_TOKEN_HEADER: state["token"], "Content-Type": "application/json"})
+        response = conn.getresponse()
+    except OSError:
+        # Left behind by a daemon that didn't stop cleanly
+        conn.close()
+        return None
+    try:
+        if response.status == 503:
+            print("The pipeline daemon is busy running another script. Running it locally.", file=stderr, flush=True)
+            return None
+        if response.status != 200:
+            print("The pipeline daemon refused the script ({} {}). Running it locally.".format(response.status, response.reason), file=stderr, flush=True)
+            return None
+        for line in response:
+            message = json.loads(line)
+            if "exit_code" in message:
+                return message["exit_code"]
+            stream = stdout if message["stream"] == "stdout" else stderr
+            stream.write(message["data"])
+            stream.flush()
+        print("Lost the connection to the pipeline daemon before the script finished.", file=stderr, flush=True)
+        return 1
+    finally:
+        conn.close()
+
+
+# Entry point of outsystems-pipeline serve
+def serve_main(argv: list):
+    parser = argparse.ArgumentParser(prog="{} serve".format(PROGRAM_NAME),
+                                     description="Run the pipeline scripts in a long-running process, with warm caches and connections.")
+    parser.add_argument("-p", "--port", type=int,
+                        help="(optional) Local port to listen on. Default: any free port.")
+    parser.add_argument("--stop", action="store_true",
+                        help="(optional) Stop the running daemon.")
+    parser.add_argument("-cf", "--config_file", type=str,
+                        help="(optional) Config file path. Contains configuration values to override the default ones.")
+    args = parser.parse_args(argv)
+
+    # Load config file if exists
+    if args.config_file:
+        load_configuration_file(args.config_file)
+    state_file = get_configuration_value("DAEMON_STATE_FILE", DAEMON_STATE_FILE)
+
+    if args.stop:
+        return _stop_daemon(state_file)
+
+    state = _load_state_file(state_file)
+    if state is not None and _is_daemon_alive(state):
+        print("A pipeline daemon is already running on {}:{}.".format(state["host"], state["port"]), file=sys.stderr, flush=True)
+        return 1
+    port = args.port if args.port is not None else get_configuration_value("DAEMON_PORT", DAEMON_PORT)
+    daemon = PipelineDaemon(get_configuration_value("DAEMON_HOST", DAEMON_HOST), port, state_file)
+    # Stop cleanly (removing the state file) when the agent stops the daemon
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=daemon.shutdown, daemon=True).start())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("Pipeline daemon stopped after running {} script(s).".format(daemon.scripts_run), flush=True)
+    return 0
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Writes the messages of one output stream of a script to the client, one JSON line per write
+class _StreamWriter(io.TextIOBase):
+    def __init__(self, wfile, stream: str, lock: threading.Lock):
+        self.wfile = wfile
+        self.stream = stream
+        self.lock = lock
+        self.disconnected = False
+
+    def writable(self):
+        return True
+
+    def write(self, text: str):
+        if text and not self.disconnected:
+            try:
+                with self.lock:
+                    self.wfile.write((json.dumps({"stream": self.stream, "data": text}) + "\n").encode())
+                    self.wfile.flush()
+            except OSError:
+                # The client is gone: the script carries on, its output is dropped
+                self.disconnected = True
+        return len(text)
+
+
+def _build_handler(daemon: PipelineDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not secrets.compare_digest(self.headers.get(_TOKEN_HEADER, ""), daemon.token):
+                self.send_error(403, "Invalid access token")
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == _SHUTDOWN_PATH:
+                self.send_response(204)
+                self.end_headers()
+                threading.Thread(target=daemon.shutdown, daemon=True).start()
+            elif self.path == _RUN_PATH:
+                request = json.loads(body)
+                if request.get("command") not in PIPELINE_COMMANDS:
+                    self.send_error(400, "Unknown command")
+                    return
+                # One script at a time: the caller runs it locally rather than waiting for the running one
+                if not daemon._run_lock.acquire(blocking=False):
+                    self.send_error(503, "Busy running another script")
+                    return
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    lock = threading.Lock()
+                    exit_code = daemon.run_script(request["command"], request["args"], request["cwd"], request["env"],
+                                                  _StreamWriter(self.wfile, "stdout", lock), _StreamWriter(self.wfile, "stderr", lock))
+                finally:
+                    daemon._run_lock.release()
+                try:
+                    self.wfile.write((json.dumps({"exit_code": exit_code}) + "\n").encode())
+                except OSError:
+                    pass
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _get_exit_code(error: SystemExit):
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    # sys.exit("message") prints the message and exits with 1
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+def _write_state_file(state_file: str, state: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+    # Readable by the daemon user only, since the token gives access to the daemon
+    fd = os.open(state_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as outfile:
+        json.dump(state, outfile)
+
+
+def _load_state_file(state_file: str):
+    try:
+        with open(state_file) as infile:
+            return json.load(infile)
+    except (OSError, ValueError):
+        return None
+
+
+# Removes the state file, unless another daemon took it over
+def _remove_state_file(state_file: str, token: str):
+    state = _load_state_file(state_file)
+    if state is not None and state["token"] == token:
+        os.remove(state_file)
+
+
+def _is_daemon_alive(state: dict):
+    try:
+        conn = http.client.HTTPConnection(state["host"], state["port"], timeout=get_configuration_value("DAEMON_CONNECT_TIMEOUT_IN_SECS", DAEMON_CONNECT_TIMEOUT_IN_SECS))
+        conn.connect()
+        conn.close()
+        return True
+    except OSError:
+        return False
+
+
+def _stop_daemon(state_file: str):
+    state = _load_state_file(state_file)
+    if state is None or not _is_daemon_alive(state):
+        print("There's no pipeline daemon running.", file=sys.stderr, flush=True)
+        return 1
+    conn = http.client.HTTPConnection(state["host"], state["port"], timeout=get_configuration_value("DAEMON_CONNECT_TIMEOUT_IN_SECS", DAEMON_CONNECT_TIMEOUT_IN_SECS))
+    try:
+        conn.request("POST", _SHUTDOWN_PATH, headers={_TOKEN_HEADER: state["token"]})
+        conn.getresponse().read()
+    finally:
+        conn.close()
+    print("Pipeline daemon on {}:{} stopped.".format(state["host"], state["port"]), flush=True)
+    return 0
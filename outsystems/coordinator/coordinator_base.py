@@ -0,0 +1,239 @@
+# Python Modules
+import atexit
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Custom Modules
+# Exceptions
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
+# Functions
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.coordinator_vars import COORDINATOR_ENABLED, COORDINATOR_DB_FILE, COORDINATOR_POLL_INTERVAL_IN_SECS, \
+    COORDINATOR_HEARTBEAT_IN_SECS, COORDINATOR_STALE_AFTER_IN_SECS
+from outsystems.vars.pipeline_vars import QUEUE_TIMEOUT_IN_SECS, SLEEP_PERIOD_IN_SECS, DEPLOYMENT_TERMINAL_STATUS_LIST
+
+# One row per pipeline waiting for (or holding) a target environment. The lowest id of an environment holds it.
+# Timestamps are wall clock (time.time), since they are compared across processes and hosts.
+_QUEUE_SCHEMA = """CREATE TABLE IF NOT EXISTS deployment_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    env_key TEXT NOT NULL,
+    owner TEXT NOT NULL UNIQUE,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    description TEXT,
+    enqueued_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL)"""
+
+# Tickets held by this process, released when it exits
+_held_tickets = set()
+# Notified on every change, so waiters in the same process don't wait for the next poll
+_changed = threading.Condition()
+_coordinators = {}
+_coordinators_lock = threading.Lock()
+
+
+# FIFO queue per target environment key, stored in a SQLite database. Pipelines that share the database file (e.g.
+# agents with a common workspace volume) take turns to deploy to an environment instead of racing to create their plans.
+# Waiters only read the local database: the holder releases its turn when its deployment reaches a terminal status.
+class DeploymentCoordinator:
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self.poll_interval = get_configuration_value("COORDINATOR_POLL_INTERVAL_IN_SECS", COORDINATOR_POLL_INTERVAL_IN_SECS)
+        self.heartbeat_interval = get_configuration_value("COORDINATOR_HEARTBEAT_IN_SECS", COORDINATOR_HEARTBEAT_IN_SECS)
+        self.stale_after = get_configuration_value("COORDINATOR_STALE_AFTER_IN_SECS", COORDINATOR_STALE_AFTER_IN_SECS)
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        with self.transaction() as conn:
+            conn.execute(_QUEUE_SCHEMA)
+
+    # Joins the queue of a target environment. The ticket keeps its place (heartbeat) until it's released.
+    def enqueue(self, env_key: str, description: str = None):
+        now = time.time()
+        owner = "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+        with self.transaction() as conn:
+            ticket_id = conn.execute(
+                "INSERT INTO deployment_queue (env_key, owner, host, pid, description, enqueued_at, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (env_key, owner, socket.gethostname(), os.getpid(), description, now, now)).lastrowid
+        return DeploymentTicket(self, ticket_id, env_key, owner)
+
+    # Waits for the turn of this pipeline to deploy to a target environment and returns its ticket.
+    # Raises DeploymentTimeoutError (and leaves the queue) if the turn doesn't come within the timeout.
+    # abandon_if is checked while waiting: when it returns True the pipeline leaves the queue and None is returned.
+    def acquire(self, env_key: str, timeout: int, description: str = None, abandon_if=None):
+        return self.wait_for_turn(self.enqueue(env_key, description), timeout, abandon_if)
+
+    # Waits for the turn of a ticket taken with enqueue (see acquire). The ticket is released if it times out.
+    def wait_for_turn(self, ticket, timeout: int, abandon_if=None):
+        env_key = ticket.env_key
+        started_at = time.monotonic()
+        last_progress = 0
+        try:
+            while True:
+                position = ticket.get_position()
+                if position == 0:
+                    return ticket
+                if abandon_if is not None and abandon_if():
+                    ticket.release()
+                    return None
+                elapsed = time.monotonic() - started_at
+                if elapsed >= timeout:
+                    raise DeploymentTimeoutError("Timeout of {} secs reached while queued for environment {}.".format(timeout, env_key))
+                if elapsed - last_progress >= get_configuration_value("SLEEP_PERIOD_IN_SECS", SLEEP_PERIOD_IN_SECS):
+                    last_progress = elapsed
+                    print("Waiting for {} queued pipeline(s) to finish deploying. Elapsed time: {} seconds...".format(position, int(elapsed)), flush=True)
+                self.wait(min(self.poll_interval, timeout - elapsed))
+        except:
+            ticket.release()
+            raise
+
+    # Returns the queue of a target environment, holder first
+    def get_queue(self, env_key: str):
+        with self.transaction() as conn:
+            self._purge_stale(conn)
+            rows = conn.execute("SELECT id, owner, description, enqueued_at FROM deployment_queue WHERE env_key = ? ORDER BY id",
+                                (env_key,)).fetchall()
+        return [{"id": row[0], "owner": row[1], "description": row[2], "enqueued_at": row[3]} for row in rows]
+
+    # Sleeps for up to timeout secs, or less if something changed in this process (see notify)
+    def wait(self, timeout: float):
+        with _changed:
+            _changed.wait(timeout)
+
+    # Wakes up the waiters of this process (the others see the change on their next poll)
+    def notify(self):
+        with _changed:
+            _changed.notify_all()
+
+    # Runs statements in a write transaction, taken up front so concurrent pipelines see a consistent queue
+    @contextmanager
+    def transaction(self):
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    # Drops entries of pipelines that are gone: no heartbeat for a while, or a dead process on this host
+    def _purge_stale(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM deployment_queue WHERE heartbeat_at < ?", (time.time() - self.stale_after,))
+        host = socket.gethostname()
+        for row_id, pid in conn.execute("SELECT id, pid FROM deployment_queue WHERE host = ?", (host,)).fetchall():
+            if not _is_process_alive(pid):
+                conn.execute("DELETE FROM deployment_queue WHERE id = ?", (row_id,))
+
+
+# Place of a pipeline in the queue of a target environment
+class DeploymentTicket:
+    def __init__(self, coordinator: DeploymentCoordinator, ticket_id: int, env_key: str, owner: str):
+        self.coordinator = coordinator
+        self.ticket_id = ticket_id
+        self.env_key = env_key
+        self.owner = owner
+        self.released = False
+        self._stop_heartbeat = threading.Event()
+        with _coordinators_lock:
+            _held_tickets.add(self)
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+
+    # Returns the number of pipelines ahead in the queue (0 means this one holds the environment)
+    def get_position(self):
+        with self.coordinator.transaction() as conn:
+            self.coordinator._purge_stale(conn)
+            if conn.execute("SELECT 1 FROM deployment_queue WHERE id = ?", (self.ticket_id,)).fetchone() is None:
+                # Dropped as stale (e.g. the process was suspended for too long): go back to the end of the queue
+                now = time.time()
+                self.ticket_id = conn.execute(
+                    "INSERT INTO deployment_queue (env_key, owner, host, pid, enqueued_at, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.env_key, self.owner, socket.gethostname(), os.getpid(), now, now)).lastrowid
+            return conn.execute("SELECT COUNT(*) FROM deployment_queue WHERE env_key = ? AND id < ?",
+                                (self.env_key, self.ticket_id)).fetchone()[0]
+
+    # Leaves the queue (or frees the environment for the next pipeline)
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self._stop_heartbeat.set()
+        with self.coordinator.transaction() as conn:
+            conn.execute("DELETE FROM deployment_queue WHERE owner = ?", (self.owner,))
+        with _coordinators_lock:
+            _held_tickets.discard(self)
+        self.coordinator.notify()
+
+    # DeploymentWatcher transition callback: the environment is free once the deployment plan reaches a terminal status
+    def on_deployment_transition(self, old_status: str, new_status: str, dep_status: dict):
+        if new_status in DEPLOYMENT_TERMINAL_STATUS_LIST:
+            self.release()
+
+    def _heartbeat(self):
+        while not self._stop_heartbeat.wait(self.coordinator.heartbeat_interval):
+            try:
+                with self.coordinator.transaction() as conn:
+                    conn.execute("UPDATE deployment_queue SET heartbeat_at = ? WHERE owner = ?", (time.time(), self.owner))
+            except sqlite3.Error:
+                # Busy or unavailable database: try again on the next beat
+                continue
+
+
+# Returns the configured coordinator, or None if it's not enabled
+def get_deployment_coordinator():
+    if not get_configuration_value("COORDINATOR_ENABLED", COORDINATOR_ENABLED):
+        return None
+    db_file = get_configuration_value("COORDINATOR_DB_FILE", COORDINATOR_DB_FILE)
+    with _coordinators_lock:
+        if db_file not in _coordinators:
+            _coordinators[db_file] = DeploymentCoordinator(db_file)
+        return _coordinators[db_file]
+
+
+# Waits for the turn of this pipeline to deploy to a target environment, when a coordinator is enabled.
+# Returns the ticket to release (it's released at exit anyway) or None if there's no coordinator.
+def acquire_deployment_slot(dest_env_key: str, description: str = None, timeout: int = None):
+    coordinator = get_deployment_coordinator()
+    if coordinator is None:
+        return None
+    if timeout is None:
+        timeout = get_configuration_value("QUEUE_TIMEOUT_IN_SECS", QUEUE_TIMEOUT_IN_SECS)
+    return coordinator.acquire(dest_env_key, timeout, description)
+
+
+# Frees the environments still held when the pipeline exits (e.g. sys.exit before the deployment finished).
+# Also called by the pipeline daemon at the end of each script, since its process doesn't exit.
+@atexit.register
+def release_held_tickets():
+    with _coordinators_lock:
+        tickets = list(_held_tickets)
+    for ticket in tickets:
+        try:
+            ticket.release()
+        except sqlite3.Error:
+            # Left for the stale entries cleanup
+            continue
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+def _is_process_alive(pid: int):
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill would terminate it: rely on the heartbeat instead
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
@@ -0,0 +1,219 @@
+# Python Modules
+import atexit
+import json
+import threading
+import time
+
+# Custom Modules
+# Exceptions
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
+# Functions
+from outsystems.coordinator.coordinator_base import DeploymentCoordinator, get_deployment_coordinator, acquire_deployment_slot
+from outsystems.vars.vars_base import get_configuration_value
+from outsystems.versioning.versioning_base import parse_version_tag
+# Variables
+from outsystems.vars.coordinator_vars import COORDINATOR_BATCH_WINDOW_IN_SECS
+from outsystems.vars.pipeline_vars import QUEUE_TIMEOUT_IN_SECS, DEPLOYMENT_TIMEOUT_IN_SECS, DEPLOYMENT_TERMINAL_STATUS_LIST, \
+    DEPLOYMENT_ERROR_STATUS_LIST
+
+# One row per pipeline request to deploy applications. Pending requests are claimed by the pipeline whose turn comes
+# (the batch leader), which deploys them together and writes back the result of each one. owner is the queue ticket of
+# the requesting pipeline: a pending request whose ticket left the queue belongs to a pipeline that is gone.
+_PLAN_REQUESTS_SCHEMA = """CREATE TABLE IF NOT EXISTS plan_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    env_key TEXT NOT NULL,
+    source_env_key TEXT NOT NULL,
+    lt_api_version INTEGER NOT NULL,
+    applications TEXT NOT NULL,
+    dep_note TEXT,
+    owner TEXT,
+    state TEXT NOT NULL,
+    leader TEXT,
+    result TEXT,
+    created_at REAL NOT NULL)"""
+_PENDING_STATE = "pending"
+_BATCHED_STATE = "batched"
+_FINISHED_STATE = "finished"
+
+# Batches led by this process and not finished yet, failed when it exits so their pipelines don't wait in vain
+_open_batches = set()
+_open_batches_lock = threading.Lock()
+
+
+# A deployment plan shared by several pipeline requests to the same target environment.
+# The leader creates the plan with the merged applications (app_keys, app_names, dep_note) and reports back to every
+# request once it's over. The other pipelines (followers) only wait for the result of their own request.
+class PlanBatch:
+    def __init__(self, coordinator: DeploymentCoordinator, env_key: str, request_id: int, requests: list = None, leader: str = None):
+        self.coordinator = coordinator
+        self.env_key = env_key
+        self.request_id = request_id
+        self.requests = requests or []
+        self.leader = leader
+        self.is_leader = requests is not None
+        self.app_keys, self.app_names, self.applications = merge_plan_requests(self.requests)
+        self.dep_note = " | ".join(dict.fromkeys(request["dep_note"] for request in self.requests if request["dep_note"]))
+        # Set by the leader once the deployment plan is created
+        self.deployment_key = None
+        self.finished = False
+        if self.is_leader:
+            with _open_batches_lock:
+                _open_batches.add(self)
+
+    # Leader: writes back the result of every request in the batch
+    def complete(self, dep_status: dict, error: str = None):
+        if self.finished:
+            return
+        self.finished = True
+        with self.coordinator.transaction() as conn:
+            for request in self.requests:
+                result = {"DeploymentKey": self.deployment_key,
+                          "DeploymentStatus": dep_status["DeploymentStatus"] if dep_status else None,
+                          "Details": dep_status, "Error": error,
+                          "Applications": [{"Name": app["Name"], "RequestedVersion": app["Version"], "DeployedVersion": self.applications[app["Key"]]["Version"]}
+                                           for app in request["applications"]]}
+                conn.execute("UPDATE plan_requests SET state = ?, result = ? WHERE id = ?", (_FINISHED_STATE, json.dumps(result), request["id"]))
+        with _open_batches_lock:
+            _open_batches.discard(self)
+        self.coordinator.notify()
+
+    # DeploymentWatcher transition callback (leader): reports back once the deployment plan reaches a terminal status
+    def on_deployment_transition(self, old_status: str, new_status: str, dep_status: dict):
+        if new_status in DEPLOYMENT_TERMINAL_STATUS_LIST:
+            self.complete(dep_status)
+
+    # Follower: waits for the result of its request, written by the leader.
+    # Raises DeploymentTimeoutError if there's no result within the timeout.
+    def wait_for_result(self, timeout: int = None):
+        if timeout is None:
+            timeout = get_configuration_value("DEPLOYMENT_TIMEOUT_IN_SECS", DEPLOYMENT_TIMEOUT_IN_SECS)
+        deadline = time.monotonic() + timeout
+        while True:
+            # The leader keeps its place in the queue until it reported back, so check it before the result
+            leader_gone = self.leader not in [entry["owner"] for entry in self.coordinator.get_queue(self.env_key)]
+            with self.coordinator.transaction() as conn:
+                state, result = conn.execute("SELECT state, result FROM plan_requests WHERE id = ?", (self.request_id,)).fetchone()
+            if state == _FINISHED_STATE:
+                return json.loads(result)
+            if leader_gone:
+                # e.g. killed before reporting back
+                return {"DeploymentKey": None, "DeploymentStatus": None, "Applications": [],
+                        "Error": "The pipeline deploying this request stopped without reporting back."}
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeploymentTimeoutError("Timeout of {} secs reached while waiting for the batched deployment.".format(timeout))
+            self.coordinator.wait(min(self.coordinator.poll_interval, remaining))
+
+
+# Merges the applications of several plan requests: one operation per application, the highest version wins.
+# Returns the deployment operations (in the format of the requests), the application names and the chosen application
+# version per application key.
+def merge_plan_requests(requests: list):
+    applications = {}
+    operations = {}
+    for request in requests:
+        for app in request["applications"]:
+            chosen = applications.get(app["Key"])
+            if chosen is None or parse_version_tag(app["Version"]) > parse_version_tag(chosen["Version"]):
+                applications[app["Key"]] = app
+                operations[app["Key"]] = app["Operation"]
+    return list(operations.values()), [app["Name"] for app in applications.values()], applications
+
+
+# Waits for the turn of this pipeline to deploy to a target environment, joining a batch when plan batching is enabled.
+# apps are the applications to deploy ({"Name", "Key", "Version", "VersionKey"}) and app_keys their deployment operations.
+# Returns (ticket, batch): the batch is None without batching, otherwise check batch.is_leader to know whether this
+# pipeline creates the deployment plan (with the batch applications) or only waits for the result of its request.
+def acquire_deployment_batch(dest_env_key: str, source_env_key: str, lt_api_version: int, apps: list, app_keys: list, dep_note: str, description: str = None):
+    coordinator = get_deployment_coordinator()
+    batch_window = get_configuration_value("COORDINATOR_BATCH_WINDOW_IN_SECS", COORDINATOR_BATCH_WINDOW_IN_SECS)
+    if coordinator is None or batch_window <= 0:
+        return acquire_deployment_slot(dest_env_key, description), None
+
+    applications = []
+    for operation in app_keys:
+        version_key = operation if lt_api_version == 1 else operation["ApplicationVersionKey"]
+        app = next(app for app in apps if app["VersionKey"] == version_key)
+        applications.append({"Name": app["Name"], "Key": app["Key"], "Version": app["Version"], "Operation": operation})
+    # Queued first, so the request is always tied to a ticket
+    ticket = coordinator.enqueue(dest_env_key, description)
+    try:
+        with coordinator.transaction() as conn:
+            conn.execute(_PLAN_REQUESTS_SCHEMA)
+            request_id = conn.execute(
+                "INSERT INTO plan_requests (env_key, source_env_key, lt_api_version, applications, dep_note, owner, state, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (dest_env_key, source_env_key, lt_api_version, json.dumps(applications), dep_note, ticket.owner, _PENDING_STATE, time.time())).lastrowid
+    except:
+        ticket.release()
+        raise
+
+    try:
+        ticket = coordinator.wait_for_turn(ticket, get_configuration_value("QUEUE_TIMEOUT_IN_SECS", QUEUE_TIMEOUT_IN_SECS),
+                                           abandon_if=lambda: _get_request_leader(coordinator, request_id) is not None)
+    except:
+        # e.g. timed out in the queue: the next leader must not deploy the applications of a failed pipeline
+        _withdraw_plan_request(coordinator, request_id)
+        raise
+    if ticket is None:
+        # Another pipeline took this request into its deployment plan
+        return None, PlanBatch(coordinator, dest_env_key, request_id, leader=_get_request_leader(coordinator, request_id))
+
+    # This pipeline leads: give the others a moment to join, then take every pending request with the same scope
+    coordinator.wait(batch_window)
+    with coordinator.transaction() as conn:
+        leader = conn.execute("SELECT leader FROM plan_requests WHERE id = ?", (request_id,)).fetchone()[0]
+        if leader is None:
+            # Requests left pending by pipelines that are gone (e.g. killed while queued) are dropped, not deployed
+            coordinator._purge_stale(conn)
+            conn.execute("DELETE FROM plan_requests WHERE state = ? AND owner NOT IN (SELECT owner FROM deployment_queue)", (_PENDING_STATE,))
+            rows = conn.execute(
+                "SELECT id, applications, dep_note FROM plan_requests WHERE env_key = ? AND source_env_key = ? AND lt_api_version = ? AND state = ? "
+                "AND owner IN (SELECT owner FROM deployment_queue) ORDER BY id",
+                (dest_env_key, source_env_key, lt_api_version, _PENDING_STATE)).fetchall()
+            conn.executemany("UPDATE plan_requests SET state = ?, leader = ? WHERE id = ?", [(_BATCHED_STATE, ticket.owner, row[0]) for row in rows])
+    if leader is not None:
+        # Taken by the previous leader right before its turn ended
+        ticket.release()
+        return None, PlanBatch(coordinator, dest_env_key, request_id, leader=leader)
+    requests = [{"id": row[0], "applications": json.loads(row[1]), "dep_note": row[2]} for row in rows]
+    return ticket, PlanBatch(coordinator, dest_env_key, request_id, requests=requests, leader=ticket.owner)
+
+
+# Waits for the batched deployment that includes the request of this pipeline and reports its outcome.
+# Returns the exit code for the pipeline (0 if the deployment finished without errors).
+def follow_batched_deployment(batch: PlanBatch):
+    print("Applications included in the deployment plan of another pipeline. Waiting for it to finish...", flush=True)
+    try:
+        result = batch.wait_for_result()
+    except DeploymentTimeoutError:
+        print("Timeout occurred while waiting for the batched deployment of another pipeline to finish.", flush=True)
+        return 1
+    for app in result["Applications"]:
+        print("Application {}: requested version {}, deployed version {}.".format(app["Name"], app["RequestedVersion"], app["DeployedVersion"]), flush=True)
+    if result["DeploymentStatus"] is None:
+        print("Batched deployment failed: {}".format(result["Error"]), flush=True)
+        return 1
+    print("Deployment plan {} finished with status {}.".format(result["DeploymentKey"], result["DeploymentStatus"]), flush=True)
+    return 1 if result["DeploymentStatus"] in DEPLOYMENT_ERROR_STATUS_LIST else 0
+
+
+# Fails the batches still open when the leader exits (e.g. conflicts or a timeout), before its queue turn is released.
+# Also called by the pipeline daemon at the end of each script, since its process doesn't exit.
+@atexit.register
+def fail_open_batches():
+    with _open_batches_lock:
+        batches = list(_open_batches)
+    for batch in batches:
+        batch.complete(None, error="The deployment plan was not completed by the pipeline that created it.")
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Removes a request that was not taken by a leader yet
+def _withdraw_plan_request(coordinator: DeploymentCoordinator, request_id: int):
+    with coordinator.transaction() as conn:
+        conn.execute("DELETE FROM plan_requests WHERE id = ? AND state = ?", (request_id, _PENDING_STATE))
+
+
+def _get_request_leader(coordinator: DeploymentCoordinator, request_id: int):
+    with coordinator.transaction() as conn:
+        return conn.execute("SELECT leader FROM plan_requests WHERE id = ?", (request_id,)).fetchone()[0]
@@ -0,0 +1,2 @@
+class CacheFormatError(Exception):
+    pass
@@ -0,0 +1,11 @@
+from toposort import CircularDependencyError
+
+
+# Raised when the application dependencies have cycles. cycles is a list of cycles, each with the (sorted) members
+# of a strongly connected component; data maps each member to its producers within the cycle.
+class DependencyCycleError(CircularDependencyError):
+    def __init__(self, cycles: list, data: dict):
+        ValueError.__init__(self, "There are circular dependencies among the list of applications: {}".format(
+            "; ".join(" <-> ".join(cycle) for cycle in cycles)))
+        self.cycles = cycles
+        self.data = data
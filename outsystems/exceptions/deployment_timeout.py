@@ -0,0 +1,2 @@
+class DeploymentTimeoutError(Exception):
+    pass
@@ -0,0 +1,2 @@
+class OAPIntegrityError(Exception):
+    pass
@@ -0,0 +1,5 @@
+from outsystems.exceptions.osptool_error import OSPToolDeploymentError
+
+
+class OSPToolTimeoutError(OSPToolDeploymentError):
+    pass
@@ -0,0 +1,78 @@
+# Python Modules
+import gzip
+import json
+
+# Optional faster / more compact backends, used only when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Custom Modules
+# Exceptions
+from outsystems.exceptions.cache_format_error import CacheFormatError
+
+# Headers that identify a cache file codec. Plain JSON has none, so caches written before codecs existed still load
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# msgpack has no magic of its own; a leading NUL byte can never start a JSON document
+MSGPACK_MAGIC = b"\x00OSMP"
+
+
+# Encodes data with a cache format: "<serializer>[+<compression>]", e.g. "json", "json-compact+gzip", "msgpack+zstd"
+# Serializers: json (indented, the historical format), json-compact, msgpack. Compression: gzip, zstd.
+def encode_cache_data(data, cache_format: str):
+    serializer, _, compression = cache_format.partition("+")
+    if serializer == "json":
+        payload = json.dumps(data, indent=4).encode()
+    elif serializer == "json-compact":
+        payload = orjson.dumps(data) if orjson else json.dumps(data, separators=(",", ":")).encode()
+    elif serializer == "msgpack":
+        _check_backend(msgpack, "msgpack", cache_format)
+        payload = MSGPACK_MAGIC + msgpack.packb(data, use_bin_type=True)
+    else:
+        raise CacheFormatError("Unknown cache serializer '{}' in cache format '{}'.".format(serializer, cache_format))
+
+    if compression == "":
+        return payload
+    elif compression == "gzip":
+        # mtime=0 keeps the output deterministic for the same data
+        return gzip.compress(payload, compresslevel=6, mtime=0)
+    elif compression == "zstd":
+        _check_backend(zstandard, "zstandard", cache_format)
+        return zstandard.ZstdCompressor().compress(payload)
+    raise CacheFormatError("Unknown cache compression '{}' in cache format '{}'.".format(compression, cache_format))
+
+
+# Decodes the content of a cache file, picking the codec from its header
+def decode_cache_data(payload: bytes):
+    if payload.startswith(GZIP_MAGIC):
+        return decode_cache_data(gzip.decompress(payload))
+    elif payload.startswith(ZSTD_MAGIC):
+        _check_backend(zstandard, "zstandard", "zstd")
+        return decode_cache_data(zstandard.ZstdDecompressor().decompressobj().decompress(payload))
+    elif payload.startswith(MSGPACK_MAGIC):
+        _check_backend(msgpack, "msgpack", "msgpack")
+        return msgpack.unpackb(payload[len(MSGPACK_MAGIC):], raw=False)
+    if orjson:
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than the stdlib (e.g. NaN), so let the stdlib have the last word
+            pass
+    return json.loads(payload)
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+def _check_backend(module, package: str, cache_format: str):
+    if module is None:
+        raise CacheFormatError(
+            "The cache format '{}' requires the '{}' package. Install it with: pip install {}".format(cache_format, package, package))
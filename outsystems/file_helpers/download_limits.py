@@ -0,0 +1,44 @@
+# Python Modules
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Token bucket shared by concurrent downloads, so together they stay under bytes_per_sec.
+# Bursts of up to one second worth of bytes are allowed. A limit <= 0 means unlimited.
+class BandwidthLimiter:
+    def __init__(self, bytes_per_sec: int):
+        self.bytes_per_sec = bytes_per_sec
+        self._available = bytes_per_sec
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Blocks until byte_count bytes can be transferred without going over the limit
+    def consume(self, byte_count: int):
+        if self.bytes_per_sec <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self.bytes_per_sec, self._available + (now - self._updated_at) * self.bytes_per_sec)
+            self._updated_at = now
+            # The bucket may go negative for chunks bigger than the burst; the wait pays it back
+            self._available -= byte_count
+            wait = -self._available / self.bytes_per_sec if self._available < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Limits the number of concurrent downloads per host (e.g. the LifeTime server or a storage host serving packages)
+class HostConcurrencyLimiter:
+    def __init__(self, max_per_host: int):
+        self.max_per_host = max(1, max_per_host)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    # Returns the semaphore of the host of a URL, to be used as a context manager around the download
+    def slot(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
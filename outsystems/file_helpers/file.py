@@ -1,34 +1,84 @@
 # Python Modules
-import json
 import os
+import hashlib
 import requests
+import threading
+import time
 
+# Functions
+from outsystems.file_helpers.cache_codecs import encode_cache_data, decode_cache_data
+from outsystems.lifetime.lifetime_base import get_lifetime_client
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.file_vars import CACHE_METADATA_SUFFIX, CACHE_FORMAT, OAP_DOWNLOAD_CHUNK_SIZE, OAP_DOWNLOAD_TIMEOUT_IN_SECS, \
+    OAP_DOWNLOAD_RETRIES, OAP_PARTIAL_FILE_SUFFIX
+from outsystems.vars.lifetime_vars import LIFETIME_SSL_CERT_VERIFY
 
-def download_oap(file_path: str, auth_token: str, oap_url: str):
-    response = requests.get(oap_url, headers={"Authorization": auth_token})
+
+# Downloads an OAP, streaming it to a partial file (so it never sits whole in memory) that is renamed into place once
+# complete. If the connection drops, the download resumes from where it stopped with an HTTP Range request, up to
+# OAP_DOWNLOAD_RETRIES times, as long as the server still has the same file (If-Range). Partial files left by previous
+# calls are not resumed, since they may belong to another file. An optional BandwidthLimiter can be shared between
+# concurrent downloads. Returns the SHA-256 of the downloaded file.
+def download_oap(file_path: str, auth_token: str, oap_url: str, bandwidth_limiter=None):
+    chunk_size = get_configuration_value("OAP_DOWNLOAD_CHUNK_SIZE", OAP_DOWNLOAD_CHUNK_SIZE)
+    timeout = get_configuration_value("OAP_DOWNLOAD_TIMEOUT_IN_SECS", OAP_DOWNLOAD_TIMEOUT_IN_SECS)
+    retries = get_configuration_value("OAP_DOWNLOAD_RETRIES", OAP_DOWNLOAD_RETRIES)
     # Makes sure that, if a directory is in the filename, that directory exists
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, "wb") as f:
-        f.write(response.content)
+    part_file_path = file_path + OAP_PARTIAL_FILE_SUFFIX
+    _remove_file(part_file_path)
+    # Validator (ETag or Last-Modified) of the file being downloaded, set by the first response
+    validator = {}
+    attempt = 0
+    while True:
+        try:
+            sha256 = _download_oap_part(part_file_path, auth_token, oap_url, chunk_size, timeout, bandwidth_limiter, validator)
+            break
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout) as error:
+            attempt += 1
+            if attempt > retries:
+                raise
+            print("Download of {} interrupted ({}). Resuming (attempt {} of {})...".format(
+                os.path.basename(file_path), error.__class__.__name__, attempt, retries), flush=True)
+    os.replace(part_file_path, file_path)
+    return sha256
+
+
+# Returns the SHA-256 of a file, reading it in chunks
+def get_file_sha256(file_path: str):
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(OAP_DOWNLOAD_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
 
 
-def store_data(artifact_dir: str, filename: str, data: str):
+# Stores data in a cache file. cache_format picks the codec (see cache_codecs.encode_cache_data); the default is
+# indented JSON, which other tools may read directly
+def store_data(artifact_dir: str, filename: str, data: str, cache_format: str = CACHE_FORMAT):
     filename = os.path.join(artifact_dir, filename)
     # Remove the spaces in the filename
     filename = filename.replace(" ", "_")
     # Makes sure that, if a directory is in the filename, that directory exists
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, "w") as outfile:
-        json.dump(data, outfile, indent=4)
+    # Encoded first, so an encoding error leaves no file behind
+    content = encode_cache_data(data, cache_format)
+    # Write to a temporary file and swap it in, so concurrent readers never see a partially written file
+    temp_filename = "{}.{}.{}.tmp".format(filename, os.getpid(), threading.get_ident())
+    with open(temp_filename, "wb") as outfile:
+        outfile.write(content)
+    os.replace(temp_filename, filename)
 
 
+# Loads data from a cache file, whatever the format it was stored with
 def load_data(artifact_dir: str, filename: str):
     # Remove the spaces in the filename
     filename = filename.replace(" ", "_")
     if check_file(artifact_dir, filename):
         filename = os.path.join(artifact_dir, filename)
-        with open(filename, "r") as infile:
-            return json.load(infile)
+        with open(filename, "rb") as infile:
+            return decode_cache_data(infile.read())
     raise FileNotFoundError(
         "The file with filename {} does not exist.".format(filename))
 
@@ -39,7 +89,115 @@ def check_file(artifact_dir: str, filename: str):
 
 
 def clear_cache(artifact_dir: str, filename: str):
+    # The freshness metadata goes away with the data it describes
+    for cache_file in (filename, filename + CACHE_METADATA_SUFFIX):
+        if not check_file(artifact_dir, cache_file):
+            continue
+        try:
+            os.remove(os.path.join(artifact_dir, cache_file))
+        except FileNotFoundError:
+            # Already cleared by a concurrent caller
+            pass
+
+
+# Stores the freshness metadata of a cache file, next to it: when it was fetched, with which request params,
+# and the validators returned by the server (if any) for conditional requests
+def store_cache_metadata(artifact_dir: str, filename: str, params: dict, headers: dict):
+    headers = headers or {}
+    metadata = {"fetched_at": time.time(), "params": params or {},
+                "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+    store_data(artifact_dir, filename + CACHE_METADATA_SUFFIX, metadata)
+
+
+# Loads the freshness metadata of a cache file, if both exist and the cache was fetched with the same request params
+def load_cache_metadata(artifact_dir: str, filename: str, params: dict):
     if not check_file(artifact_dir, filename):
-        return
-    filename = os.path.join(artifact_dir, filename)
-    os.remove(filename)
+        return None
+    try:
+        metadata = load_data(artifact_dir, filename + CACHE_METADATA_SUFFIX)
+    except (FileNotFoundError, ValueError):
+        return None
+    if metadata.get("params") != (params or {}):
+        return None
+    return metadata
+
+
+# Checks if a cache file was fetched, with the same request params, less than ttl seconds ago
+def is_cache_fresh(artifact_dir: str, filename: str, params: dict, ttl: int):
+    metadata = load_cache_metadata(artifact_dir, filename, params)
+    return metadata is not None and time.time() - metadata["fetched_at"] < ttl
+
+
+# Returns the conditional request headers (If-None-Match / If-Modified-Since) to revalidate a cache file
+def get_cache_validators(artifact_dir: str, filename: str, params: dict):
+    metadata = load_cache_metadata(artifact_dir, filename, params)
+    headers = {}
+    if metadata is not None:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+    return headers
+
+
+# Marks a cache file as fetched now, after the server confirmed it's still valid (304 Not Modified)
+def touch_cache_metadata(artifact_dir: str, filename: str):
+    metadata = load_data(artifact_dir, filename + CACHE_METADATA_SUFFIX)
+    metadata["fetched_at"] = time.time()
+    store_data(artifact_dir, filename + CACHE_METADATA_SUFFIX, metadata)
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Downloads (the rest of) an OAP into a partial file and returns the SHA-256 of the whole file.
+# validator holds the If-Range value of the file the partial file came from (empty before the first response).
+def _download_oap_part(part_file_path: str, auth_token: str, oap_url: str, chunk_size: int, timeout: int, bandwidth_limiter, validator: dict):
+    headers = {"Authorization": auth_token}
+    offset = os.path.getsize(part_file_path) if os.path.isfile(part_file_path) else 0
+    if offset > 0 and validator.get("If-Range"):
+        headers["Range"] = "bytes={}-".format(offset)
+        headers["If-Range"] = validator["If-Range"]
+    else:
+        # Without a validator there's no telling whether the partial file still matches the server file
+        offset = 0
+    verify = get_configuration_value("LIFETIME_SSL_CERT_VERIFY", LIFETIME_SSL_CERT_VERIFY)
+    with get_lifetime_client().get(oap_url, headers=headers, stream=True, timeout=timeout, verify=verify) as response:
+        wrong_range = response.status_code == 206 and not response.headers.get("Content-Range", "").startswith("bytes {}-".format(offset))
+        if offset > 0 and (response.status_code == 416 or wrong_range):
+            # Nothing left to download, or not the range that was asked for: start over
+            _remove_file(part_file_path)
+            validator.clear()
+            return _download_oap_part(part_file_path, auth_token, oap_url, chunk_size, timeout, bandwidth_limiter, validator)
+        response.raise_for_status()
+        if response.status_code == 200:
+            validator.clear()
+            # Weak ETags can't be used in If-Range
+            etag = response.headers.get("ETag")
+            if etag and not etag.startswith("W/"):
+                validator["If-Range"] = etag
+            elif response.headers.get("Last-Modified"):
+                validator["If-Range"] = response.headers["Last-Modified"]
+        sha256 = hashlib.sha256()
+        if offset > 0 and response.status_code == 206:
+            # Resuming: the hash covers the bytes already on disk
+            with open(part_file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    sha256.update(chunk)
+            mode = "ab"
+        else:
+            # The server ignored the Range header, the file changed (If-Range) or there was nothing to resume:
+            # download everything
+            mode = "wb"
+        with open(part_file_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if bandwidth_limiter is not None:
+                    bandwidth_limiter.consume(len(chunk))
+                f.write(chunk)
+                sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _remove_file(file_path: str):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,145 @@
+# Python Modules
+import os
+import shutil
+import threading
+import time
+
+# Custom Modules
+# Functions
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.file_vars import PACKAGE_STORE_ENABLED, PACKAGE_STORE_DIR, PACKAGE_STORE_MAX_SIZE_IN_MB, PACKAGE_STORE_FILE, \
+    PACKAGE_STORE_SHA256_FILE, PACKAGE_STORE_TEMP_GRACE_IN_SECS
+
+_package_stores = {}
+_package_stores_lock = threading.Lock()
+
+
+# Local package store shared across pipeline runs, keyed by application version key (a version key always identifies
+# the same package content). Packages are linked from the store into the artifacts folder (hard link, or a copy when
+# the store is on another filesystem) and evicted least recently used first once the store grows over max_size_bytes.
+# Recency is the mtime of the stored package, refreshed every time it is used.
+class PackageStore:
+    def __init__(self, store_dir: str, max_size_bytes: int):
+        self.store_dir = store_dir
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+
+    # Links the package of a version key into file_path. Returns its SHA-256, or None if the store does not have it.
+    def get(self, version_key: str, file_path: str):
+        package_path = self._package_path(version_key)
+        try:
+            with open(package_path + PACKAGE_STORE_SHA256_FILE, "r") as f:
+                sha256 = f.read().strip()
+            # Mark as recently used
+            os.utime(package_path)
+        except FileNotFoundError:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        try:
+            _link_or_copy(package_path, file_path)
+        except FileNotFoundError:
+            # Evicted (by another pipeline sharing the store) after the checksum was read
+            return None
+        return sha256
+
+    # Adds a downloaded package to the store and evicts old packages if needed
+    def put(self, version_key: str, file_path: str, sha256: str):
+        package_path = self._package_path(version_key)
+        os.makedirs(os.path.dirname(package_path), exist_ok=True)
+        temp_path = _temp_path(package_path)
+        _link_or_copy(file_path, temp_path)
+        os.replace(temp_path, package_path)
+        # The checksum is written last: a package without it is not visible to get()
+        temp_path = _temp_path(package_path + PACKAGE_STORE_SHA256_FILE)
+        with open(temp_path, "w") as f:
+            f.write(sha256)
+        os.replace(temp_path, package_path + PACKAGE_STORE_SHA256_FILE)
+        self.gc()
+
+    # Evicts least recently used packages until the store fits in max_size_bytes (or the given size) and removes
+    # leftovers of interrupted writes (temporary files older than PACKAGE_STORE_TEMP_GRACE_IN_SECS, so the ones still
+    # being written by other threads or pipelines are kept). Returns the version keys evicted and the number of bytes freed.
+    def gc(self, max_size_bytes: int = None):
+        if max_size_bytes is None:
+            max_size_bytes = self.max_size_bytes
+        evicted = []
+        freed = 0
+        stale_before = time.time() - get_configuration_value("PACKAGE_STORE_TEMP_GRACE_IN_SECS", PACKAGE_STORE_TEMP_GRACE_IN_SECS)
+        with self._lock:
+            packages = []
+            for root, _, files in os.walk(self.store_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if name.endswith(".tmp"):
+                        try:
+                            if os.path.getmtime(path) < stale_before:
+                                freed += _remove(path)
+                        except FileNotFoundError:
+                            continue
+                    elif name.endswith(PACKAGE_STORE_FILE):
+                        try:
+                            packages.append((os.path.getmtime(path), os.path.getsize(path), path))
+                        except FileNotFoundError:
+                            continue
+            total = sum(size for _, size, _ in packages)
+            for _, size, path in sorted(packages):
+                if total <= max_size_bytes:
+                    break
+                # Remove the checksum first, so the package stops being visible before it's gone
+                _remove(path + PACKAGE_STORE_SHA256_FILE)
+                freed += _remove(path)
+                total -= size
+                evicted.append(os.path.basename(path)[:-len(PACKAGE_STORE_FILE)])
+        return evicted, freed
+
+    # Returns the total size, in bytes, of the packages in the store
+    def get_size(self):
+        total = 0
+        for root, _, files in os.walk(self.store_dir):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith(PACKAGE_STORE_FILE))
+        return total
+
+    def _package_path(self, version_key: str):
+        # Spread packages over subfolders, to keep folders small
+        return os.path.join(self.store_dir, version_key[:2], version_key + PACKAGE_STORE_FILE)
+
+
+# Returns the configured package store, or None if it's not enabled
+def get_package_store():
+    if not get_configuration_value("PACKAGE_STORE_ENABLED", PACKAGE_STORE_ENABLED):
+        return None
+    store_dir = get_configuration_value("PACKAGE_STORE_DIR", PACKAGE_STORE_DIR)
+    max_size_bytes = get_configuration_value("PACKAGE_STORE_MAX_SIZE_IN_MB", PACKAGE_STORE_MAX_SIZE_IN_MB) * 1024 * 1024
+    # One store per folder, so every thread of this process shares its lock
+    with _package_stores_lock:
+        if store_dir not in _package_stores:
+            _package_stores[store_dir] = PackageStore(store_dir, max_size_bytes)
+        _package_stores[store_dir].max_size_bytes = max_size_bytes
+        return _package_stores[store_dir]
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Hard links a file (same filesystem) or copies it (otherwise). The destination is replaced if it exists.
+def _link_or_copy(src_path: str, dest_path: str):
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        # Cross-device or filesystem without hard links. copyfile uses the kernel fast paths where available.
+        shutil.copyfile(src_path, dest_path)
+
+
+# Temporary file name, unique per process and thread
+def _temp_path(path: str):
+    return "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+
+
+def _remove(path: str):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
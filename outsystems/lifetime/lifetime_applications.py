@@ -12,12 +12,17 @@ from outsystems.exceptions.not_enough_permissions import NotEnoughPermissionsErr
 from outsystems.exceptions.environment_not_found import EnvironmentNotFoundError
 from outsystems.exceptions.app_version_error import AppVersionsError
 # Functions
-from outsystems.file_helpers.file import store_data, load_data, clear_cache, download_oap
+from outsystems.file_helpers.file import store_data, load_data, download_oap, store_cache_metadata, is_cache_fresh, \
+    get_cache_validators, touch_cache_metadata
+from outsystems.vars.vars_base import get_configuration_value
 from outsystems.lifetime.lifetime_base import send_get_request, send_post_request
+from outsystems.lifetime.lifetime_lookup import set_lookup_index, find_in_lookup_index
+from outsystems.file_helpers.package_store import get_package_store
 # Variables
-from outsystems.vars.file_vars import APPLICATION_FOLDER, APPLICATIONS_FILE, APPLICATION_FILE, APPLICATION_VERSIONS_FILE, APPLICATION_VERSION_FILE
+from outsystems.vars.file_vars import APPLICATION_FOLDER, APPLICATIONS_FILE, APPLICATION_FILE, APPLICATION_VERSIONS_FILE, APPLICATION_VERSION_FILE, \
+    APPLICATIONS_CACHE_TTL_IN_SECS, LIFETIME_CACHE_FORMAT
 from outsystems.vars.lifetime_vars import APPLICATIONS_ENDPOINT, APPLICATION_VERSIONS_ENDPOINT, APPLICATIONS_SUCCESS_CODE, \
-    APPLICATIONS_EMPTY_CODE, APPLICATIONS_FLAG_FAILED_CODE, APPLICATIONS_FAILED_CODE, APPLICATION_SUCCESS_CODE, \
+    APPLICATIONS_EMPTY_CODE, APPLICATIONS_NOT_MODIFIED_CODE, APPLICATIONS_FLAG_FAILED_CODE, APPLICATIONS_FAILED_CODE, APPLICATION_SUCCESS_CODE, \
     APPLICATION_FLAG_FAILED_CODE, APPLICATION_NO_PERMISSION_CODE, APPLICATION_FAILED_CODE, APPLICATION_VERSION_SUCCESS_CODE, \
     APPLICATION_VERSION_INVALID_CODE, APPLICATION_VERSION_NO_PERMISSION_CODE, APPLICATION_VERSION_FAILED_CODE, \
     APPLICATION_VERSION_FAILED_LIST_CODE, APPLICATION_VERSIONS_CONTENT, APPLICATION_VERSIONS_EMPTY_CODE, \
@@ -26,17 +31,32 @@ from outsystems.vars.lifetime_vars import APPLICATIONS_ENDPOINT, APPLICATION_VER
 
 
 # Returns a list of applications that exist in the infrastructure.
-def get_applications(artifact_dir: str, endpoint: str, auth_token: str, extra_data: bool):
+# With use_cache, a list cached less than APPLICATIONS_CACHE_TTL_IN_SECS ago (with the same extra_data) is returned as-is.
+# Otherwise the cached list is revalidated with a conditional request, when LifeTime returned validators for it.
+def get_applications(artifact_dir: str, endpoint: str, auth_token: str, extra_data: bool, use_cache: bool = False):
     params = {"IncludeModules": extra_data, "IncludeEnvStatus": extra_data}
+    if use_cache and is_cache_fresh(artifact_dir, APPLICATIONS_FILE, params, get_configuration_value("APPLICATIONS_CACHE_TTL_IN_SECS", APPLICATIONS_CACHE_TTL_IN_SECS)):
+        applications = load_data(artifact_dir, APPLICATIONS_FILE)
+        set_lookup_index(artifact_dir, APPLICATIONS_FILE, applications)
+        return applications
     # Sends the request
     response = send_get_request(
-        endpoint, auth_token, APPLICATIONS_ENDPOINT, params)
+        endpoint, auth_token, APPLICATIONS_ENDPOINT, params, get_cache_validators(artifact_dir, APPLICATIONS_FILE, params))
     status_code = int(response["http_status"])
     # Process the response based on the status code returned from the server
     if status_code == APPLICATIONS_SUCCESS_CODE:
         # Stores the result
-        store_data(artifact_dir, APPLICATIONS_FILE, response["response"])
+        store_data(artifact_dir, APPLICATIONS_FILE, response["response"], get_configuration_value("LIFETIME_CACHE_FORMAT", LIFETIME_CACHE_FORMAT))
+        store_cache_metadata(artifact_dir, APPLICATIONS_FILE, params, response["headers"])
+        # Refreshes the in-process name/key index with the new list
+        set_lookup_index(artifact_dir, APPLICATIONS_FILE, response["response"])
         return response["response"]
+    elif status_code == APPLICATIONS_NOT_MODIFIED_CODE:
+        # The cached list is still valid
+        touch_cache_metadata(artifact_dir, APPLICATIONS_FILE)
+        applications = load_data(artifact_dir, APPLICATIONS_FILE)
+        set_lookup_index(artifact_dir, APPLICATIONS_FILE, applications)
+        return applications
     elif status_code == APPLICATIONS_EMPTY_CODE:
         raise NoAppsAvailableError(
             "No applications available in the infrastructure. Details {}".format(response["response"]))
@@ -145,28 +165,33 @@ def get_application_version(artifact_dir: str, endpoint: str, auth_token: str, e
             "There was an error. Response from server: {}".format(response))
 
 
-def get_running_app_version(artifact_dir: str, endpoint: str, auth_token: str, env_key: str, **kwargs):
+# Returns the details of the application version running in a given environment.
+# When an EnvironmentSnapshot is provided, the app status is read from it instead of being requested to LifeTime.
+def get_running_app_version(artifact_dir: str, endpoint: str, auth_token: str, env_key: str, snapshot=None, **kwargs):
     # Tuple with (AppName, AppKey): app_tuple[0] = AppName; app_tuple[1] = AppKey
     app_tuple = _get_application_info(artifact_dir, endpoint, auth_token, **kwargs)
     app_data = {}
 
-    deployed_app = get_application_data(artifact_dir, endpoint, auth_token, True, app_name=app_tuple[0])
-    for status_in_env in deployed_app["AppStatusInEnvs"]:
-        if status_in_env["EnvironmentKey"] == env_key:
-            app_version_data = get_application_version(artifact_dir, endpoint, auth_token, True, status_in_env["BaseApplicationVersionKey"], app_name=app_tuple[0])
-            app_data = {
-                "ApplicationName": app_tuple[0],
-                "ApplicationKey": app_tuple[1],
-                "Version": app_version_data["Version"],
-                "VersionKey": status_in_env["BaseApplicationVersionKey"]
-            }
-            # Since these 2 fields were only introduced in a minor of OS11, we check here if they exist
-            # We can't just use the version
-            if "CreatedOn" in app_version_data:
-                app_data.update({"CreatedOn": app_version_data["CreatedOn"]})
-            if "ChangeLog" in app_version_data:
-                app_data.update({"ChangeLog": app_version_data["ChangeLog"]})
-            break
+    if snapshot:
+        status_in_env = snapshot.get_app_status(app_tuple[1], env_key)
+    else:
+        deployed_app = get_application_data(artifact_dir, endpoint, auth_token, True, app_name=app_tuple[0])
+        status_in_env = next(filter(lambda x: x["EnvironmentKey"] == env_key, deployed_app["AppStatusInEnvs"]), None)
+
+    if status_in_env:
+        app_version_data = get_application_version(artifact_dir, endpoint, auth_token, True, status_in_env["BaseApplicationVersionKey"], app_name=app_tuple[0])
+        app_data = {
+            "ApplicationName": app_tuple[0],
+            "ApplicationKey": app_tuple[1],
+            "Version": app_version_data["Version"],
+            "VersionKey": status_in_env["BaseApplicationVersionKey"]
+        }
+        # Since these 2 fields were only introduced in a minor of OS11, we check here if they exist
+        # We can't just use the version
+        if "CreatedOn" in app_version_data:
+            app_data.update({"CreatedOn": app_version_data["CreatedOn"]})
+        if "ChangeLog" in app_version_data:
+            app_data.update({"ChangeLog": app_version_data["ChangeLog"]})
 
     return app_data
 
@@ -201,7 +226,28 @@ def set_application_version(endpoint: str, auth_token: str, env_key: str, app_ke
 
 
 # Exports the OAP of a given application version.
-def export_app_oap(file_path: str, endpoint: str, auth_token: str, env_key: str, app_key: str, app_version_key: str):
+# When the package store is enabled, the package is linked from there if it was already downloaded (by any run).
+# Optional limiters (see download_limits) are shared between concurrent exports.
+# Returns the SHA-256 of the package.
+def export_app_oap(file_path: str, endpoint: str, auth_token: str, env_key: str, app_key: str, app_version_key: str, bandwidth_limiter=None, host_limiter=None):
+    package_store = get_package_store()
+    if package_store is not None:
+        sha256 = package_store.get(app_version_key, file_path)
+        if sha256 is not None:
+            return sha256
+    url_string = get_application_oap_url(endpoint, auth_token, app_key, app_version_key)
+    if host_limiter is not None:
+        with host_limiter.slot(url_string):
+            sha256 = download_oap(file_path, auth_token, url_string, bandwidth_limiter)
+    else:
+        sha256 = download_oap(file_path, auth_token, url_string, bandwidth_limiter)
+    if package_store is not None:
+        package_store.put(app_version_key, file_path, sha256)
+    return sha256
+
+
+# Returns the download URL of the OAP of a given application version.
+def get_application_oap_url(endpoint: str, auth_token: str, app_key: str, app_version_key: str):
     query = "{}/{}/{}/{}/{}".format(APPLICATIONS_ENDPOINT,
                                     app_key, APPLICATION_VERSIONS_ENDPOINT, app_version_key, APPLICATION_VERSIONS_CONTENT)
     # Sends the request
@@ -209,11 +255,8 @@ def export_app_oap(file_path: str, endpoint: str, auth_token: str, env_key: str,
 
     status_code = int(response["http_status"])
     if status_code == APPLICATIONS_SUCCESS_CODE:
-        # Stores the result
         url_string = response["response"]
-        url_string = url_string["url"]
-        download_oap(file_path, auth_token, url_string)
-        return
+        return url_string["url"]
     elif status_code == APPLICATION_VERSION_NO_PERMISSION_CODE:
         raise NotEnoughPermissionsError(
             "You don't have enough permissions to see the details of that application. Details: {}".format(response["response"]))
@@ -254,57 +297,21 @@ def _get_application_info(artifact_dir: str, api_url: str, auth_token: str, **kw
 
 # Private method to find an application key from name
 def _find_application_key(artifact_dir: str, api_url: str, auth_token: str, application_name: str):
-    app_key = ""
-    cached_results = False
-    try:
-        # Try searching the key on the cache
-        applications = load_data(artifact_dir, APPLICATIONS_FILE)
-        cached_results = True
-    except FileNotFoundError:
-        # Query the LT API, since there's no cache
-        applications = get_applications(
-            artifact_dir, api_url, auth_token, False)
-    for app in applications:
-        if app["Name"] == application_name:
-            app_key = app["Key"]
-            break
-    # If the app key was not found, determine if it needs to invalidate the cache or the application does not exist
-    # since we explitly clear the cache, and the code is not multithreaded, it should not lead to recursion issues
-    # If the cache was not used in the first place, it means the app does not exist
-    if app_key == "" and not cached_results:
+    app_key = find_in_lookup_index(artifact_dir, APPLICATIONS_FILE, "key", application_name,
+                                   lambda: get_applications(artifact_dir, api_url, auth_token, False))
+    # If the app key was not found, even after refreshing the list from LifeTime, the app does not exist
+    if app_key is None:
         raise AppDoesNotExistError(
             "Failed to retrieve the application. Please make sure the app exists in the environment. App Name: {}".format(application_name))
-    # If the cache was used, it needs to be cleared and re-fetched from the LT server
-    elif app_key == "" and cached_results:
-        clear_cache(artifact_dir, APPLICATIONS_FILE)
-        return _find_application_key(artifact_dir, api_url, auth_token, application_name)
     return app_key
 
 
 # Private method to find an application name from key
 def _find_application_name(artifact_dir: str, api_url: str, auth_token: str, application_key: str):
-    app_name = ""
-    cached_results = False
-    try:
-        # Try searching the key on the cache
-        applications = load_data(artifact_dir, APPLICATIONS_FILE)
-        cached_results = True
-    except FileNotFoundError:
-        # Query the LT API, since there's no cache
-        applications = get_applications(
-            artifact_dir, api_url, auth_token, False)
-    for app in applications:
-        if app["Key"] == application_key:
-            app_name = app["Name"]
-            break
-    # If the app name  was not found, determine if it needs to invalidate the cache or the application does not exist
-    # since we explitly clear the cache, and the code is not multithreaded, it should not lead to recursion issues
-    # If the cache was not used in the first place, it means the app does not exist
-    if app_name == "" and not cached_results:
+    app_name = find_in_lookup_index(artifact_dir, APPLICATIONS_FILE, "name", application_key,
+                                    lambda: get_applications(artifact_dir, api_url, auth_token, False))
+    # If the app name was not found, even after refreshing the list from LifeTime, the app does not exist
+    if app_name is None:
         raise AppDoesNotExistError(
             "Failed to retrieve the application. Please make sure the app exists in the environment. App Key: {}".format(application_key))
-    # If the cache was used, it needs to be cleared and re-fetched from the LT server
-    elif app_name == "" and cached_results:
-        clear_cache(artifact_dir, APPLICATIONS_FILE)
-        return _find_application_name(artifact_dir, api_url, auth_token, application_key)
     return app_name
@@ -0,0 +1,60 @@
+# Python Modules
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Custom Modules
+# Functions
+from outsystems.lifetime.lifetime_base import send_get_request, send_post_request, send_delete_request
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.lifetime_vars import LIFETIME_MAX_CONCURRENT_REQUESTS
+
+
+# Sends a GET request to LT without blocking the event loop.
+# The request runs on a worker thread, through the shared (pooled) LifeTime client.
+async def async_send_get_request(lt_api: str, token: str, api_endpoint: str, url_params: dict):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(send_get_request, lt_api, token, api_endpoint, url_params))
+
+
+# Sends a POST request to LT without blocking the event loop.
+async def async_send_post_request(lt_api: str, token: str, api_endpoint: str, payload: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(send_post_request, lt_api, token, api_endpoint, payload))
+
+
+# Sends a DELETE request to LT without blocking the event loop.
+async def async_send_delete_request(lt_api: str, token: str, api_endpoint: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(send_delete_request, lt_api, token, api_endpoint))
+
+
+# Runs a list of calls with at most max_concurrency of them in flight and returns their results in the same order.
+# Each call is either a coroutine function or a regular (blocking) function without arguments, e.g. a functools.partial
+# of get_application_version. Blocking calls run on a thread pool sized to max_concurrency.
+# If return_exceptions is False, the first exception raised by a call is propagated.
+async def gather_bounded(calls: list, max_concurrency: int = None, return_exceptions: bool = False):
+    if max_concurrency is None:
+        max_concurrency = get_configuration_value("LIFETIME_MAX_CONCURRENT_REQUESTS", LIFETIME_MAX_CONCURRENT_REQUESTS)
+    max_concurrency = max(1, max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        async def run_call(call):
+            async with semaphore:
+                if inspect.iscoroutinefunction(call):
+                    return await call()
+                return await loop.run_in_executor(executor, call)
+
+        return await asyncio.gather(*[run_call(call) for call in calls], return_exceptions=return_exceptions)
+
+
+# Blocking wrapper around gather_bounded, so the sync LifeTime functions can be fanned out from regular code.
+# Example: run_concurrently([partial(get_application_version, ..., app_key=key) for key in keys])
+def run_concurrently(calls: list, max_concurrency: int = None, return_exceptions: bool = False):
+    if len(calls) == 0:
+        return []
+    return asyncio.run(gather_bounded(calls, max_concurrency, return_exceptions))
@@ -1,15 +1,84 @@
 # Python Modules
 import requests
 import json
+import atexit
+import threading
+from functools import partial
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 # Custom Modules
 # Exceptions
 from outsystems.exceptions.invalid_json_response import InvalidJsonResponseError
 # Variables
-from outsystems.vars.lifetime_vars import LIFETIME_SSL_CERT_VERIFY
+from outsystems.vars.lifetime_vars import LIFETIME_SSL_CERT_VERIFY, LIFETIME_HTTP_POOL_CONNECTIONS, LIFETIME_HTTP_POOL_MAXSIZE, \
+    LIFETIME_HTTP_KEEP_ALIVE, LIFETIME_HTTP_LOG_STATS
 # Functions
 from outsystems.vars.vars_base import get_configuration_value
 
+# Process-wide LifeTime client, created on first use
+_lifetime_client = None
+_lifetime_client_lock = threading.Lock()
+
+
+# HTTP client that keeps a pool of keep-alive connections per host and reuses them across LifeTime API calls.
+# It also counts the requests sent and the connections actually opened, so the connection reuse can be measured.
+class LifeTimeClient:
+    def __init__(self, pool_connections: int = LIFETIME_HTTP_POOL_CONNECTIONS, pool_maxsize: int = LIFETIME_HTTP_POOL_MAXSIZE, keep_alive: bool = LIFETIME_HTTP_KEEP_ALIVE):
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.session = requests.Session()
+        # pool_connections = number of hosts with a cached pool; pool_maxsize = connections kept alive per host
+        adapter = _CountingHTTPAdapter(self, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def request(self, method: str, url: str, **kwargs):
+        with self._stats_lock:
+            self.requests_sent += 1
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    # Returns the request and connection counters
+    def get_stats(self):
+        with self._stats_lock:
+            return {"requests_sent": self.requests_sent, "connections_opened": self.connections_opened}
+
+    def close(self):
+        self.session.close()
+
+    def _count_connection(self):
+        with self._stats_lock:
+            self.connections_opened += 1
+
+
+# Returns the shared LifeTime client, creating it (with the configured pool settings) on first use
+def get_lifetime_client():
+    global _lifetime_client
+    with _lifetime_client_lock:
+        if _lifetime_client is None:
+            _lifetime_client = LifeTimeClient(get_configuration_value("LIFETIME_HTTP_POOL_CONNECTIONS", LIFETIME_HTTP_POOL_CONNECTIONS),
+                                              get_configuration_value("LIFETIME_HTTP_POOL_MAXSIZE", LIFETIME_HTTP_POOL_MAXSIZE),
+                                              get_configuration_value("LIFETIME_HTTP_KEEP_ALIVE", LIFETIME_HTTP_KEEP_ALIVE))
+            if get_configuration_value("LIFETIME_HTTP_LOG_STATS", LIFETIME_HTTP_LOG_STATS):
+                atexit.register(_print_client_stats, _lifetime_client)
+        return _lifetime_client
+
 
 # Method that builds the LifeTime endpoint based on the LT host
 def build_lt_endpoint(lt_http_proto: str, lt_url: str, lt_api_endpoint: str, lt_api_version: int):
@@ -17,15 +86,18 @@ def build_lt_endpoint(lt_http_proto: str, lt_url: str, lt_api_endpoint: str, lt_
     return "{}://{}/{}/v{}".format(lt_http_proto, lt_url, lt_api_endpoint, lt_api_version)
 
 
-# Sends a GET request to LT, with url_params
-def send_get_request(lt_api: str, token: str, api_endpoint: str, url_params: dict):
+# Sends a GET request to LT, with url_params and optional extra headers (e.g. conditional request headers)
+# The response headers are returned as well, so callers can keep cache validators (ETag / Last-Modified)
+def send_get_request(lt_api: str, token: str, api_endpoint: str, url_params: dict, extra_headers: dict = None):
     # Auth token + content type json
     headers = {'content-type': 'application/json',
                'authorization': 'Bearer ' + token}
+    if extra_headers:
+        headers.update(extra_headers)
     # Format the request URL to include the api endpoint
     request_string = "{}/{}".format(lt_api, api_endpoint)
-    response = requests.get(request_string, params=url_params, headers=headers, verify=get_configuration_value("LIFETIME_SSL_CERT_VERIFY", LIFETIME_SSL_CERT_VERIFY))
-    response_obj = {"http_status": response.status_code, "response": {}}
+    response = get_lifetime_client().get(request_string, params=url_params, headers=headers, verify=get_configuration_value("LIFETIME_SSL_CERT_VERIFY", LIFETIME_SSL_CERT_VERIFY))
+    response_obj = {"http_status": response.status_code, "response": {}, "headers": response.headers}
     if len(response.text) > 0:
         try:
             response_obj["response"] = response.json()
@@ -42,7 +114,7 @@ def send_post_request(lt_api: str, token: str, api_endpoint: str, payload: str):
                'authorization': 'Bearer ' + token}
     # Format the request URL to include the api endpoint
     request_string = "{}/{}".format(lt_api, api_endpoint)
-    response = requests.post(
+    response = get_lifetime_client().post(
         request_string, data=payload, json=None, headers=headers, verify=get_configuration_value("LIFETIME_SSL_CERT_VERIFY", LIFETIME_SSL_CERT_VERIFY))
     response_obj = {"http_status": response.status_code, "response": {}}
     # Since LT API POST requests do not reply with native JSON, we have to make it ourselves
@@ -62,7 +134,7 @@ def send_delete_request(lt_api: str, token: str, api_endpoint: str):
                'authorization': 'Bearer ' + token}
     # Format the request URL to include the api endpoint
     request_string = "{}/{}".format(lt_api, api_endpoint)
-    response = requests.delete(request_string, headers=headers, verify=get_configuration_value("LIFETIME_SSL_CERT_VERIFY", LIFETIME_SSL_CERT_VERIFY))
+    response = get_lifetime_client().delete(request_string, headers=headers, verify=get_configuration_value("LIFETIME_SSL_CERT_VERIFY", LIFETIME_SSL_CERT_VERIFY))
     response_obj = {"http_status": response.status_code, "response": {}}
     if len(response.text) > 0:
         try:
@@ -71,3 +143,67 @@ def send_delete_request(lt_api: str, token: str, api_endpoint: str):
             raise InvalidJsonResponseError(
                 "DELETE {}: The JSON response could not be parsed. Response: {}".format(request_string, response.text))
     return response_obj
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Transport adapter whose connection pools report every opened connection back to the LifeTime client
+class _CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, client: LifeTimeClient, **kwargs):
+        self._client = client
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": partial(self._new_pool, _CountingHTTPConnectionPool),
+            "https": partial(self._new_pool, _CountingHTTPSConnectionPool)
+        }
+
+    def _new_pool(self, pool_cls, host: str, port: int, **kwargs):
+        pool = pool_cls(host, port, **kwargs)
+        pool.lifetime_client = self._client
+        return pool
+
+
+# Connections count every socket they open, including reconnects of a connection object that was closed by the server
+class _CountingHTTPConnection(HTTPConnection):
+    lifetime_client = None
+
+    def connect(self):
+        if self.lifetime_client:
+            self.lifetime_client._count_connection()
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    lifetime_client = None
+
+    def connect(self):
+        if self.lifetime_client:
+            self.lifetime_client._count_connection()
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+    lifetime_client = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.lifetime_client = self.lifetime_client
+        return conn
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+    lifetime_client = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.lifetime_client = self.lifetime_client
+        return conn
+
+
+def _print_client_stats(client: LifeTimeClient):
+    stats = client.get_stats()
+    print("LifeTime HTTP client: {} requests sent using {} connections.".format(stats["requests_sent"], stats["connections_opened"]), flush=True)
@@ -2,6 +2,9 @@
 import json
 import os
 import datetime
+import random
+import threading
+import time
 
 # Custom Modules
 # Exceptions
@@ -11,10 +14,12 @@ from outsystems.exceptions.not_enough_permissions import NotEnoughPermissionsErr
 from outsystems.exceptions.server_error import ServerError
 from outsystems.exceptions.environment_not_found import EnvironmentNotFoundError
 from outsystems.exceptions.impossible_action_deployment import ImpossibleApplyActionDeploymentError
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
 # Functions
 from outsystems.lifetime.lifetime_base import send_get_request, send_post_request, send_delete_request
 from outsystems.lifetime.lifetime_environments import get_environment_key
-from outsystems.file_helpers.file import store_data
+from outsystems.file_helpers.file import store_data, load_data, check_file
+from outsystems.vars.vars_base import get_configuration_value
 # Variables
 from outsystems.vars.lifetime_vars import DEPLOYMENTS_ENDPOINT, DEPLOYMENT_STATUS_ENDPOINT, \
     DEPLOYMENT_START_ENDPOINT, DEPLOYMENT_CONTINUE_ENDPOINT, DEPLOYMENTS_SUCCESS_CODE, DEPLOYMENTS_EMPTY_CODE, \
@@ -26,7 +31,15 @@ from outsystems.vars.lifetime_vars import DEPLOYMENTS_ENDPOINT, DEPLOYMENT_STATU
     DEPLOYMENT_DELETE_FAILED_CODE, DEPLOYMENT_ACTION_SUCCESS_CODE, DEPLOYMENT_ACTION_IMPOSSIBLE_CODE, DEPLOYMENT_ACTION_NO_PERMISSION_CODE, \
     DEPLOYMENT_ACTION_NO_DEPLOYMENT_CODE, DEPLOYMENT_ACTION_FAILED_CODE, DEPLOYMENT_PLAN_V1_API_OPS, DEPLOYMENT_PLAN_V2_API_OPS
 from outsystems.vars.file_vars import DEPLOYMENTS_FILE, DEPLOYMENT_FILE, DEPLOYMENT_FOLDER, DEPLOYMENT_STATUS_FILE
-from outsystems.vars.pipeline_vars import DEPLOYMENT_STATUS_LIST, DEPLOYMENT_SAVED_STATUS
+from outsystems.vars.pipeline_vars import DEPLOYMENT_STATUS_LIST, DEPLOYMENT_SAVED_STATUS, DEPLOYMENT_RUNNING_STATUS, \
+    DEPLOYMENT_TIMEOUT_IN_SECS, QUEUE_TIMEOUT_IN_SECS, SLEEP_PERIOD_IN_SECS, DEPLOYMENT_POLL_INITIAL_INTERVAL_IN_SECS, \
+    DEPLOYMENT_POLL_BACKOFF_FACTOR, DEPLOYMENT_POLL_JITTER_PERCENT, DEPLOYMENT_TERMINAL_STATUS_LIST
+
+# Statuses of finished deployment plans, by deployment key (they never change again)
+_terminal_statuses = {}
+# Deployments listed so far and the MinDate of the next listing, by (artifact dir, LifeTime endpoint)
+_deployment_windows = {}
+_deployments_lock = threading.Lock()
 
 
 # Returns a list of deployments ordered by creation date, from newest to oldest.
@@ -119,48 +132,25 @@ def get_deployment_status(artifact_dir: str, endpoint: str, auth_token: str, dep
 def get_running_deployment(artifact_dir: str, endpoint: str, auth_token: str, dest_env_key: str):
     # List of running deployments
     running_deployments = []
-    # Date 24h prior to now
-    date = datetime.datetime.now() - datetime.timedelta(days=1)
-    date = date.date()
-    try:
-        latest_deployments = get_deployments(artifact_dir, endpoint, auth_token, date)
-        for deplyoment in latest_deployments:
-            if deplyoment["TargetEnvironmentKey"] == dest_env_key:
-                deployment_status = get_deployment_status(artifact_dir, endpoint, auth_token, deplyoment["Key"])
-                if deployment_status["DeploymentStatus"] in DEPLOYMENT_STATUS_LIST:
-                    running_deployments.append(deplyoment)
-
-        return running_deployments
+    for deployment in _get_recent_deployments(artifact_dir, endpoint, auth_token):
+        if deployment["TargetEnvironmentKey"] == dest_env_key:
+            deployment_status = _get_known_deployment_status(artifact_dir, endpoint, auth_token, deployment["Key"])
+            if deployment_status in DEPLOYMENT_STATUS_LIST:
+                running_deployments.append(deployment)
 
-    except NoDeploymentsError:
-        # If there are no deployments, return empty
-        return running_deployments
-    except:
-        # Legit exception that needs to be handle -> bubble up
-        raise
+    return running_deployments
 
 
 # Returns the details of the saved deployment plan to a specific target environment or None if nothing is found
 def get_saved_deployment(artifact_dir: str, endpoint: str, auth_token: str, dest_env_key: str):
-    # Date 24h prior to now
-    date = datetime.datetime.now() - datetime.timedelta(days=1)
-    date = date.date()
-    try:
-        latest_deployments = get_deployments(artifact_dir, endpoint, auth_token, date)
-        for deployment in latest_deployments:
-            if deployment["TargetEnvironmentKey"] == dest_env_key:
-                deployment_status = get_deployment_status(artifact_dir, endpoint, auth_token, deployment["Key"])
-                if deployment_status["DeploymentStatus"] in DEPLOYMENT_SAVED_STATUS:
-                    return deployment
-
-        return None
+    for deployment in _get_recent_deployments(artifact_dir, endpoint, auth_token):
+        if deployment["TargetEnvironmentKey"] == dest_env_key:
+            deployment_status = _get_known_deployment_status(artifact_dir, endpoint, auth_token, deployment["Key"])
+            # Deleted deployments have no status (None) and are skipped
+            if deployment_status == DEPLOYMENT_SAVED_STATUS:
+                return deployment
 
-    except NoDeploymentsError:
-        # If there are no deployments, return empty
-        return None
-    except:
-        # Legit exception that needs to be handle -> bubble up
-        raise
+    return None
 
 
 # Creates a deployment to a target environment.
@@ -201,6 +191,7 @@ def delete_deployment(endpoint: str, auth_token: str, deployment_key: str):
     response = send_delete_request(endpoint, auth_token, query)
     status_code = int(response["http_status"])
     if status_code == DEPLOYMENT_DELETE_SUCCESS_CODE:
+        _forget_deployment(deployment_key)
         return response["response"]
     elif status_code == DEPLOYMENT_DELETE_IMPOSSIBLE_CODE:
         raise ImpossibleApplyActionDeploymentError(
@@ -293,7 +284,165 @@ def check_deployment_two_step_deploy_status(dep_status: dict):
     return dep_status["Info"] == "deployment_prepared"
 
 
+# Polling schedule against a deadline: starts at DEPLOYMENT_POLL_INITIAL_INTERVAL_IN_SECS and backs off exponentially,
+# with jitter, up to SLEEP_PERIOD_IN_SECS. Elapsed time and deadline use the monotonic clock, so the timeout holds
+# regardless of how long each LifeTime call takes.
+class AdaptivePolling:
+    def __init__(self, timeout: int):
+        self.initial_interval = get_configuration_value("DEPLOYMENT_POLL_INITIAL_INTERVAL_IN_SECS", DEPLOYMENT_POLL_INITIAL_INTERVAL_IN_SECS)
+        self.max_interval = get_configuration_value("SLEEP_PERIOD_IN_SECS", SLEEP_PERIOD_IN_SECS)
+        self.backoff_factor = get_configuration_value("DEPLOYMENT_POLL_BACKOFF_FACTOR", DEPLOYMENT_POLL_BACKOFF_FACTOR)
+        self.jitter = get_configuration_value("DEPLOYMENT_POLL_JITTER_PERCENT", DEPLOYMENT_POLL_JITTER_PERCENT) / 100
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + timeout
+        self.interval = min(self.initial_interval, self.max_interval)
+
+    # Seconds since the polling started
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    # Goes back to the initial (fast) interval, e.g. after something changed
+    def reset(self):
+        self.interval = min(self.initial_interval, self.max_interval)
+
+    # Sleeps until the next poll (never past the deadline) and backs off the interval for the one after it.
+    # Raises DeploymentTimeoutError when the deadline was already reached.
+    def wait(self):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeploymentTimeoutError("Timeout of {} secs reached.".format(round(self.deadline - self.started_at)))
+        # Jitter only shortens the wait, so the interval never goes above the configured sleep period
+        time.sleep(min(self.interval * random.uniform(1 - self.jitter, 1), remaining))
+        self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+
+
+# Watches the status of a deployment plan until it leaves the running status. Shared by the deployment scripts, it
+# polls fast right after a change and slows down while nothing happens. Transition callbacks are called with
+# (old_status, new_status, dep_status) on every status change, the first poll included (old_status is None).
+class DeploymentWatcher:
+    def __init__(self, artifact_dir: str, endpoint: str, auth_token: str, deployment_key: str, timeout: int = None, on_transition=None):
+        self.artifact_dir = artifact_dir
+        self.endpoint = endpoint
+        self.auth_token = auth_token
+        self.deployment_key = deployment_key
+        if timeout is None:
+            timeout = get_configuration_value("DEPLOYMENT_TIMEOUT_IN_SECS", DEPLOYMENT_TIMEOUT_IN_SECS)
+        # The deadline is shared by every wait_while_running call
+        self.polling = AdaptivePolling(timeout)
+        self.status = None
+        self._transition_callbacks = [on_transition] if on_transition else []
+        self._last_progress = 0
+
+    def add_transition_callback(self, callback):
+        self._transition_callbacks.append(callback)
+
+    # Returns the deployment status as soon as it is not running. The first call checks the status right away, the
+    # following ones (e.g. after resuming a plan waiting for intervention) wait before checking it.
+    # Raises DeploymentTimeoutError if the deployment timeout is reached first.
+    def wait_while_running(self):
+        while True:
+            if self.status is not None:
+                self.polling.wait()
+                self._report_progress()
+            dep_status = get_deployment_status(self.artifact_dir, self.endpoint, self.auth_token, self.deployment_key)
+            new_status = dep_status["DeploymentStatus"]
+            if new_status != self.status:
+                old_status = self.status
+                self.status = new_status
+                for callback in self._transition_callbacks:
+                    callback(old_status, new_status, dep_status)
+                # Something changed: poll fast again
+                self.polling.reset()
+            if new_status != DEPLOYMENT_RUNNING_STATUS:
+                return dep_status
+
+    # Prints the elapsed time, at most once every SLEEP_PERIOD_IN_SECS (like the fixed-period loop it replaces)
+    def _report_progress(self):
+        elapsed = int(self.polling.elapsed())
+        if elapsed - self._last_progress >= self.polling.max_interval:
+            self._last_progress = elapsed
+            print("{} secs have passed since the deployment started...".format(elapsed), flush=True)
+
+
+# Waits until there is no deployment plan running on the target environment, using the same adaptive polling as the
+# deployment watcher. Raises DeploymentTimeoutError if LifeTime is still busy after the timeout (QUEUE_TIMEOUT_IN_SECS).
+def wait_for_free_environment(artifact_dir: str, endpoint: str, auth_token: str, dest_env_key: str, timeout: int = None):
+    if timeout is None:
+        timeout = get_configuration_value("QUEUE_TIMEOUT_IN_SECS", QUEUE_TIMEOUT_IN_SECS)
+    polling = AdaptivePolling(timeout)
+    while len(get_running_deployment(artifact_dir, endpoint, auth_token, dest_env_key)) > 0:
+        polling.wait()
+        print("Waiting for LifeTime to be free. Elapsed time: {} seconds...".format(int(polling.elapsed())), flush=True)
+
+
 # ---------------------- PRIVATE METHODS ----------------------
+# Returns the deployments created in the last 24h, newest first. The first call lists the whole window, the following
+# ones (e.g. while waiting for LifeTime to be free) only ask for deployments created since the newest one already known.
+# Deployments that leave the 24h window are dropped, as they would be from a new listing.
+def _get_recent_deployments(artifact_dir: str, endpoint: str, auth_token: str):
+    # Date 24h prior to now
+    window_start = (datetime.datetime.now() - datetime.timedelta(days=1)).date()
+    with _deployments_lock:
+        window = _deployment_windows.setdefault((artifact_dir, endpoint), {"min_date": None, "deployments": {}})
+        min_date = window["min_date"]
+    if min_date is None:
+        min_date = window_start
+    try:
+        latest_deployments = get_deployments(artifact_dir, endpoint, auth_token, min_date)
+    except NoDeploymentsError:
+        # If there are no deployments, keep the ones already known
+        latest_deployments = []
+    with _deployments_lock:
+        # Newest deployments go first, the ones already known keep their order after them
+        deployments = {deployment["Key"]: deployment for deployment in latest_deployments}
+        for key, deployment in window["deployments"].items():
+            deployments.setdefault(key, deployment)
+        # Otherwise an old saved or stuck plan would be checked (and counted as running) for the life of the process
+        deployments = {key: deployment for key, deployment in deployments.items() if not _is_created_before(deployment, window_start)}
+        window["deployments"] = deployments
+        created_on = [deployment["CreatedOn"] for deployment in latest_deployments if deployment.get("CreatedOn")]
+        if created_on:
+            # LifeTime's own timestamps (not the local clock) move the window forward. The newest deployment is listed
+            # again on the next call, since MinDate is inclusive, which also covers plans created in the same instant.
+            window["min_date"] = max(created_on + ([window["min_date"]] if window["min_date"] else []))
+        return list(deployments.values())
+
+
+# Returns the status of a deployment, asking LifeTime only while it can still change: terminal statuses are kept for
+# the lifetime of the process and read back from the status cache file of previous runs (a finished plan stays finished).
+# Returns None if the deployment no longer exists (e.g. a saved plan that was deleted).
+def _get_known_deployment_status(artifact_dir: str, endpoint: str, auth_token: str, deployment_key: str):
+    with _deployments_lock:
+        if deployment_key in _terminal_statuses:
+            return _terminal_statuses[deployment_key]
+    filename = os.path.join(DEPLOYMENT_FOLDER, "{}{}".format(deployment_key, DEPLOYMENT_STATUS_FILE))
+    dep_status = load_data(artifact_dir, filename) if check_file(artifact_dir, filename) else None
+    if dep_status is None or dep_status.get("DeploymentStatus") not in DEPLOYMENT_TERMINAL_STATUS_LIST:
+        try:
+            dep_status = get_deployment_status(artifact_dir, endpoint, auth_token, deployment_key)
+        except NoDeploymentsError:
+            _forget_deployment(deployment_key)
+            return None
+    status = dep_status["DeploymentStatus"]
+    if status in DEPLOYMENT_TERMINAL_STATUS_LIST:
+        with _deployments_lock:
+            _terminal_statuses[deployment_key] = status
+    return status
+
+
+# Checks if a deployment was created before a date (deployments without a creation date are kept)
+def _is_created_before(deployment: dict, date: datetime.date):
+    created_on = deployment.get("CreatedOn")
+    return bool(created_on) and datetime.date.fromisoformat(created_on[:10]) < date
+
+
+# Drops a deployment from every known window, so it is not checked again
+def _forget_deployment(deployment_key: str):
+    with _deployments_lock:
+        for window in _deployment_windows.values():
+            window["deployments"].pop(deployment_key, None)
+
+
 def _create_deployment_plan(artifact_dir: str, endpoint: str, lt_api_version: int, auth_token: str, app_keys: str, dep_note: str, source_env: str, dest_env: str):
     if lt_api_version == 1:
         api_var_name = DEPLOYMENT_PLAN_V1_API_OPS
@@ -11,26 +11,45 @@ from outsystems.exceptions.server_error import ServerError
 # Functions
 from outsystems.lifetime.lifetime_base import send_get_request
 from outsystems.lifetime.lifetime_applications import _get_application_info
-from outsystems.file_helpers.file import load_data, store_data, clear_cache
+from outsystems.lifetime.lifetime_lookup import set_lookup_index, find_in_lookup_index
+from outsystems.file_helpers.file import store_data, load_data, store_cache_metadata, is_cache_fresh, get_cache_validators, \
+    touch_cache_metadata
+from outsystems.vars.vars_base import get_configuration_value
 # Variables
 from outsystems.vars.lifetime_vars import ENVIRONMENTS_ENDPOINT, ENVIRONMENT_APPLICATIONS_ENDPOINT, ENVIRONMENTS_SUCCESS_CODE, \
-    ENVIRONMENTS_NOT_FOUND_CODE, ENVIRONMENTS_FAILED_CODE, ENVIRONMENT_APP_SUCCESS_CODE, ENVIRONMENT_APP_NOT_STATUS_CODE, \
+    ENVIRONMENTS_NOT_FOUND_CODE, ENVIRONMENTS_NOT_MODIFIED_CODE, ENVIRONMENTS_FAILED_CODE, ENVIRONMENT_APP_SUCCESS_CODE, ENVIRONMENT_APP_NOT_STATUS_CODE, \
     ENVIRONMENT_APP_NO_PERMISSION_CODE, ENVIRONMENT_APP_NOT_FOUND, ENVIRONMENT_APP_FAILED_CODE, ENVIRONMENT_DEPLOYMENT_ZONES_ENDPOINT, \
     ENVIRONMENT_ZONES_SUCCESS_CODE, ENVIRONMENT_ZONES_NOT_STATUS_CODE, ENVIRONMENT_ZONES_NO_PERMISSION_CODE, ENVIRONMENT_ZONES_NOT_FOUND, \
     ENVIRONMENT_ZONES_FAILED_CODE
-from outsystems.vars.file_vars import ENVIRONMENTS_FILE, ENVIRONMENT_FOLDER, ENVIRONMENT_APPLICATION_FILE, ENVIRONMENT_DEPLOYMENT_ZONES_FILE
+from outsystems.vars.file_vars import ENVIRONMENTS_FILE, ENVIRONMENT_FOLDER, ENVIRONMENT_APPLICATION_FILE, ENVIRONMENT_DEPLOYMENT_ZONES_FILE, \
+    ENVIRONMENTS_CACHE_TTL_IN_SECS
 
 
 # Lists all the environments in the infrastructure.
-def get_environments(artifact_dir: str, endpoint: str, auth_token: str):
+# With use_cache, a list cached less than ENVIRONMENTS_CACHE_TTL_IN_SECS ago is returned as-is.
+# Otherwise the cached list is revalidated with a conditional request, when LifeTime returned validators for it.
+def get_environments(artifact_dir: str, endpoint: str, auth_token: str, use_cache: bool = False):
+    if use_cache and is_cache_fresh(artifact_dir, ENVIRONMENTS_FILE, None, get_configuration_value("ENVIRONMENTS_CACHE_TTL_IN_SECS", ENVIRONMENTS_CACHE_TTL_IN_SECS)):
+        environments = load_data(artifact_dir, ENVIRONMENTS_FILE)
+        set_lookup_index(artifact_dir, ENVIRONMENTS_FILE, environments)
+        return environments
     # Sends the request
     response = send_get_request(
-        endpoint, auth_token, ENVIRONMENTS_ENDPOINT, None)
+        endpoint, auth_token, ENVIRONMENTS_ENDPOINT, None, get_cache_validators(artifact_dir, ENVIRONMENTS_FILE, None))
     status_code = int(response["http_status"])
     if status_code == ENVIRONMENTS_SUCCESS_CODE:
         # Stores the result
         store_data(artifact_dir, ENVIRONMENTS_FILE, response["response"])
+        store_cache_metadata(artifact_dir, ENVIRONMENTS_FILE, None, response["headers"])
+        # Refreshes the in-process name/key index with the new list
+        set_lookup_index(artifact_dir, ENVIRONMENTS_FILE, response["response"])
         return response["response"]
+    elif status_code == ENVIRONMENTS_NOT_MODIFIED_CODE:
+        # The cached list is still valid
+        touch_cache_metadata(artifact_dir, ENVIRONMENTS_FILE)
+        environments = load_data(artifact_dir, ENVIRONMENTS_FILE)
+        set_lookup_index(artifact_dir, ENVIRONMENTS_FILE, environments)
+        return environments
     elif status_code == ENVIRONMENTS_NOT_FOUND_CODE:
         raise EnvironmentNotFoundError(
             "No environments found. Details {}".format(response["response"]))
@@ -139,81 +158,31 @@ def _get_environment_info(artifact_dir: str, api_url: str, auth_token: str, **kw
 
 # Private method to find an environment key from name
 def _find_environment_key(artifact_dir: str, api_url: str, auth_token: str, environment_name: str):
-    env_key = ""
-    cached_results = False
-    try:
-        # Try searching the key on the cache
-        environments = load_data(artifact_dir, ENVIRONMENTS_FILE)
-        cached_results = True
-    except:
-        # Query the LT API, since there's no cache
-        environments = get_environments(artifact_dir, api_url, auth_token)
-    for env in environments:
-        if env["Name"] == environment_name:
-            env_key = env["Key"]
-            break
-    # If the env key  was not found, determine if it needs to invalidate the cache or the application does not exist
-    # since we explitly clear the cache, and the code is not multithreaded, it should not lead to recursion issues
-    # If the cache was not used in the first place, it means the app does not exist
-    if env_key == "" and not cached_results:
+    env_key = find_in_lookup_index(artifact_dir, ENVIRONMENTS_FILE, "key", environment_name,
+                                   lambda: get_environments(artifact_dir, api_url, auth_token))
+    # If the env key was not found, even after refreshing the list from LifeTime, the environment does not exist
+    if env_key is None:
         raise EnvironmentNotFoundError(
             "Failed to retrieve the environment. Please make sure the environment exists. Environment name: {}".format(environment_name))
-    # If the cache was used, it needs to be cleared and re-fetched from the LT server
-    elif env_key == "" and cached_results:
-        clear_cache(artifact_dir, ENVIRONMENTS_FILE)
-        return _find_environment_key(artifact_dir, api_url, auth_token, environment_name)
     return env_key
 
 
 # Private method to find an environment name from key
 def _find_environment_name(artifact_dir: str, api_url: str, auth_token: str, environment_key: str):
-    env_name = ""
-    cached_results = False
-    try:
-        # Try searching the key on the cache
-        environments = load_data(artifact_dir, ENVIRONMENTS_FILE)
-        cached_results = True
-    except:
-        # Query the LT API, since there's no cache
-        environments = get_environments(artifact_dir, api_url, auth_token)
-    for env in environments:
-        if env["Key"] == environment_key:
-            env_name = env["Name"]
-            break
-    # If the env key  was not found, determine if it needs to invalidate the cache or the application does not exist
-    # since we explitly clear the cache, and the code is not multithreaded, it should not lead to recursion issues
-    # If the cache was not used in the first place, it means the app does not exist
-    if env_name == "" and not cached_results:
+    env_name = find_in_lookup_index(artifact_dir, ENVIRONMENTS_FILE, "name", environment_key,
+                                    lambda: get_environments(artifact_dir, api_url, auth_token))
+    # If the env name was not found, even after refreshing the list from LifeTime, the environment does not exist
+    if env_name is None:
         raise EnvironmentNotFoundError(
             "Failed to retrieve the environment. Please make sure the environment exists. Environment key: {}".format(environment_key))
-    # If the cache was used, it needs to be cleared and re-fetched from the LT server
-    elif env_name == "" and cached_results:
-        clear_cache(artifact_dir, ENVIRONMENTS_FILE)
-        return _find_environment_name(artifact_dir, api_url, auth_token, environment_key)
     return env_name
 
 
 def _find_environment_url(artifact_dir: str, api_url: str, auth_token: str, environment_name: str):
-    env_url = ""
-    cached_results = False
-    try:
-        # Try searching the key on the cache
-        environments = load_data(artifact_dir, ENVIRONMENTS_FILE)
-        cached_results = True
-    except:
-        # Query the LT API, since there's no cache
-        environments = get_environments(artifact_dir, api_url, auth_token)
-    for env in environments:
-        if env["Name"] == environment_name:
-            env_url = env["HostName"]
-    # If the env key  was not found, determine if it needs to invalidate the cache or the application does not exist
-    # since we explitly clear the cache, and the code is not multithreaded, it should not lead to recursion issues
-    # If the cache was not used in the first place, it means the app does not exist
-    if env_url == "" and not cached_results:
+    env_url = find_in_lookup_index(artifact_dir, ENVIRONMENTS_FILE, "hostname", environment_name,
+                                   lambda: get_environments(artifact_dir, api_url, auth_token))
+    # If the env url was not found, even after refreshing the list from LifeTime, the environment does not exist
+    if env_url is None:
         raise EnvironmentNotFoundError(
             "Failed to retrieve the environment. Please make sure the environment exists. Environment name: {}".format(environment_name))
-    # If the cache was used, it needs to be cleared and re-fetched from the LT server
-    elif env_url == "" and cached_results:
-        clear_cache(artifact_dir, ENVIRONMENTS_FILE)
-        return _find_environment_url(artifact_dir, api_url, auth_token, environment_name)
     return env_url
@@ -0,0 +1,159 @@
+# Python Modules
+import os
+import threading
+import time
+
+# Functions
+from outsystems.file_helpers.file import load_data
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.lifetime_vars import LOOKUP_NEGATIVE_CACHE_TTL_IN_SECS
+
+# In-process lookup indexes, shared by every name/key lookup and keyed by the path of the cache file they mirror
+_lookup_indexes = {}
+# Values confirmed missing from a fresh list, per index: {(lookup, value): expiry (monotonic)}
+_lookup_misses = {}
+# Refreshes currently in flight, per index
+_lookup_refreshes = {}
+_lookup_indexes_lock = threading.Lock()
+
+
+# Two-way index (name <-> key) over a list of LifeTime records (applications or environments), plus name -> hostname
+# for records that have one. Built once per process from the cache file or from a fresh LifeTime call.
+class LookupIndex:
+    def __init__(self, records: list):
+        self.keys_by_name = {}
+        self.names_by_key = {}
+        self.hostnames_by_name = {}
+        for record in records:
+            # Keep the first match for names and keys, like the linear search this index replaces
+            self.keys_by_name.setdefault(record["Name"], record["Key"])
+            self.names_by_key.setdefault(record["Key"], record["Name"])
+            if "HostName" in record:
+                self.hostnames_by_name[record["Name"]] = record["HostName"]
+
+    def get_key(self, name: str):
+        return self.keys_by_name.get(name)
+
+    def get_name(self, key: str):
+        return self.names_by_key.get(key)
+
+    def get_hostname(self, name: str):
+        return self.hostnames_by_name.get(name)
+
+
+# Single-flight call: the first caller runs it, callers arriving while it runs wait and get the same result (or exception)
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Returns the index for a given cache file or None if it was not built yet (or was invalidated)
+def get_lookup_index(artifact_dir: str, filename: str):
+    with _lookup_indexes_lock:
+        return _lookup_indexes.get(_index_id(artifact_dir, filename))
+
+
+# Builds (or rebuilds) the index for a given cache file from its records
+def set_lookup_index(artifact_dir: str, filename: str, records: list):
+    index = LookupIndex(records)
+    index_id = _index_id(artifact_dir, filename)
+    with _lookup_indexes_lock:
+        _lookup_indexes[index_id] = index
+        # New data may contain what was missing before
+        _lookup_misses.pop(index_id, None)
+    return index
+
+
+# Drops the index for a given cache file, so the next lookup rebuilds it
+def invalidate_lookup_index(artifact_dir: str, filename: str):
+    index_id = _index_id(artifact_dir, filename)
+    with _lookup_indexes_lock:
+        _lookup_indexes.pop(index_id, None)
+        _lookup_misses.pop(index_id, None)
+
+
+# Replaces a stale index with a fresh one, fetched with fetch_records (e.g. a get_applications call).
+# Concurrent callers holding the same stale index share a single fetch, and callers arriving after the index was already
+# replaced get the new one without fetching again. Use stale_index=None when no index was built yet.
+def refresh_lookup_index(artifact_dir: str, filename: str, stale_index: LookupIndex, fetch_records):
+    index_id = _index_id(artifact_dir, filename)
+    with _lookup_indexes_lock:
+        current = _lookup_indexes.get(index_id)
+        if current is not None and current is not stale_index:
+            return current
+        flight = _lookup_refreshes.get(index_id)
+        leader = flight is None
+        if leader:
+            flight = _lookup_refreshes[index_id] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = set_lookup_index(artifact_dir, filename, fetch_records())
+        return flight.result
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _lookup_indexes_lock:
+            _lookup_refreshes.pop(index_id, None)
+        flight.done.set()
+
+
+# Records that a value (lookup is "key", "name" or "hostname") is missing from a freshly fetched list
+def remember_lookup_miss(artifact_dir: str, filename: str, lookup: str, value: str):
+    ttl = get_configuration_value("LOOKUP_NEGATIVE_CACHE_TTL_IN_SECS", LOOKUP_NEGATIVE_CACHE_TTL_IN_SECS)
+    with _lookup_indexes_lock:
+        _lookup_misses.setdefault(_index_id(artifact_dir, filename), {})[(lookup, value)] = time.monotonic() + ttl
+
+
+# Checks if a value was recently confirmed missing, in which case there's no point refetching the list
+def is_known_lookup_miss(artifact_dir: str, filename: str, lookup: str, value: str):
+    with _lookup_indexes_lock:
+        misses = _lookup_misses.get(_index_id(artifact_dir, filename), {})
+        expiry = misses.get((lookup, value))
+        if expiry is None:
+            return False
+        if expiry <= time.monotonic():
+            del misses[(lookup, value)]
+            return False
+        return True
+
+
+# Looks up a value in the index of a given cache file (lookup is "key" for name -> key, "name" for key -> name or
+# "hostname" for name -> hostname). The index is built from the cache file or, when there's none, from fetch_records.
+# A miss on cached data refreshes the list once from LifeTime (single-flight); a miss on fresh data is remembered
+# for LOOKUP_NEGATIVE_CACHE_TTL_IN_SECS. Returns None if the value does not exist.
+def find_in_lookup_index(artifact_dir: str, filename: str, lookup: str, value: str, fetch_records):
+    fetched = False
+    index = get_lookup_index(artifact_dir, filename)
+    if index is None:
+        try:
+            # Try building the index from the cache
+            index = set_lookup_index(artifact_dir, filename, load_data(artifact_dir, filename))
+        except (FileNotFoundError, ValueError):
+            # Query the LT API, since there's no (valid) cache
+            index = refresh_lookup_index(artifact_dir, filename, None, fetch_records)
+            fetched = True
+    result = getattr(index, "get_" + lookup)(value)
+    # If the cache was used, it needs to be re-fetched from the LT server, unless it was recently confirmed missing
+    if not result and not fetched and not is_known_lookup_miss(artifact_dir, filename, lookup, value):
+        index = refresh_lookup_index(artifact_dir, filename, index, fetch_records)
+        result = getattr(index, "get_" + lookup)(value)
+        fetched = True
+    if not result:
+        # Only a miss on freshly fetched data starts the TTL: misses answered from the negative cache don't extend it
+        if fetched:
+            remember_lookup_miss(artifact_dir, filename, lookup, value)
+        return None
+    return result
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+def _index_id(artifact_dir: str, filename: str):
+    return os.path.abspath(os.path.join(artifact_dir, filename))
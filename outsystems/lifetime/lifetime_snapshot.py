@@ -0,0 +1,41 @@
+# Python Modules
+
+# Custom Modules
+# Functions
+from outsystems.lifetime.lifetime_applications import get_applications
+
+
+# Point-in-time view of every application and of its status in each environment, built from a single
+# bulk "applications?IncludeEnvStatus=true" call. Lookups by app key/name and environment key are O(1).
+class EnvironmentSnapshot:
+    def __init__(self, applications: list):
+        self.applications = {}
+        self.application_keys = {}
+        self.app_status_in_envs = {}
+        for app in applications:
+            self.applications[app["Key"]] = app
+            self.application_keys[app["Name"]] = app["Key"]
+            for status_in_env in app.get("AppStatusInEnvs") or []:
+                self.app_status_in_envs[(app["Key"], status_in_env["EnvironmentKey"])] = status_in_env
+
+    # Returns the application record as listed by LifeTime (AppStatusInEnvs included) or None if the app does not exist
+    def get_application(self, app_key: str):
+        return self.applications.get(app_key)
+
+    # Returns the application key for a given name or None if the app does not exist
+    def get_application_key(self, app_name: str):
+        return self.application_keys.get(app_name)
+
+    # Returns the status (AppStatusInEnvs entry) of the application in the environment or None if it is not deployed there
+    def get_app_status(self, app_key: str, env_key: str):
+        return self.app_status_in_envs.get((app_key, env_key))
+
+    # Returns the key of the application version running in the environment or None if it is not deployed there
+    def get_running_version_key(self, app_key: str, env_key: str):
+        app_status = self.get_app_status(app_key, env_key)
+        return app_status["BaseApplicationVersionKey"] if app_status else None
+
+
+# Returns a snapshot of all the applications and their status in every environment, using a single LifeTime call.
+def get_environment_snapshot(artifact_dir: str, endpoint: str, auth_token: str):
+    return EnvironmentSnapshot(get_applications(artifact_dir, endpoint, auth_token, True))
@@ -1,13 +1,143 @@
-from subprocess import PIPE, run
+# Python Modules
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+# Custom Modules
 # Exceptions
 from outsystems.exceptions.osptool_error import OSPToolDeploymentError
+from outsystems.exceptions.osptool_timeout import OSPToolTimeoutError
+# Functions
+from outsystems.file_helpers.file import store_data
+from outsystems.vars.vars_base import get_configuration_value
+# Variables
+from outsystems.vars.file_vars import OSPTOOL_TIMING_FILE
+from outsystems.vars.pipeline_vars import OSP_TOOL_TIMEOUT_IN_SECS, OSP_TOOL_COMPILE_MARKERS, OSP_TOOL_PUBLISH_MARKERS
+
+# Serializes console output of concurrent OSP Tool runs, so lines are not interleaved
+_console_lock = threading.Lock()
 
 
 # Deploys an OutSystems Application Package (.oap) on a target environment
-def call_osptool(osp_tool_path: str, package_file_path: str, env_hostname: str, credentials: str):
+# The OSP Tool output is streamed to the console (prefixed with the package name) and, if log_file is set, to that file.
+# The run is killed (with any process it started) after OSP_TOOL_TIMEOUT_IN_SECS, when it's set.
+# A timing record (queue, compile and publish durations) is stored next to the package; queued_at is the
+# time.monotonic() of when the deployment was queued, if it waited for its turn.
+def call_osptool(osp_tool_path: str, package_file_path: str, env_hostname: str, credentials: str, log_file: str = None, queued_at: float = None):
 
     command = "{} {} {} {}".format(osp_tool_path, package_file_path, env_hostname, credentials)
-    result = run(command, stderr=PIPE, universal_newlines=True)
+    timeout = get_configuration_value("OSP_TOOL_TIMEOUT_IN_SECS", OSP_TOOL_TIMEOUT_IN_SECS)
+    package_name = os.path.basename(package_file_path)
+    timing = _OSPToolTiming(queued_at)
+
+    log = None
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        log = open(log_file, "w")
+    try:
+        process = _start_process(command)
+        reader = threading.Thread(target=_stream_output, args=(process, package_name, log, timing), daemon=True)
+        reader.start()
+        try:
+            return_code = process.wait(timeout=timeout if timeout > 0 else None)
+        except subprocess.TimeoutExpired:
+            _kill_process_tree(process)
+            process.wait()
+            return_code = None
+        reader.join()
+    finally:
+        if log is not None:
+            log.close()
+
+    timing.finish(return_code)
+    store_data(os.path.dirname(os.path.abspath(package_file_path)), package_name + OSPTOOL_TIMING_FILE, timing.to_record(package_name))
+
+    log_details = "please check the log for more detail: {}".format(log_file) if log_file else "please check the logs for more detail."
+    if return_code is None:
+        raise OSPToolTimeoutError("OSPTool deployment of {} timed out after {} seconds, {}".format(package_name, timeout, log_details))
+    if return_code != 0:
+        raise OSPToolDeploymentError("OSPTool deployment failed, {}".format(log_details))
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Wall clock and phase durations of an OSP Tool run. Phases are detected from the tool output (see OSP_TOOL_*_MARKERS)
+# and only move forward: started -> compile -> publish -> finished.
+class _OSPToolTiming:
+    def __init__(self, queued_at: float):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.queue_secs = self._started - queued_at if queued_at is not None else 0
+        self._compile_started = None
+        self._publish_started = None
+        self._finished = None
+        self.return_code = None
+        self._compile_markers = _get_markers("OSP_TOOL_COMPILE_MARKERS", OSP_TOOL_COMPILE_MARKERS)
+        self._publish_markers = _get_markers("OSP_TOOL_PUBLISH_MARKERS", OSP_TOOL_PUBLISH_MARKERS)
+
+    def on_output(self, line: str):
+        line = line.lower()
+        now = time.monotonic()
+        if self._compile_started is None and self._publish_started is None and any(marker in line for marker in self._compile_markers):
+            self._compile_started = now
+        elif self._publish_started is None and any(marker in line for marker in self._publish_markers):
+            self._publish_started = now
+
+    def finish(self, return_code: int):
+        self._finished = time.monotonic()
+        self.return_code = return_code
+
+    def to_record(self, package_name: str):
+        compile_end = self._publish_started if self._publish_started is not None else self._finished
+        return {
+            "Package": package_name,
+            "StartedAt": self.started_at,
+            "QueueSecs": round(self.queue_secs, 3),
+            "CompileSecs": round(compile_end - self._compile_started, 3) if self._compile_started is not None else None,
+            "PublishSecs": round(self._finished - self._publish_started, 3) if self._publish_started is not None else None,
+            "TotalSecs": round(self._finished - self._started, 3),
+            "ReturnCode": self.return_code,
+            "TimedOut": self.return_code is None
+        }
+
+
+# Returns the lowercase output markers of a phase. Overrides from the environment or the configuration file may be
+# a comma-separated string instead of a list.
+def _get_markers(name: str, default: list):
+    markers = get_configuration_value(name, default)
+    if isinstance(markers, str):
+        markers = markers.split(",")
+    return [marker.strip().lower() for marker in markers if marker.strip()]
+
+
+def _start_process(command: str):
+    if os.name == "nt":
+        # Keep the tool command line as-is on Windows, and give it its own process group so it can be killed as a whole
+        return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, errors="replace",
+                                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    # Own session, so the whole process tree can be killed on timeout
+    return subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, errors="replace",
+                            start_new_session=True)
+
+
+def _stream_output(process: subprocess.Popen, package_name: str, log, timing: _OSPToolTiming):
+    for line in process.stdout:
+        timing.on_output(line)
+        if log is not None:
+            log.write(line)
+            log.flush()
+        with _console_lock:
+            print("[{}] {}".format(package_name, line.rstrip("\n")), flush=True)
+    process.stdout.close()
+
 
-    if result.returncode != 0:
-        raise OSPToolDeploymentError("OSPTool deployment failed, please check the logs for more detail.")
+def _kill_process_tree(process: subprocess.Popen):
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
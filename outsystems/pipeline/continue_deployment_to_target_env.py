@@ -2,7 +2,6 @@
 import sys
 import os
 import argparse
-from time import sleep
 
 # Workaround for Jenkins:
 # Set the path to include the outsystems module
@@ -16,17 +15,17 @@ else:  # Else just add the project dir
 # Variables
 from outsystems.vars.file_vars import ARTIFACT_FOLDER
 from outsystems.vars.lifetime_vars import LIFETIME_HTTP_PROTO, LIFETIME_API_ENDPOINT, LIFETIME_API_VERSION
-from outsystems.vars.pipeline_vars import SLEEP_PERIOD_IN_SECS, \
-    DEPLOYMENT_TIMEOUT_IN_SECS, DEPLOYMENT_RUNNING_STATUS, DEPLOYMENT_WAITING_STATUS, \
+from outsystems.vars.pipeline_vars import DEPLOYMENT_RUNNING_STATUS, DEPLOYMENT_WAITING_STATUS, \
     DEPLOYMENT_ERROR_STATUS_LIST, DEPLOY_ERROR_FILE
 # Functions
 from outsystems.lifetime.lifetime_environments import get_environment_key
 from outsystems.lifetime.lifetime_deployments import get_deployment_status, check_deployment_two_step_deploy_status, \
-    continue_deployment, get_running_deployment
+    continue_deployment, get_running_deployment, DeploymentWatcher
 from outsystems.file_helpers.file import store_data
 from outsystems.lifetime.lifetime_base import build_lt_endpoint
-from outsystems.vars.vars_base import get_configuration_value, load_configuration_file
+from outsystems.vars.vars_base import load_configuration_file
 # Exceptions
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
 
 # ############################################################# SCRIPT ##############################################################
 
@@ -62,12 +61,11 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
         sys.exit(1)
 
     # Sleep thread until deployment has finished
-    wait_counter = 0
-    while wait_counter < get_configuration_value("DEPLOYMENT_TIMEOUT_IN_SECS", DEPLOYMENT_TIMEOUT_IN_SECS):
-        # Check Deployment Plan status.
-        dep_status = get_deployment_status(
-            artifact_dir, lt_endpoint, lt_token, dep_plan_key)
-        if dep_status["DeploymentStatus"] != DEPLOYMENT_RUNNING_STATUS:
+    watcher = DeploymentWatcher(artifact_dir, lt_endpoint, lt_token, dep_plan_key)
+    try:
+        while True:
+            # Wait for the Deployment Plan to leave the running status
+            dep_status = watcher.wait_while_running()
             # Check deployment status is pending approval. Force it to continue (if 2-Step deployment is enabled)
             if dep_status["DeploymentStatus"] == DEPLOYMENT_WAITING_STATUS:
                 continue_deployment(lt_endpoint, lt_token, dep_plan_key)
@@ -81,15 +79,10 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
                 print("Deployment plan finished with status {}.".format(dep_status["DeploymentStatus"]), flush=True)
                 # Exit the script to continue with the pipeline
                 sys.exit(0)
-        # Deployment status is still running. Go back to sleep.
-        sleep_value = get_configuration_value("SLEEP_PERIOD_IN_SECS", SLEEP_PERIOD_IN_SECS)
-        sleep(sleep_value)
-        wait_counter += sleep_value
-        print("{} secs have passed since the deployment started...".format(wait_counter), flush=True)
-
-    # Deployment timeout reached. Exit script with error
-    print("Timeout occurred while deployment plan is still in {} status.".format(DEPLOYMENT_RUNNING_STATUS), flush=True)
-    sys.exit(1)
+    except DeploymentTimeoutError:
+        # Deployment timeout reached. Exit script with error
+        print("Timeout occurred while deployment plan is still in {} status.".format(DEPLOYMENT_RUNNING_STATUS), flush=True)
+        sys.exit(1)
 
 # End of main()
 
@@ -2,6 +2,10 @@
 import sys
 import os
 import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from functools import partial
 
 # Workaround for Jenkins:
 # Set the path to include the outsystems module
@@ -13,23 +17,26 @@ else:  # Else just add the project dir
 
 # Custom Modules
 # Variables
-from outsystems.vars.file_vars import ARTIFACT_FOLDER, APPLICATION_OAP_FOLDER, APPLICATION_OAP_FILE
+from outsystems.vars.file_vars import ARTIFACT_FOLDER, APPLICATION_OAP_FOLDER, APPLICATION_OAP_FILE, OAP_RECORD_SHA256, \
+    OAP_EXPORT_MAX_WORKERS, OAP_DOWNLOAD_MAX_PER_HOST, OAP_DOWNLOAD_MAX_BYTES_PER_SEC, OSPTOOL_LOG_FOLDER
 from outsystems.vars.lifetime_vars import LIFETIME_HTTP_PROTO, LIFETIME_API_ENDPOINT, LIFETIME_API_VERSION, DEPLOYMENT_MESSAGE
 from outsystems.vars.cicd_vars import PROBE_HTTP_PROTO, PROBE_API_ENDPOINT, PROBE_API_VERSION
 # Functions
 from outsystems.lifetime.lifetime_environments import get_environment_key
 from outsystems.lifetime.lifetime_applications import export_app_oap
-from outsystems.file_helpers.file import load_data
+from outsystems.lifetime.lifetime_async import run_concurrently
+from outsystems.file_helpers.file import load_data, get_file_sha256
+from outsystems.file_helpers.download_limits import BandwidthLimiter, HostConcurrencyLimiter
 from outsystems.lifetime.lifetime_base import build_lt_endpoint
 from outsystems.cicd_probe.cicd_base import build_probe_endpoint
 from outsystems.osp_tool.osp_base import call_osptool
-from outsystems.cicd_probe.cicd_dependencies import get_app_dependencies, sort_app_dependencies
-from outsystems.pipeline.deploy_latest_tags_to_target_env import generate_deployment_based_on_manifest as generate_deployment_based_on_deploy_manifest, \
-    generate_regular_deployment
-from outsystems.pipeline.deploy_tags_to_target_env_with_manifest import generate_deployment_based_on_manifest as generate_deployment_based_on_trigger_manifest
-from outsystems.vars.vars_base import load_configuration_file
+from outsystems.cicd_probe.cicd_dependencies import get_app_dependencies
+from outsystems.cicd_probe.cicd_dependency_graph import load_dependency_graph, store_dependency_graph, map_keys_to_oap
+from outsystems.pipeline.engine import DeploymentContext, DeploymentManifestSource, LatestTagsSource, TriggerManifestSource
+from outsystems.vars.vars_base import load_configuration_file, get_configuration_value
 # Exceptions
 from outsystems.exceptions.invalid_parameters import InvalidParametersError
+from outsystems.exceptions.oap_integrity_error import OAPIntegrityError
 
 
 # ############################################################# SCRIPT ##############################################################
@@ -45,35 +52,109 @@ def generate_oap_list(app_data_list: list, friendly_package_names: bool):
     return app_oap_list
 
 
+# Exports the OAPs of the app list, OAP_EXPORT_MAX_WORKERS at a time (each one resolves its download URL and downloads it),
+# with at most OAP_DOWNLOAD_MAX_PER_HOST downloads per host and OAP_DOWNLOAD_MAX_BYTES_PER_SEC bandwidth shared by all
 def export_apps_oap(artifact_dir: str, lt_endpoint: str, lt_token: str, env_key: str, app_oap_list: list):
     print("Application Scope:", flush=True)
-    for app in app_oap_list:
-        file_path = os.path.join(artifact_dir, APPLICATION_OAP_FOLDER, app["filename"])
-        export_app_oap(file_path, lt_endpoint, lt_token, env_key, app_key=app["app_key"], app_version_key=app["version_key"])
-        print("     {} application with version {}, exported as {}".format(app["app_name"], app["app_version"], app["filename"]), flush=True)
+    host_limiter = HostConcurrencyLimiter(get_configuration_value("OAP_DOWNLOAD_MAX_PER_HOST", OAP_DOWNLOAD_MAX_PER_HOST))
+    bandwidth_limiter = BandwidthLimiter(get_configuration_value("OAP_DOWNLOAD_MAX_BYTES_PER_SEC", OAP_DOWNLOAD_MAX_BYTES_PER_SEC))
+    progress = {"exported": 0, "lock": threading.Lock()}
+    calls = [partial(_export_app_oap, artifact_dir, lt_endpoint, lt_token, env_key, app, len(app_oap_list), host_limiter, bandwidth_limiter, progress)
+             for app in app_oap_list]
+    sha256_list = run_concurrently(calls, get_configuration_value("OAP_EXPORT_MAX_WORKERS", OAP_EXPORT_MAX_WORKERS))
+    if get_configuration_value("OAP_RECORD_SHA256", OAP_RECORD_SHA256):
+        for app, sha256 in zip(app_oap_list, sha256_list):
+            app["sha256"] = sha256
 
 
 def generate_deployment_order(artifact_dir: str, probe_endpoint: str, api_key: str, app_oap_list: list):
-    dependencies_list = {}
-    for app in app_oap_list:
-        dependencies_list[app["app_key"]] = get_app_dependencies(artifact_dir, probe_endpoint, api_key,
-                                                                 app["version_key"], app["app_name"], app["app_version"])
-    dependencies_order_list = sort_app_dependencies(dependencies_list)
-    final_list = []
-    for app_dep in dependencies_order_list:
-        for app_oap in app_oap_list:
-            if app_dep == app_oap["app_key"]:
-                final_list.append(app_oap)
-    return final_list
+    graph = _sort_dependencies(artifact_dir, probe_endpoint, api_key, app_oap_list)
+    return map_keys_to_oap(graph.get_order(), app_oap_list)
+
+
+# Same as generate_deployment_order, but keeps the dependency levels: a list of levels, each with the apps that
+# only depend on apps of previous levels (and can therefore be deployed at the same time)
+def generate_deployment_levels(artifact_dir: str, probe_endpoint: str, api_key: str, app_oap_list: list):
+    graph = _sort_dependencies(artifact_dir, probe_endpoint, api_key, app_oap_list)
+    final_levels = []
+    for level in graph.get_levels():
+        # Producers that are not part of the deployment are left out
+        final_level = map_keys_to_oap(level, app_oap_list)
+        if final_level:
+            final_levels.append(final_level)
+    return final_levels
 
 
 def deploy_apps_oap(artifact_dir: str, dest_env: str, osp_tool_path: str, credentials: str, app_oap_list: list):
     for app in app_oap_list:
-        oap_file_path = os.path.join(artifact_dir, APPLICATION_OAP_FOLDER, app["filename"])
-        call_osptool(osp_tool_path, oap_file_path, dest_env, credentials)
+        _deploy_app_oap(artifact_dir, dest_env, osp_tool_path, credentials, app)
+
+
+# Deploys the apps level by level (see generate_deployment_levels), with up to max_workers OSP Tool runs at the same
+# time within a level. A level only starts once the previous one is fully deployed. On the first failure no more
+# deployments are started, the ones already running are waited for and the error is raised.
+# The output of each OSP Tool run goes to its own log file, in the OSPTOOL_LOG_FOLDER of the OAP folder.
+def deploy_apps_oap_by_level(artifact_dir: str, dest_env: str, osp_tool_path: str, credentials: str, app_oap_levels: list, max_workers: int):
+    log_dir = os.path.join(artifact_dir, APPLICATION_OAP_FOLDER, OSPTOOL_LOG_FOLDER)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for level_number, level in enumerate(app_oap_levels, start=1):
+            print("Deploying level {} of {}: {}".format(level_number, len(app_oap_levels), ", ".join(app["app_name"] for app in level)), flush=True)
+            queued_at = time.monotonic()
+            futures = {executor.submit(_deploy_app_oap, artifact_dir, dest_env, osp_tool_path, credentials, app,
+                                       os.path.join(log_dir, "{}.log".format(app["filename"])), queued_at): app for app in level}
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in done if future.exception() is not None]
+            if failed:
+                for future in not_done:
+                    future.cancel()
+                # Let the deployments already running finish, so none is left halfway
+                wait(not_done)
+                for future in failed:
+                    print("     {} failed: {}".format(futures[future]["app_name"], future.exception()), flush=True)
+                raise failed[0].exception()
+            for future in done:
+                print("     {} deployed".format(futures[future]["app_name"]), flush=True)
+
+
+# Exports the OAP of a single app of the list and prints the overall progress
+def _export_app_oap(artifact_dir: str, lt_endpoint: str, lt_token: str, env_key: str, app: dict, total: int, host_limiter: HostConcurrencyLimiter, bandwidth_limiter: BandwidthLimiter, progress: dict):
+    file_path = os.path.join(artifact_dir, APPLICATION_OAP_FOLDER, app["filename"])
+    sha256 = export_app_oap(file_path, lt_endpoint, lt_token, env_key, app["app_key"], app["version_key"], bandwidth_limiter, host_limiter)
+    with progress["lock"]:
+        progress["exported"] += 1
+        print("     [{}/{}] {} application with version {}, exported as {}".format(
+            progress["exported"], total, app["app_name"], app["app_version"], app["filename"]), flush=True)
+    return sha256
+
 
+# Deploys a single package, checking its integrity first
+def _deploy_app_oap(artifact_dir: str, dest_env: str, osp_tool_path: str, credentials: str, app: dict, log_file: str = None, queued_at: float = None):
+    oap_file_path = os.path.join(artifact_dir, APPLICATION_OAP_FOLDER, app["filename"])
+    # Makes sure the package is the one that was exported, when its checksum was recorded
+    if "sha256" in app and get_file_sha256(oap_file_path) != app["sha256"]:
+        raise OAPIntegrityError("The checksum of {} does not match the one recorded when it was exported.".format(app["filename"]))
+    call_osptool(osp_tool_path, oap_file_path, dest_env, credentials, log_file, queued_at)
 
-def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: str, lt_api_version: int, lt_token: str, source_env: str, dest_env: str, apps: list, dep_manifest: list, trigger_manifest: dict, include_test_apps: bool, dep_note: str, osp_tool_path: str, credentials: str, cicd_http_proto: str, cicd_url: str, cicd_api_endpoint: str, cicd_version: str, cicd_key: str, friendly_package_names: bool):
+
+# Dependencies (producer app keys) of each app of the list
+# Cached versions are read from disk, the others are requested to the probe concurrently
+def _get_dependencies_list(artifact_dir: str, probe_endpoint: str, api_key: str, app_oap_list: list):
+    calls = [partial(get_app_dependencies, artifact_dir, probe_endpoint, api_key, app["version_key"], app["app_name"], app["app_version"])
+             for app in app_oap_list]
+    dependencies = run_concurrently(calls)
+    return {app["app_key"]: producers for app, producers in zip(app_oap_list, dependencies)}
+
+
+# Sorts the dependencies of the app list, starting from the graph sorted by a previous step (so only what changed
+# is re-sorted), and stores the result for the next one
+def _sort_dependencies(artifact_dir: str, probe_endpoint: str, api_key: str, app_oap_list: list):
+    graph = load_dependency_graph(artifact_dir)
+    graph.update(_get_dependencies_list(artifact_dir, probe_endpoint, api_key, app_oap_list))
+    store_dependency_graph(artifact_dir, graph)
+    return graph
+
+
+def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: str, lt_api_version: int, lt_token: str, source_env: str, dest_env: str, apps: list, dep_manifest: list, trigger_manifest: dict, include_test_apps: bool, dep_note: str, osp_tool_path: str, credentials: str, cicd_http_proto: str, cicd_url: str, cicd_api_endpoint: str, cicd_version: str, cicd_key: str, friendly_package_names: bool, deploy_workers: int = 1):
 
     app_data_list = []  # will contain the applications to deploy details from LT
 
@@ -87,30 +168,43 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
 
     # Gets the environment key for the source environment
     src_env_key = get_environment_key(artifact_dir, lt_endpoint, lt_token, source_env)
+    context = DeploymentContext(artifact_dir, lt_endpoint, lt_token, lt_api_version, source_env, src_env_key)
 
     # If the manifest file is being used, the app versions MUST come from that file
     # Or else you might not be deploying the same app versions that were deployed in
     # previous pipeline steps
     if dep_manifest:
-        app_data_list = generate_deployment_based_on_deploy_manifest(artifact_dir, lt_endpoint, lt_token, src_env_key, source_env, apps, dep_manifest)
+        version_source = DeploymentManifestSource(apps, dep_manifest)
     elif trigger_manifest:
-        app_data_list = generate_deployment_based_on_trigger_manifest(artifact_dir, lt_endpoint, lt_token, src_env_key, source_env, trigger_manifest, include_test_apps, False)
+        version_source = TriggerManifestSource(trigger_manifest, include_test_apps, False)
     else:
-        app_data_list = generate_regular_deployment(artifact_dir, lt_endpoint, lt_token, src_env_key, apps)
+        version_source = LatestTagsSource(apps)
+    app_data_list = version_source.get_app_data_list(context)
 
     # Export binary files
     app_oap_list = generate_oap_list(app_data_list, friendly_package_names)
     export_apps_oap(artifact_dir, lt_endpoint, lt_token, src_env_key, app_oap_list)
 
-    # Generate deployment order
-    sorted_oap_list = generate_deployment_order(artifact_dir, probe_endpoint, cicd_key, app_oap_list)
+    if deploy_workers > 1:
+        # Generate deployment levels
+        oap_levels = generate_deployment_levels(artifact_dir, probe_endpoint, cicd_key, app_oap_list)
+
+        print("\nDeployment Order (by level, up to {} concurrent deployments):\n".format(deploy_workers), flush=True)
+        for level_number, level in enumerate(oap_levels, start=1):
+            print("      " + str(level_number) + ". " + ", ".join(oap["app_name"] + " (" + oap["version_key"] + ")" for oap in level) + "\n", flush=True)
+
+        # Deploy binary files to target environment, level by level
+        deploy_apps_oap_by_level(artifact_dir, dest_env, osp_tool_path, credentials, oap_levels, deploy_workers)
+    else:
+        # Generate deployment order
+        sorted_oap_list = generate_deployment_order(artifact_dir, probe_endpoint, cicd_key, app_oap_list)
 
-    print("\nDeployment Order:\n", flush=True)
-    for oap in sorted_oap_list:
-        print("      " + str(sorted_oap_list.index(oap) + 1) + ". " + oap["app_name"] + " (" + oap["version_key"] + ")\n", flush=True)
+        print("\nDeployment Order:\n", flush=True)
+        for oap in sorted_oap_list:
+            print("      " + str(sorted_oap_list.index(oap) + 1) + ". " + oap["app_name"] + " (" + oap["version_key"] + ")\n", flush=True)
 
-    # Deploy binary files to target environment
-    deploy_apps_oap(artifact_dir, dest_env, osp_tool_path, credentials, sorted_oap_list)
+        # Deploy binary files to target environment
+        deploy_apps_oap(artifact_dir, dest_env, osp_tool_path, credentials, sorted_oap_list)
 
 # End of main()
 
@@ -156,6 +250,8 @@ if __name__ == "__main__":
                         help="(Optional) Key for CI/CD Probe API calls (when enabled).")
     parser.add_argument("-n", "--friendly_package_names", action='store_true',
                         help="Flag that indicates if downloaded application packages should have a user-friendly name. Example: \"AppName_v1_2_1\"")
+    parser.add_argument("-w", "--deploy_workers", type=int, default=1,
+                        help="(Optional) Number of applications deployed at the same time with OSP Tool. Applications are deployed by dependency level, so producers are always deployed before their consumers. Default: 1 (one application at a time)")
     parser.add_argument("-cf", "--config_file", type=str,
                         help="Config file path. Contains configuration values to override the default ones.")
 
@@ -234,6 +330,8 @@ if __name__ == "__main__":
     cicd_key = args.cicd_probe_key
     # Parse Friendly Package Names flag
     friendly_package_names = args.friendly_package_names
+    # Parse the number of concurrent OSP Tool deployments
+    deploy_workers = args.deploy_workers
 
     # Calls the main script
-    main(artifact_dir, lt_http_proto, lt_url, lt_api_endpoint, lt_version, lt_token, source_env, dest_env, apps, dep_manifest, trigger_manifest, include_test_apps, dep_note, osp_tool_path, credentials, cicd_http_proto, cicd_url, cicd_api_endpoint, cicd_version, cicd_key, friendly_package_names)
+    main(artifact_dir, lt_http_proto, lt_url, lt_api_endpoint, lt_version, lt_token, source_env, dest_env, apps, dep_manifest, trigger_manifest, include_test_apps, dep_note, osp_tool_path, credentials, cicd_http_proto, cicd_url, cicd_api_endpoint, cicd_version, cicd_key, friendly_package_names, deploy_workers)
@@ -0,0 +1,329 @@
+# Python Modules
+import os
+import sys
+from functools import partial
+
+# Custom Modules
+# Variables
+from outsystems.vars.file_vars import ARTIFACT_FOLDER, DEPLOYMENT_FOLDER, DEPLOYMENT_MANIFEST_FILE, APPLICATION_FOLDER, APPLICATION_VERSION_FILE
+from outsystems.vars.manifest_vars import MANIFEST_APPLICATION_VERSIONS, MANIFEST_FLAG_IS_TEST_APPLICATION
+from outsystems.vars.pipeline_vars import CONFLICTS_FILE, REDEPLOY_OUTDATED_APPS, DEPLOYMENT_RUNNING_STATUS, DEPLOYMENT_WAITING_STATUS, \
+    DEPLOYMENT_ERROR_STATUS_LIST, DEPLOY_ERROR_FILE, MAX_VERSIONS_TO_RETURN
+# Functions
+from outsystems.lifetime.lifetime_applications import get_application_version, get_application_versions, get_running_app_version
+from outsystems.lifetime.lifetime_deployments import get_deployment_info, send_deployment, delete_deployment, start_deployment, \
+    continue_deployment, check_deployment_two_step_deploy_status, wait_for_free_environment, DeploymentWatcher
+from outsystems.lifetime.lifetime_async import run_concurrently
+from outsystems.lifetime.lifetime_snapshot import get_environment_snapshot
+from outsystems.coordinator.coordinator_base import acquire_deployment_slot
+from outsystems.coordinator.coordinator_batching import acquire_deployment_batch, follow_batched_deployment
+from outsystems.file_helpers.file import store_data, check_file
+from outsystems.pipeline.environment_diff import check_if_can_deploy
+from outsystems.vars.vars_base import get_configuration_value
+# Exceptions
+from outsystems.exceptions.app_does_not_exist import AppDoesNotExistError
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
+
+
+# LifeTime connection and environments of a deployment (or of a single source environment, when nothing is deployed).
+# The environment snapshot (status of every app in every environment) is taken once, when first needed.
+class DeploymentContext:
+    def __init__(self, artifact_dir: str, lt_endpoint: str, lt_token: str, lt_api_version: int, source_env_name: str, source_env_key: str,
+                 dest_env_name: str = None, dest_env_key: str = None, source_env_label: str = None, dest_env_label: str = None):
+        self.artifact_dir = artifact_dir
+        self.lt_endpoint = lt_endpoint
+        self.lt_token = lt_token
+        self.lt_api_version = lt_api_version
+        self.source_env_name = source_env_name
+        self.source_env_key = source_env_key
+        self.dest_env_name = dest_env_name
+        self.dest_env_key = dest_env_key
+        self.source_env_label = source_env_label
+        self.dest_env_label = dest_env_label
+        self._snapshot = None
+
+    def get_snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = get_environment_snapshot(self.artifact_dir, self.lt_endpoint, self.lt_token)
+        return self._snapshot
+
+
+# ---------------------- VERSION SOURCES ----------------------
+# A version source tells which application versions to deploy. get_app_data_list returns one entry per application,
+# {"Name", "Key", "Version", "VersionKey"} (plus "DeploymentZone" when deployment zones are used), and aborts the
+# pipeline when a version can't be found in the source environment.
+
+# Latest tagged version of each application running in the source environment
+class LatestTagsSource:
+    def __init__(self, app_list: list):
+        # Removes whitespaces in the beginning and end of the names
+        self.app_list = [app_name.strip() for app_name in app_list]
+
+    def get_app_data_list(self, context: DeploymentContext):
+        snapshot = context.get_snapshot()
+        # Get the app running version on the source environment. It will only retrieve tagged applications
+        calls = [partial(get_running_app_version, context.artifact_dir, context.lt_endpoint, context.lt_token, context.source_env_key, snapshot, app_name=app_name)
+                 for app_name in self.app_list]
+        deployment_manifest = run_concurrently(calls)
+        app_data_list = [{'Name': app_name, 'Key': deployed["ApplicationKey"], 'Version': deployed["Version"], 'VersionKey': deployed["VersionKey"]}
+                         for app_name, deployed in zip(self.app_list, deployment_manifest)]
+
+        # Store the manifest to be used in other stages of the pipeline
+        filename = "{}/{}".format(DEPLOYMENT_FOLDER, DEPLOYMENT_MANIFEST_FILE)
+        store_data(ARTIFACT_FOLDER, filename, deployment_manifest)
+
+        return app_data_list
+
+
+# Given version tags of each application: [{"app_name", "app_version"}]
+class SpecificTagsSource:
+    def __init__(self, apps: list):
+        self.apps = apps
+
+    def get_app_data_list(self, context: DeploymentContext):
+        app_data_list = []
+        app_names = [app['app_name'].strip() for app in self.apps]
+        max_versions = get_configuration_value("MAX_VERSIONS_TO_RETURN", MAX_VERSIONS_TO_RETURN)
+        calls = [partial(get_application_versions, context.artifact_dir, context.lt_endpoint, context.lt_token, max_versions, app_name=app_name)
+                 for app_name in app_names]
+        deployment_manifest = run_concurrently(calls)
+        for app, app_name, app_versions in zip(self.apps, app_names, deployment_manifest):
+            matches = [{'Name': app_name, 'Key': app_version["ApplicationKey"], 'Version': app_version["Version"], 'VersionKey': app_version["Key"]}
+                       for app_version in app_versions if app_version["Version"] == app["app_version"]]
+            if not matches:
+                print("The application {} with version {} does not exist in the {} environment. Aborting!".format(app_name, app["app_version"], context.source_env_key), flush=True)
+                sys.exit(1)
+            app_data_list.extend(matches)
+
+        # Store the manifest to be used in other stages of the pipeline
+        filename = "{}/{}".format(DEPLOYMENT_FOLDER, DEPLOYMENT_MANIFEST_FILE)
+        store_data(ARTIFACT_FOLDER, filename, deployment_manifest)
+
+        return app_data_list
+
+
+# Versions recorded in the deployment manifest of a previous pipeline step, for the applications in app_list
+class DeploymentManifestSource:
+    def __init__(self, app_list: list, manifest: list):
+        self.app_list = app_list
+        self.manifest = manifest
+
+    def get_app_data_list(self, context: DeploymentContext):
+        app_data_list = [{'Name': deployed_app["ApplicationName"], 'Key': deployed_app["ApplicationKey"], 'Version': deployed_app["Version"], 'VersionKey': deployed_app["VersionKey"]}
+                         for deployed_app in self.manifest if deployed_app["ApplicationName"] in self.app_list]
+        validate_app_versions(context, app_data_list)
+        return app_data_list
+
+
+# Versions in the trigger manifest sent by the Trigger Pipeline plugin
+class TriggerManifestSource:
+    def __init__(self, manifest: dict, include_test_apps: bool, include_deployment_zones: bool):
+        self.manifest = manifest
+        self.include_test_apps = include_test_apps
+        self.include_deployment_zones = include_deployment_zones
+
+    def get_app_data_list(self, context: DeploymentContext):
+        app_data_list = []
+        for deployed_app in self.manifest[MANIFEST_APPLICATION_VERSIONS]:
+            if not self.include_test_apps and deployed_app[MANIFEST_FLAG_IS_TEST_APPLICATION]:
+                continue
+            app_data = {'Name': deployed_app["ApplicationName"], 'Key': deployed_app["ApplicationKey"], 'Version': deployed_app["VersionNumber"], 'VersionKey': deployed_app["VersionKey"]}
+            if self.include_deployment_zones:
+                app_data['DeploymentZone'] = deployed_app["DeploymentZoneName"]
+            app_data_list.append(app_data)
+        validate_app_versions(context, app_data_list)
+        return app_data_list
+
+
+# Confirms the application versions taken from a manifest still exist in LifeTime, checking them concurrently.
+# Versions already confirmed in this pipeline run (stored in the artifact cache) are not checked again.
+# Reports every version that can't be confirmed and then aborts the pipeline.
+def validate_app_versions(context: DeploymentContext, app_data_list: list):
+    to_check = [app for app in app_data_list if not _is_version_confirmed(context.artifact_dir, app)]
+    calls = [partial(get_application_version, context.artifact_dir, context.lt_endpoint, context.lt_token, False, app["VersionKey"], app_name=app["Name"])
+             for app in to_check]
+    results = run_concurrently(calls, return_exceptions=True)
+
+    failed = 0
+    for app, result in zip(to_check, results):
+        if isinstance(result, AppDoesNotExistError):
+            print("Application {} with version {} no longer exists in {}.".format(app["Name"], app["Version"], context.source_env_name), flush=True)
+        elif isinstance(result, Exception):
+            print("Error trying to validate if the application {} exists in the {} environment.\nError: {}".format(app["Name"], context.source_env_name, result), flush=True)
+        else:
+            continue
+        failed += 1
+    if failed > 0:
+        print("{} application version(s) in the manifest could not be validated. The manifest no longer reflects the current state of the environment. Aborting!".format(failed), flush=True)
+        sys.exit(1)
+
+
+# ---------------------- ENGINE ----------------------
+# Deploys the application versions given by a version source from the source to the target environment: checks what
+# is already deployed, waits for its turn, creates and starts the deployment plan and watches it until it's over.
+# Shared by every deployment script, which only differ in the version source and in these options:
+#   delete_on_conflicts - delete the deployment plan when it has conflicts (it's kept otherwise)
+#   allow_continue_with_errors - deploy despite the conflicts (LifeTime API v2 only)
+#   abort_on_stale_manifest - abort when the target environment has a higher version than the one to deploy
+#   include_deployment_zones - deploy to the deployment zones given by the version source
+#   resume_on_intervention - resume the plan whenever it needs user intervention. Otherwise only a 2-Step deployment
+#     is resumed (and only with force_two_step_deployment), after a 2-Step first step the pipeline continues.
+#     Only plans resumed on intervention are batched with other pipelines (see acquire_deployment_batch).
+class DeploymentEngine:
+    def __init__(self, context: DeploymentContext, version_source, dep_note: str, delete_on_conflicts: bool = True, allow_continue_with_errors: bool = False,
+                 abort_on_stale_manifest: bool = True, include_deployment_zones: bool = False, resume_on_intervention: bool = True,
+                 force_two_step_deployment: bool = False):
+        self.context = context
+        self.version_source = version_source
+        self.dep_note = dep_note
+        self.delete_on_conflicts = delete_on_conflicts
+        self.allow_continue_with_errors = allow_continue_with_errors
+        self.abort_on_stale_manifest = abort_on_stale_manifest
+        self.include_deployment_zones = include_deployment_zones
+        self.resume_on_intervention = resume_on_intervention
+        self.force_two_step_deployment = force_two_step_deployment
+
+    # Runs the deployment and returns the exit code for the pipeline
+    def run(self):
+        ctx = self.context
+        app_data_list = self.version_source.get_app_data_list(ctx)
+
+        # Check which application versions have not been deployed to destination environment
+        to_deploy_app_keys = check_if_can_deploy(ctx.artifact_dir, ctx.lt_endpoint, ctx.lt_api_version, ctx.lt_token, ctx.dest_env_key, ctx.dest_env_name, app_data_list,
+                                                 self.include_deployment_zones, abort_on_stale_manifest=self.abort_on_stale_manifest, snapshot=ctx.get_snapshot())
+
+        # Check if there are apps to be deployed
+        if len(to_deploy_app_keys) == 0:
+            print("Deployment skipped because {} environment already has the target application deployed with the same tags.".format(ctx.dest_env_name), flush=True)
+            return 0
+
+        # Write the names and keys of the application versions to be deployed
+        to_deploy_app_info = _get_deploying_apps(ctx.lt_api_version, app_data_list, to_deploy_app_keys)
+        to_deploy_app_names = [app["Name"] for app in to_deploy_app_info]
+        print("Creating deployment plan from {} to {} including applications: {} ({}).".format(
+            _env_display_name(ctx.source_env_name, ctx.source_env_label), _env_display_name(ctx.dest_env_name, ctx.dest_env_label), to_deploy_app_names, to_deploy_app_info), flush=True)
+
+        dep_note = self.dep_note
+        try:
+            # Take this pipeline's turn to deploy to the target environment (when pipelines share a coordinator).
+            # With plan batching, the pipeline whose turn comes also deploys the applications of the other queued pipelines.
+            description = "{} -> {}: {}".format(ctx.source_env_name, ctx.dest_env_name, to_deploy_app_names)
+            if self.resume_on_intervention:
+                deployment_ticket, plan_batch = acquire_deployment_batch(ctx.dest_env_key, ctx.source_env_key, ctx.lt_api_version, app_data_list, to_deploy_app_keys, dep_note,
+                                                                         description)
+            else:
+                # No batching: the pipeline may stop watching before the plan is over (2-Step first step, manual
+                # intervention), with no result to report back to the other pipelines
+                deployment_ticket, plan_batch = acquire_deployment_slot(ctx.dest_env_key, description), None
+            if plan_batch and not plan_batch.is_leader:
+                return follow_batched_deployment(plan_batch)
+            if plan_batch:
+                to_deploy_app_keys, to_deploy_app_names, dep_note = plan_batch.app_keys, plan_batch.app_names, plan_batch.dep_note
+                print("Deployment plan will include the requests of {} pipeline(s), with applications: {}.".format(len(plan_batch.requests), to_deploy_app_names), flush=True)
+            wait_for_free_environment(ctx.artifact_dir, ctx.lt_endpoint, ctx.lt_token, ctx.dest_env_key)
+        except DeploymentTimeoutError:
+            print("Timeout occurred while waiting for LifeTime to be free, to create the new deployment plan.", flush=True)
+            return 1
+
+        # LT is free to deploy
+        # Send the deployment plan and grab the key
+        dep_plan_key = send_deployment(ctx.artifact_dir, ctx.lt_endpoint, ctx.lt_token, ctx.lt_api_version, to_deploy_app_keys, dep_note, ctx.source_env_name, ctx.dest_env_name)
+        print("Deployment plan {} created successfully.".format(dep_plan_key), flush=True)
+        if plan_batch:
+            plan_batch.deployment_key = dep_plan_key
+
+        # Check if created deployment plan has conflicts
+        dep_details = get_deployment_info(ctx.artifact_dir, ctx.lt_endpoint, ctx.lt_token, dep_plan_key)
+        has_conflicts = len(dep_details["ApplicationConflicts"]) > 0
+        if has_conflicts:
+            store_data(ctx.artifact_dir, CONFLICTS_FILE, dep_details["ApplicationConflicts"])
+            if not self.allow_continue_with_errors or ctx.lt_api_version == 1:
+                print("Deployment plan {} has conflicts and will be aborted. Check {} artifact for more details.".format(dep_plan_key, CONFLICTS_FILE), flush=True)
+                if self.delete_on_conflicts:
+                    # Abort previously created deployment plan to target environment
+                    delete_deployment(ctx.lt_endpoint, ctx.lt_token, dep_plan_key)
+                    print("Deployment plan {} was deleted successfully.".format(dep_plan_key), flush=True)
+                return 1
+            print("Deployment plan {} has conflicts but will continue with errors. Check {} artifact for more details.".format(dep_plan_key, CONFLICTS_FILE), flush=True)
+
+        # Check if outdated consumer applications (outside of deployment plan) should be redeployed and start the deployment plan execution
+        if ctx.lt_api_version == 1:  # LT for OS version < 11
+            start_deployment(ctx.lt_endpoint, ctx.lt_token, dep_plan_key)
+        elif ctx.lt_api_version == 2:  # LT for OS v11
+            if has_conflicts:
+                start_deployment(ctx.lt_endpoint, ctx.lt_token, dep_plan_key, redeploy_outdated=False, continue_with_errors=True)
+            else:
+                start_deployment(ctx.lt_endpoint, ctx.lt_token, dep_plan_key, redeploy_outdated=get_configuration_value("REDEPLOY_OUTDATED_APPS", REDEPLOY_OUTDATED_APPS))
+        else:
+            raise NotImplementedError("Please make sure the API version is compatible with the module.")
+        print("Deployment plan {} started being executed.".format(dep_plan_key), flush=True)
+
+        # Sleep thread until deployment has finished
+        watcher = DeploymentWatcher(ctx.artifact_dir, ctx.lt_endpoint, ctx.lt_token, dep_plan_key)
+        if plan_batch:
+            # Report back to every pipeline in the batch (before the next queued pipeline goes)
+            watcher.add_transition_callback(plan_batch.on_deployment_transition)
+        if deployment_ticket:
+            # Let the next queued pipeline go as soon as this deployment is over
+            watcher.add_transition_callback(deployment_ticket.on_deployment_transition)
+        try:
+            return self._watch_deployment(watcher, dep_plan_key)
+        except DeploymentTimeoutError:
+            # Deployment timeout reached. Exit script with error
+            print("Timeout occurred while deployment plan is still in {} status.".format(DEPLOYMENT_RUNNING_STATUS), flush=True)
+            return 1
+
+    # Waits for the deployment plan to finish, resuming it when it needs user intervention (see resume_on_intervention)
+    def _watch_deployment(self, watcher: DeploymentWatcher, dep_plan_key: str):
+        ctx = self.context
+        # Flag to only alert the user once
+        alert_user = False
+        while True:
+            # Wait for the Deployment Plan to leave the running status
+            dep_status = watcher.wait_while_running()
+            # Check deployment status is pending approval.
+            if dep_status["DeploymentStatus"] == DEPLOYMENT_WAITING_STATUS:
+                # Check if deployment waiting status is due to 2-Step
+                two_step = not self.resume_on_intervention and check_deployment_two_step_deploy_status(dep_status)
+                if self.resume_on_intervention or (two_step and self.force_two_step_deployment):
+                    continue_deployment(ctx.lt_endpoint, ctx.lt_token, dep_plan_key)
+                    print("Deployment plan {} resumed execution.".format(dep_plan_key), flush=True)
+                elif two_step:
+                    # Exit the script to continue with the pipeline execution
+                    print("Deployment plan {} first step finished successfully.".format(dep_plan_key), flush=True)
+                    return 0
+                # Send notification to alert deployment manual intervention.
+                elif not alert_user:
+                    alert_user = True
+                    print("A manual intervention is required to continue the execution of the deployment plan {}.".format(dep_plan_key), flush=True)
+            elif dep_status["DeploymentStatus"] in DEPLOYMENT_ERROR_STATUS_LIST:
+                print("Deployment plan finished with status {}.".format(dep_status["DeploymentStatus"]), flush=True)
+                store_data(ctx.artifact_dir, DEPLOY_ERROR_FILE, dep_status)
+                return 1
+            else:
+                # If it reaches here, it means the deployment was successful
+                print("Deployment plan finished with status {}.".format(dep_status["DeploymentStatus"]), flush=True)
+                return 0
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Returns the details of the applications whose versions are in the deployment operations, in the app_data_list order
+def _get_deploying_apps(lt_api_version: int, app_data_list: list, to_deploy_app_keys: list):
+    if lt_api_version == 1:  # LT for OS version < 11
+        version_keys = set(to_deploy_app_keys)
+    elif lt_api_version == 2:  # LT for OS v11
+        version_keys = set(app_key["ApplicationVersionKey"] for app_key in to_deploy_app_keys)
+    else:
+        raise NotImplementedError("Please make sure the API version is compatible with the module.")
+    return [app for app in app_data_list if app["VersionKey"] in version_keys]
+
+
+# Checks if the application version was already retrieved from LifeTime (see get_application_version)
+def _is_version_confirmed(artifact_dir: str, app: dict):
+    filename = "{}.{}{}".format(app["Name"], app["VersionKey"], APPLICATION_VERSION_FILE)
+    # Cache files are stored without spaces in the name
+    return check_file(artifact_dir, os.path.join(APPLICATION_FOLDER, filename).replace(" ", "_"))
+
+
+def _env_display_name(env_name: str, env_label: str):
+    return "{} (Label: {})".format(env_name, env_label) if env_label else env_name
@@ -0,0 +1,109 @@
+# Python Modules
+import sys
+from functools import partial
+
+# Custom Modules
+# Functions
+from outsystems.lifetime.lifetime_environments import get_environment_deployment_zones
+from outsystems.lifetime.lifetime_applications import get_application_version
+from outsystems.lifetime.lifetime_async import run_concurrently
+from outsystems.lifetime.lifetime_snapshot import EnvironmentSnapshot, get_environment_snapshot
+from outsystems.versioning.versioning_base import compare_versions
+
+
+# Function that will generate the app key portion of the deployment for LifeTime, based on the API level
+def generate_deploy_app_key(lt_api_version: int, app_version_key: str, deploy_zone=""):
+    if lt_api_version == 1:  # LT for OS version < 11
+        return app_version_key
+    elif lt_api_version == 2:  # LT for OS v11
+        return {"ApplicationVersionKey": app_version_key, "DeploymentZoneKey": deploy_zone}
+    else:
+        raise NotImplementedError("Please make sure the API version is compatible with the module.")
+
+
+# Function that resolves what is running in the target environment for each app to deploy.
+# The app status comes from the environment snapshot (a single LifeTime call) and the details of the running versions
+# that differ from the ones to deploy are fetched in parallel.
+# Returns one entry per app, in the same order as app_data_list, with the app status in the target environment
+# (None if the app does not exist there) and the details of the running version, when it differs from the one to deploy.
+# Errors are returned in the entry (instead of raised) so the caller can handle them in the original app order.
+def resolve_target_env_versions(artifact_dir: str, lt_endpoint: str, lt_token: str, env_key: str, app_data_list: list, snapshot: EnvironmentSnapshot):
+    calls = [partial(_resolve_target_env_version, artifact_dir, lt_endpoint, lt_token, env_key, app, snapshot) for app in app_data_list]
+    return run_concurrently(calls, return_exceptions=True)
+
+
+# Function to check if target environment already has the application versions to be deployed
+# If abort_on_stale_manifest is True, the pipeline is aborted when the target environment has a higher version tag than the one to deploy.
+# An environment snapshot taken earlier in the run can be reused, otherwise a new one is taken.
+def check_if_can_deploy(artifact_dir: str, lt_endpoint: str, lt_api_version: int, lt_token: str, env_key: str, env_name: str, app_data_list: list,
+                        include_deployment_zones: bool = False, abort_on_stale_manifest: bool = True, snapshot: EnvironmentSnapshot = None):
+    app_keys = []  # will contain the application keys to create the deployment plan
+    deploy_zones = []  # will contain the deployment zones available in the target environment
+
+    # Get information about the deployment zones in the target environment
+    if include_deployment_zones:
+        deploy_zones = get_environment_deployment_zones(artifact_dir, lt_endpoint, lt_token, env_key=env_key)
+
+    # Get the status of the apps in the target env, to check if they were deployed
+    if snapshot is None:
+        snapshot = get_environment_snapshot(artifact_dir, lt_endpoint, lt_token)
+    target_env_versions = resolve_target_env_versions(artifact_dir, lt_endpoint, lt_token, env_key, app_data_list, snapshot)
+
+    for app, target_env_version in zip(app_data_list, target_env_versions):
+        if isinstance(target_env_version, Exception):
+            raise target_env_version
+        deploy_zone_key = ""
+        # Get the target deployment zone based on the name provided in the manifest
+        target_deploy_zone = next(filter(lambda x: x["Name"] == app["DeploymentZone"], deploy_zones), None)
+        app_in_env = target_env_version["AppStatusInEnv"]
+        if app_in_env is None:
+            if target_deploy_zone:
+                deploy_zone_key = target_deploy_zone["Key"]
+            elif include_deployment_zones and app["DeploymentZone"]:
+                print("Deployment zone with name {} not found in {} environment.".format(app["DeploymentZone"], env_name), flush=True)
+            app_keys.append(generate_deploy_app_key(lt_api_version, app["VersionKey"], deploy_zone_key))
+            if deploy_zone_key:
+                print("App {} with version {} does not exist in {} environment. Ignoring check and deploying it using {} deployment zone.".format(app["Name"], app["Version"], env_name, target_deploy_zone["Name"]), flush=True)
+            else:
+                print("App {} with version {} does not exist in {} environment. Ignoring check and deploying it.".format(app["Name"], app["Version"], env_name), flush=True)
+            continue
+
+        # Check if the target environment has the version deployed
+        if app_in_env["BaseApplicationVersionKey"] != app["VersionKey"]:
+            # The version is not the one deployed -> need to compare the version tag
+            app_in_env_data = target_env_version["RunningVersion"]
+            # If the version in the environment is bigger than the one in the manifest -> stale pipeline -> abort
+            version_order = compare_versions(app_in_env_data["Version"], app["Version"])
+            if abort_on_stale_manifest and version_order > 0:
+                print("The deployment manifest is stale. The Application {} needs to be deployed with version {} but then environment {} has the version {}.\nReason: VersionTag is inferior to the VersionTag already deployed.\nAborting the pipeline.".format(app["Name"], app["Version"], env_name, app_in_env_data["Version"]), flush=True)
+                sys.exit(1)
+            # If the version in the target environment has the same version number -> skip deployment
+            elif version_order == 0:
+                print("Skipping application {} with version {}, since it's already deployed in {} environment.\nReason: VersionTag is equal.".format(app["Name"], app["Version"], env_name), flush=True)
+            else:
+                # Generated app_keys for deployment plan based on the target version
+                if target_deploy_zone:
+                    # Check if target deployment zone is different from the current one being used
+                    if target_deploy_zone["Key"] != app_in_env["DeploymentZoneKey"]:
+                        deploy_zone_key = target_deploy_zone["Key"]
+                elif include_deployment_zones and app["DeploymentZone"]:
+                    print("Deployment zone with name {} not found in {} environment.".format(app["DeploymentZone"], env_name), flush=True)
+                app_keys.append(generate_deploy_app_key(lt_api_version, app["VersionKey"], deploy_zone_key))
+                if deploy_zone_key:
+                    print("Adding application {} with version {}, to be deployed in {} environment using {} deployment zone.".format(app["Name"], app["Version"], env_name, target_deploy_zone["Name"]), flush=True)
+                else:
+                    print("Adding application {} with version {}, to be deployed in {} environment.".format(app["Name"], app["Version"], env_name), flush=True)
+        else:
+            print("Skipping application {} with version {}, since it's already deployed in {} environment.\nReason: VersionKey is equal.".format(app["Name"], app["Version"], env_name), flush=True)
+
+    return app_keys
+
+
+# ---------------------- PRIVATE METHODS ----------------------
+# Private method that gets the app status in the target environment and, if it differs from the one to deploy, the running version
+def _resolve_target_env_version(artifact_dir: str, lt_endpoint: str, lt_token: str, env_key: str, app: dict, snapshot: EnvironmentSnapshot):
+    result = {"AppStatusInEnv": snapshot.get_app_status(app["Key"], env_key), "RunningVersion": None}
+    app_in_env = result["AppStatusInEnv"]
+    if app_in_env and app_in_env["BaseApplicationVersionKey"] != app["VersionKey"]:
+        result["RunningVersion"] = get_application_version(artifact_dir, lt_endpoint, lt_token, False, app_in_env["BaseApplicationVersionKey"], app_key=app["Key"])
+    return result
@@ -22,8 +22,7 @@ from outsystems.vars.cicd_vars import PROBE_HTTP_PROTO, PROBE_API_ENDPOINT, PROB
 from outsystems.lifetime.lifetime_environments import get_environment_key
 from outsystems.file_helpers.file import load_data
 from outsystems.lifetime.lifetime_base import build_lt_endpoint
-from outsystems.pipeline.deploy_latest_tags_to_target_env import generate_deployment_based_on_manifest as generate_deployment_based_on_deploy_manifest, generate_regular_deployment
-from outsystems.pipeline.deploy_tags_to_target_env_with_manifest import generate_deployment_based_on_manifest as generate_deployment_based_on_trigger_manifest
+from outsystems.pipeline.engine import DeploymentContext, DeploymentManifestSource, LatestTagsSource, TriggerManifestSource
 from outsystems.pipeline.deploy_apps_to_target_env_with_airgap import export_apps_oap, generate_deployment_order, generate_oap_list
 from outsystems.cicd_probe.cicd_base import build_probe_endpoint
 from outsystems.vars.vars_base import load_configuration_file
@@ -50,16 +49,18 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
 
     # Gets the environment key for the source environment
     src_env_key = get_environment_key(artifact_dir, lt_endpoint, lt_token, source_env)
+    context = DeploymentContext(artifact_dir, lt_endpoint, lt_token, lt_api_version, source_env, src_env_key)
 
     # If the manifest file is being used, the app versions MUST come from that file
     # Or else you might not be deploying the same app versions that were deployed in
     # previous pipeline steps
     if dep_manifest:
-        app_data_list = generate_deployment_based_on_deploy_manifest(artifact_dir, lt_endpoint, lt_token, src_env_key, source_env, apps, dep_manifest)
+        version_source = DeploymentManifestSource(apps, dep_manifest)
     elif trigger_manifest:
-        app_data_list = generate_deployment_based_on_trigger_manifest(artifact_dir, lt_endpoint, lt_token, src_env_key, source_env, trigger_manifest, include_test_apps, False)
+        version_source = TriggerManifestSource(trigger_manifest, include_test_apps, False)
     else:
-        app_data_list = generate_regular_deployment(artifact_dir, lt_endpoint, lt_token, src_env_key, apps)
+        version_source = LatestTagsSource(apps)
+    app_data_list = version_source.get_app_data_list(context)
 
     # Export binary files
     app_oap_list = generate_oap_list(app_data_list, friendly_package_names)
@@ -26,11 +26,11 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
     lt_endpoint = build_lt_endpoint(
         lt_http_proto, lt_url, lt_api_endpoint, lt_api_version)
 
-    # Get Environments
-    get_environments(artifact_dir, lt_endpoint, lt_token)
+    # Get Environments (reusing or revalidating the cached list, if still fresh)
+    get_environments(artifact_dir, lt_endpoint, lt_token, True)
     print("OS Environments data retrieved successfully.", flush=True)
-    # Get Applications without extra data
-    get_applications(artifact_dir, lt_endpoint, lt_token, False)
+    # Get Applications without extra data (reusing or revalidating the cached list, if still fresh)
+    get_applications(artifact_dir, lt_endpoint, lt_token, False, True)
     print("OS Applications data retrieved successfully.", flush=True)
 
 
@@ -0,0 +1,55 @@
+# Python Modules
+import sys
+import os
+import argparse
+
+# Workaround for Jenkins:
+# Set the path to include the outsystems module
+# Jenkins exposes the workspace directory through env.
+if "WORKSPACE" in os.environ:
+    sys.path.append(os.environ['WORKSPACE'])
+else:  # Else just add the project dir
+    sys.path.append(os.getcwd())
+
+# Custom Modules
+# Variables
+from outsystems.vars.file_vars import PACKAGE_STORE_DIR, PACKAGE_STORE_MAX_SIZE_IN_MB
+# Functions
+from outsystems.file_helpers.package_store import PackageStore
+from outsystems.vars.vars_base import load_configuration_file, get_configuration_value
+
+
+# ############################################################# SCRIPT ##############################################################
+def main(store_dir: str, max_size_in_mb: int):
+    package_store = PackageStore(store_dir, max_size_in_mb * 1024 * 1024)
+    evicted, freed = package_store.gc()
+    for version_key in evicted:
+        print("Evicted package {}".format(version_key), flush=True)
+    print("Package store {}: {} package(s) evicted, {:.1f} MB freed, {:.1f} MB in use (limit: {} MB).".format(
+        store_dir, len(evicted), freed / (1024 * 1024), package_store.get_size() / (1024 * 1024), max_size_in_mb), flush=True)
+
+# End of main()
+
+
+if __name__ == "__main__":
+    # Argument menu / parsing
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--store_dir", type=str,
+                        help="(Optional) Package store folder. Default: the PACKAGE_STORE_DIR configuration value")
+    parser.add_argument("-s", "--max_size", type=int,
+                        help="(Optional) Size, in MB, the package store is reduced to (least recently used packages are evicted first). Default: the PACKAGE_STORE_MAX_SIZE_IN_MB configuration value. Use 0 to empty the store.")
+    parser.add_argument("-cf", "--config_file", type=str,
+                        help="Config file path. Contains configuration values to override the default ones.")
+
+    args = parser.parse_args()
+
+    # Load config file if exists
+    if args.config_file:
+        load_configuration_file(args.config_file)
+    # Parse the store folder
+    store_dir = args.store_dir if args.store_dir else get_configuration_value("PACKAGE_STORE_DIR", PACKAGE_STORE_DIR)
+    # Parse the size limit
+    max_size = args.max_size if args.max_size is not None else get_configuration_value("PACKAGE_STORE_MAX_SIZE_IN_MB", PACKAGE_STORE_MAX_SIZE_IN_MB)
+
+    # Calls the main script
+    main(store_dir, max_size)
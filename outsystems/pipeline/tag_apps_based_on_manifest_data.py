@@ -2,7 +2,6 @@
 import sys
 import os
 import argparse
-from pkg_resources import parse_version
 
 # Workaround for Jenkins:
 # Set the path to include the outsystems module
@@ -22,17 +21,19 @@ from outsystems.file_helpers.file import load_data
 from outsystems.lifetime.lifetime_environments import get_environment_key
 from outsystems.lifetime.lifetime_base import build_lt_endpoint
 from outsystems.lifetime.lifetime_applications import set_application_version, get_running_app_version
+from outsystems.lifetime.lifetime_snapshot import EnvironmentSnapshot, get_environment_snapshot
 from outsystems.vars.vars_base import load_configuration_file
+from outsystems.versioning.versioning_base import compare_versions
 # Exceptions
 from outsystems.exceptions.invalid_parameters import InvalidParametersError
 
 
 # ############################################################# SCRIPT ##############################################################
-def valid_tag_number(artifact_dir: str, lt_endpoint: str, lt_token: str, env_name: str, env_key: str, app: dict):
+def valid_tag_number(artifact_dir: str, lt_endpoint: str, lt_token: str, env_name: str, env_key: str, app: dict, snapshot: EnvironmentSnapshot = None):
     # Get the app running version on the source environment. It will only retrieve tagged applications
-    running_app = get_running_app_version(artifact_dir, lt_endpoint, lt_token, env_key, app_name=app["ApplicationName"])
+    running_app = get_running_app_version(artifact_dir, lt_endpoint, lt_token, env_key, snapshot, app_name=app["ApplicationName"])
 
-    if parse_version(running_app["Version"]) < parse_version(app["VersionNumber"]):
+    if compare_versions(running_app["Version"], app["VersionNumber"]) < 0:
         return True
 
     print("Skipping tag! Application '{}' current tag ({}) on {} is greater than or equal to the manifest data ({}). ".format(app["ApplicationName"], running_app["Version"], env_name, app["VersionNumber"]), flush=True)
@@ -53,9 +54,11 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
                 set_application_version(lt_endpoint, lt_token, dest_env_key, deployed_app["ApplicationKey"], deployed_app["ChangeLog"], deployed_app["Version"], None)
                 print("{} application successuflly tagged as {} on {}".format(deployed_app["ApplicationName"], deployed_app["Version"], dest_env), flush=True)
     elif trigger_manifest:
+        # Get the status of all apps in every environment with a single call
+        snapshot = get_environment_snapshot(artifact_dir, lt_endpoint, lt_token)
         for deployed_app in trigger_manifest["ApplicationVersions"]:
             if not deployed_app["IsTestApplication"] or (deployed_app["IsTestApplication"] and include_test_apps):
-                if valid_tag_number(artifact_dir, lt_endpoint, lt_token, dest_env, dest_env_key, deployed_app):
+                if valid_tag_number(artifact_dir, lt_endpoint, lt_token, dest_env, dest_env_key, deployed_app, snapshot):
                     set_application_version(lt_endpoint, lt_token, dest_env_key, deployed_app["ApplicationKey"], deployed_app["ChangeLog"], deployed_app["VersionNumber"], None)
                     print("{} application successuflly tagged as {} on {}".format(deployed_app["ApplicationName"], deployed_app["VersionNumber"], dest_env), flush=True)
                 else:
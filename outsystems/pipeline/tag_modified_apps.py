@@ -2,6 +2,7 @@
 import sys
 import os
 import argparse
+from functools import partial
 
 # Workaround for Jenkins:
 # Set the path to include the outsystems module
@@ -19,35 +20,81 @@ from outsystems.vars.pipeline_vars import MAX_VERSIONS_TO_RETURN, TAG_APP_MAX_RE
 from outsystems.vars.manifest_vars import MANIFEST_APPLICATION_VERSIONS
 
 # Functions
-from outsystems.lifetime.lifetime_applications import get_applications, get_running_app_version, get_application_versions
+from outsystems.lifetime.lifetime_applications import get_application_version, get_application_versions
+from outsystems.lifetime.lifetime_async import run_concurrently
+from outsystems.lifetime.lifetime_snapshot import get_environment_snapshot
 from outsystems.lifetime.lifetime_environments import get_environment_key
 from outsystems.lifetime.lifetime_base import build_lt_endpoint
 from outsystems.lifetime.lifetime_applications import set_application_version
 from outsystems.file_helpers.file import load_data
 from outsystems.vars.vars_base import load_configuration_file, get_configuration_value
+from outsystems.versioning.versioning_base import get_next_version, sort_version_history, find_next_free_version
 
 # Exceptions
 from outsystems.exceptions.invalid_parameters import InvalidParametersError
 
 
 # ############################################################# SCRIPT ##############################################################
-def generate_new_version_number(base_version: str):
-    # Split tag version digits
-    base_version = base_version.split('.')  # type: ignore
-
-    # Default values for Major.Minor.Revison
-    maj = base_version[0]
-    min = "0"
-    rev = "1"
-
-    if not len(base_version) < 2:
-        min = base_version[1]
-
-    if not len(base_version) < 3:
-        # Increment revision number
-        rev = str(int(base_version[2]) + 1)
-
-    return "{}.{}.{}".format(maj, min, rev)
+# Computes the new tag of every application modified in the target environment.
+# The modified apps come from the environment snapshot and their version histories are fetched concurrently, so the
+# tags are picked locally. Returns a list of {"ApplicationName", "ApplicationKey", "Version", "MobileVersions"}.
+def get_tagging_plan(artifact_dir: str, lt_endpoint: str, lt_token: str, env_key: str, snapshot, app_names: list, log_msg: str):
+    # Checks which applications are modified in target env
+    modified_apps = []
+    for app_name in app_names:
+        app_key = snapshot.get_application_key(app_name)
+        if app_key:
+            app_status = snapshot.get_app_status(app_key, env_key)
+            if app_status and app_status["IsModified"]:
+                modified_apps.append((app_name, app_key, app_status))
+
+    # List of the last application tags
+    max_versions = get_configuration_value("MAX_VERSIONS_TO_RETURN", MAX_VERSIONS_TO_RETURN)
+    calls = [partial(get_application_versions, artifact_dir, lt_endpoint, lt_token, max_versions, app_name=app_name) for app_name, _, _ in modified_apps]
+    version_histories = run_concurrently(calls)
+
+    tagging_plan = []
+    max_tries = get_configuration_value("TAG_APP_MAX_RETRIES", TAG_APP_MAX_RETRIES)
+    for (app_name, app_key, app_status), version_history in zip(modified_apps, version_histories):
+        # The running version is usually among the last tags, otherwise it's requested
+        current_version = next((version["Version"] for version in version_history if version["Key"] == app_status["BaseApplicationVersionKey"]), None)
+        if current_version is None:
+            current_version = get_application_version(artifact_dir, lt_endpoint, lt_token, False, app_status["BaseApplicationVersionKey"], app_name=app_name)["Version"]
+        tag_history = [version["Version"] for version in version_history]
+
+        # Adiciona logs para debug
+        print(f"Current version of {app_name} in environment: {current_version}")
+        print(f"Existing tags: {tag_history}")
+
+        # Finds next available tag number
+        generated_tag = find_next_free_version(current_version, sort_version_history(tag_history), max_tries)
+        if generated_tag is None:
+            print(f"Could not find available tag for Application '{app_name}' ", flush=True)
+            continue
+        print(f"Generated new tag: {generated_tag}")
+
+        # Generate new version number for each modified native shell
+        native_shell_versions = [{"NativePlatform": native_shell["NativePlatform"], "VersionNumber": get_next_version(native_shell["VersionNumber"]), "VersionDescription": log_msg}
+                                 for native_shell in app_status["MobileAppsStatus"] if native_shell["IsModified"]]
+        tagging_plan.append({"ApplicationName": app_name, "ApplicationKey": app_key, "Version": generated_tag, "MobileVersions": native_shell_versions})
+
+    return tagging_plan
+
+
+# Creates the new tags of the tagging plan, with at most LIFETIME_MAX_CONCURRENT_REQUESTS requests in flight.
+# Returns the number of applications that failed to be tagged.
+def apply_tagging_plan(lt_endpoint: str, lt_token: str, env_key: str, dest_env: str, tagging_plan: list, log_msg: str):
+    calls = [partial(set_application_version, lt_endpoint, lt_token, env_key, app_tag["ApplicationKey"], log_msg, app_tag["Version"], app_tag["MobileVersions"])
+             for app_tag in tagging_plan]
+    results = run_concurrently(calls, return_exceptions=True)
+    failed = 0
+    for app_tag, result in zip(tagging_plan, results):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"Failed to tag Application '{app_tag['ApplicationName']}' to version {app_tag['Version']} on environment '{dest_env}'.\nError: {result}", flush=True)
+        else:
+            print(f"Application '{app_tag['ApplicationName']}' successfully tagged to version {app_tag['Version']} on environment '{dest_env}'", flush=True)
+    return failed
 
 
 def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: str, lt_api_version: int, lt_token: str, dest_env: str, apps: list, trigger_manifest: dict, log_msg: str):
@@ -57,59 +104,18 @@ def main(artifact_dir: str, lt_http_proto: str, lt_url: str, lt_api_endpoint: st
     # Get the environment key
     env_key = get_environment_key(artifact_dir, lt_endpoint, lt_token, dest_env)
 
-    # Get all applications info
-    all_apps = get_applications(artifact_dir, lt_endpoint, lt_token, True)
+    # Get all applications info, including their status in every environment, with a single call
+    snapshot = get_environment_snapshot(artifact_dir, lt_endpoint, lt_token)
 
     # Use trigger_manifest or apps list
-    app_list = trigger_manifest[MANIFEST_APPLICATION_VERSIONS] if trigger_manifest else apps
-    trigger_in_use = bool(trigger_manifest)
-
-    for app in app_list:
-        app_name = app["ApplicationName"] if trigger_in_use else app
-        # Gets application specific details
-        app_detail = list(filter(lambda x: x["Name"] == app_name, all_apps))
-    
-        if len(app_detail):
-            # Checks if application is modified in target env
-            app_env_detail = list(filter(lambda x: x["EnvironmentKey"] == env_key and x["IsModified"], app_detail[0]["AppStatusInEnvs"]))
-    
-            if len(app_env_detail):
-                current_tag = get_running_app_version(artifact_dir, lt_endpoint, lt_token, env_key, app_name=app_name)
-                generated_tag = generate_new_version_number(current_tag["Version"])
-    
-                # List of the last application tags
-                tag_history_list = [d["Version"] for d in get_application_versions(artifact_dir, lt_endpoint, lt_token, get_configuration_value("MAX_VERSIONS_TO_RETURN", MAX_VERSIONS_TO_RETURN), app_name=app_name)]
-    
-                # Adiciona logs para debug
-                print(f"Current version in environment: {current_tag['Version']}")
-                print(f"Generated new tag: {generated_tag}")
-                print(f"Existing tags: {tag_history_list}")
-    
-                # Finds next available tag number
-                retries = 0
-                while retries < get_configuration_value("TAG_APP_MAX_RETRIES", TAG_APP_MAX_RETRIES):
-                    if generated_tag in tag_history_list:
-                        print(f"Tag {generated_tag} already exists. Generating a new one...")
-                        generated_tag = generate_new_version_number(generated_tag)
-                    else:
-                        # Checks if app is mobile and gets mobile info
-                        app_mobile_detail = list(filter(lambda x: x["IsModified"], app_env_detail[0]["MobileAppsStatus"]))
-    
-                        # Will contain the List of mobile versions to tag
-                        native_shell_versions = []
-    
-                        # Generate new version number for each native shell
-                        if app_mobile_detail:
-                            for native_shell in app_mobile_detail:
-                                native_shell_versions.append({"NativePlatform": native_shell["NativePlatform"], "VersionNumber": generate_new_version_number(native_shell["VersionNumber"]), "VersionDescription": log_msg})
-    
-                        set_application_version(lt_endpoint, lt_token, env_key, current_tag["ApplicationKey"], log_msg, generated_tag, native_shell_versions)
-                        print(f"Application '{current_tag['ApplicationName']}' successfully tagged to version {generated_tag} on environment '{dest_env}'", flush=True)
-                        break
-    
-                    retries += 1
-                    if retries == get_configuration_value("TAG_APP_MAX_RETRIES", TAG_APP_MAX_RETRIES):
-                        print(f"Could not find available tag for Application '{current_tag['ApplicationName']}' ", flush=True)
+    if trigger_manifest:
+        app_names = [app["ApplicationName"] for app in trigger_manifest[MANIFEST_APPLICATION_VERSIONS]]
+    else:
+        app_names = apps
+
+    tagging_plan = get_tagging_plan(artifact_dir, lt_endpoint, lt_token, env_key, snapshot, app_names, log_msg)
+    if apply_tagging_plan(lt_endpoint, lt_token, env_key, dest_env, tagging_plan, log_msg) > 0:
+        sys.exit(1)
 
 # End of main()
 
@@ -1,11 +1,9 @@
-# Python Modules
-import requests
-
 # Custom Modules
 from outsystems.exceptions.invalid_json_response import InvalidJsonResponseError
 from outsystems.vars.properties_vars import PROPERTIES_API_HTTP_PROTO, PROPERTIES_API_ENDPOINT, PROPERTIES_API_VERSION, PROPERTIES_API_SSL_CERT_VERIFY
 # Functions
 from outsystems.vars.vars_base import get_configuration_value
+from outsystems.lifetime.lifetime_base import get_lifetime_client
 
 
 # Method that builds the Properties API endpoint based on the environment host
@@ -21,7 +19,8 @@ def send_properties_put_request(lt_url: str, token: str, api_endpoint: str, payl
     # Format the request URL to include the api endpoint
     properties_api_url = build_properties_api_url(PROPERTIES_API_HTTP_PROTO, lt_url, PROPERTIES_API_ENDPOINT, PROPERTIES_API_VERSION)
     request_string = "{}/{}".format(properties_api_url, api_endpoint)
-    response = requests.put(
+    # The Properties API is served by the LifeTime host, so it shares the LifeTime connection pool
+    response = get_lifetime_client().put(
         request_string, data=payload, json=None, headers=headers, verify=get_configuration_value("PROPERTIES_API_SSL_CERT_VERIFY", PROPERTIES_API_SSL_CERT_VERIFY))
     response_obj = {"http_status": response.status_code, "response": {}}
     if len(response.text) > 0:
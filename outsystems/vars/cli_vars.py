@@ -0,0 +1,14 @@
+# Python Modules
+import os
+
+# Pipeline daemon specific variables
+# The daemon (outsystems-pipeline serve) writes its address and access token to this file while it runs
+DAEMON_STATE_FILE = os.path.join(os.path.expanduser("~"), ".outsystems-pipeline", "daemon.json")
+# Local address the daemon listens on (port 0 = any free port)
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 0
+# The outsystems-pipeline command forwards the scripts to the daemon when it's running. The daemon runs one script at
+# a time: scripts sent while it's busy run in the calling process instead
+DAEMON_FORWARDING_ENABLED = True
+# Time to wait for the daemon to accept a script, before running it in the calling process
+DAEMON_CONNECT_TIMEOUT_IN_SECS = 2
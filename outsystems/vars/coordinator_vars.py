@@ -0,0 +1,15 @@
+# Python Modules
+import os
+
+# Coordinator specific variables
+# Queue pipelines deploying to the same target environment through a local database (agents sharing a volume share it)
+COORDINATOR_ENABLED = False
+COORDINATOR_DB_FILE = os.path.join(os.path.expanduser("~"), ".outsystems-pipeline", "coordinator.db")
+# How often a waiting pipeline checks the queue (a release in the same process wakes it right away)
+COORDINATOR_POLL_INTERVAL_IN_SECS = 1
+# Queue entries refresh their heartbeat periodically, entries older than COORDINATOR_STALE_AFTER_IN_SECS are dropped
+COORDINATOR_HEARTBEAT_IN_SECS = 10
+COORDINATOR_STALE_AFTER_IN_SECS = 60
+# Plan batching: the pipeline whose turn comes waits this long for other requests to the same environment (from the
+# same source environment) and deploys them all in a single deployment plan (0 = one plan per pipeline)
+COORDINATOR_BATCH_WINDOW_IN_SECS = 0
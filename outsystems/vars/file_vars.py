@@ -1,6 +1,23 @@
+# Python Modules
+import os
+
 # Directory Vars
 ARTIFACT_FOLDER = "Artifacts"
 
+# Cache format vars
+# Default format of cache files (indented JSON, readable by any tool)
+CACHE_FORMAT = "json"
+# Format of large LifeTime payloads (application lists, with or without modules and status per environment)
+# Examples: "json-compact", "json-compact+gzip", "msgpack+zstd" (msgpack and zstd need the msgpack / zstandard packages)
+LIFETIME_CACHE_FORMAT = "json"
+
+# Cache freshness vars
+# Sidecar file with the fetch timestamp and validators (ETag / Last-Modified) of a cache file
+CACHE_METADATA_SUFFIX = ".meta"
+# Seconds a cached LifeTime list is reused as-is, when the caller allows it (after that it's revalidated)
+APPLICATIONS_CACHE_TTL_IN_SECS = 60
+ENVIRONMENTS_CACHE_TTL_IN_SECS = 600
+
 # Applications vars
 APPLICATIONS_FILE = "applications.cache"
 APPLICATION_FILE = ".cache"
@@ -9,6 +26,27 @@ APPLICATION_VERSION_FILE = ".version.cache"
 APPLICATION_FOLDER = "application_data"
 APPLICATION_OAP_FOLDER = "application_oap"
 APPLICATION_OAP_FILE = ".oap"
+# OAP download vars
+OAP_PARTIAL_FILE_SUFFIX = ".part"
+OAP_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Seconds without receiving data before the download is considered dropped (and resumed)
+OAP_DOWNLOAD_TIMEOUT_IN_SECS = 60
+OAP_DOWNLOAD_RETRIES = 3
+# Packages exported at the same time, downloads at the same time from a single host, and total download bandwidth
+# (bytes per second, 0 = unlimited) shared by all of them
+OAP_EXPORT_MAX_WORKERS = 4
+OAP_DOWNLOAD_MAX_PER_HOST = 2
+OAP_DOWNLOAD_MAX_BYTES_PER_SEC = 0
+# Package store shared across runs (packages by application version key), so a package is only downloaded once
+PACKAGE_STORE_ENABLED = False
+PACKAGE_STORE_DIR = os.path.join(os.path.expanduser("~"), ".outsystems-pipeline", "package_store")
+PACKAGE_STORE_MAX_SIZE_IN_MB = 10240
+PACKAGE_STORE_FILE = ".oap"
+PACKAGE_STORE_SHA256_FILE = ".sha256"
+# Temporary files of interrupted writes are removed by the store cleanup once they are older than this
+PACKAGE_STORE_TEMP_GRACE_IN_SECS = 3600
+# Record the SHA-256 of each exported OAP in the OAP list (sorted_oap.list), and verify it before deploying
+OAP_RECORD_SHA256 = False
 
 # Modules vars
 MODULES_FILE = "modules.cache"
@@ -37,6 +75,7 @@ DEPLOYMENT_FOLDER = "deployment_data"
 # CICD Probe vars
 PROBE_APPLICATION_SCAN_FILE = ".probe.cache"
 PROBE_APPLICATION_DEPENDENCIES_FILE = ".dependencies.cache"
+PROBE_DEPENDENCY_GRAPH_FILE = "dependency_graph.cache"
 PROBE_FOLDER = "cicd_probe_data"
 
 # BDD Framework vars
@@ -57,3 +96,5 @@ AD_FOLDER = "techdebt_data"
 
 # AirGap vars
 DEPLOYMENT_ORDER_FILE = "sorted_oap.list"
+OSPTOOL_LOG_FOLDER = "osptool_logs"
+OSPTOOL_TIMING_FILE = ".timing.cache"
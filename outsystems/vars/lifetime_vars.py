@@ -3,12 +3,22 @@ LIFETIME_HTTP_PROTO = "https"
 LIFETIME_API_ENDPOINT = "lifetimeapi/rest"
 LIFETIME_API_VERSION = 2
 LIFETIME_SSL_CERT_VERIFY = True
+# HTTP connection pool (number of hosts with a cached pool and connections kept alive per host)
+LIFETIME_HTTP_POOL_CONNECTIONS = 10
+LIFETIME_HTTP_POOL_MAXSIZE = 10
+LIFETIME_HTTP_KEEP_ALIVE = True
+LIFETIME_HTTP_LOG_STATS = False
+# Maximum number of LifeTime API calls in flight when fanning out requests
+LIFETIME_MAX_CONCURRENT_REQUESTS = 8
+# Seconds a name/key confirmed missing from a fresh LifeTime list is answered without refetching the list
+LOOKUP_NEGATIVE_CACHE_TTL_IN_SECS = 60
 
 # Applications Endpoint Variables
 # Application list specific
 APPLICATIONS_ENDPOINT = "applications"
 APPLICATIONS_SUCCESS_CODE = 200
 APPLICATIONS_EMPTY_CODE = 204
+APPLICATIONS_NOT_MODIFIED_CODE = 304
 APPLICATIONS_FLAG_FAILED_CODE = 400
 APPLICATIONS_FAILED_CODE = 500
 # Application specific
@@ -81,6 +91,7 @@ DEPLOYMENT_ACTION_FAILED_CODE = 500
 ENVIRONMENTS_ENDPOINT = "environments"
 ENVIRONMENTS_SUCCESS_CODE = 200
 ENVIRONMENTS_NOT_FOUND_CODE = 204
+ENVIRONMENTS_NOT_MODIFIED_CODE = 304
 ENVIRONMENTS_FAILED_CODE = 500
 # Environment application list specific
 ENVIRONMENT_APPLICATIONS_ENDPOINT = "applications"
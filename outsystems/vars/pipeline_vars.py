@@ -2,14 +2,29 @@
 QUEUE_TIMEOUT_IN_SECS = 1800
 DEPLOYMENT_TIMEOUT_IN_SECS = 3600
 SLEEP_PERIOD_IN_SECS = 20
+# Adaptive polling of LifeTime: starts at the initial interval and backs off (with jitter) up to SLEEP_PERIOD_IN_SECS
+DEPLOYMENT_POLL_INITIAL_INTERVAL_IN_SECS = 2
+DEPLOYMENT_POLL_BACKOFF_FACTOR = 2
+DEPLOYMENT_POLL_JITTER_PERCENT = 20
 REDEPLOY_OUTDATED_APPS = True
 ALLOW_CONTINUE_WITH_ERRORS = False
 DEPLOYMENT_STATUS_LIST = ["saved", "running", "needs_user_intervention", "aborting"]
 DEPLOYMENT_ERROR_STATUS_LIST = ["aborted", "finished_with_errors"]
+# Statuses a deployment plan never leaves (its status is no longer polled once it reaches one)
+DEPLOYMENT_TERMINAL_STATUS_LIST = ["aborted", "finished_successful", "finished_with_warnings", "finished_with_errors"]
 DEPLOYMENT_WAITING_STATUS = "needs_user_intervention"
 DEPLOYMENT_RUNNING_STATUS = "running"
 DEPLOYMENT_SAVED_STATUS = "saved"
 
+# OSP Tool specific variables
+# Hard timeout of a single OSP Tool run; the whole process tree is killed when it expires.
+# Disabled by default (0 = no timeout): set it in the configuration file to enable it
+OSP_TOOL_TIMEOUT_IN_SECS = 0
+# Case-insensitive text in the OSP Tool output that marks the start of the compile and publish phases (for timings).
+# Overrides can be lists or comma-separated text
+OSP_TOOL_COMPILE_MARKERS = ["compiling"]
+OSP_TOOL_PUBLISH_MARKERS = ["deploying", "publishing"]
+
 # Pipeline files variables
 CONFLICTS_FILE = "DeploymentConflicts"
 DEPLOY_ERROR_FILE = "DeploymentErrors"
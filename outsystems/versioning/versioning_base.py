@@ -0,0 +1,55 @@
+# Python Modules
+from bisect import bisect_left
+from functools import lru_cache
+
+
+# Parses a version tag (e.g. "1.2.3") into a tuple of integers, without the trailing zeros: "1.2" and "1.2.0" are
+# the same version, as they were for pkg_resources.parse_version. Tuples compare natively, in C.
+# Results are cached, so every occurrence of a tag shares the same tuple.
+# Raises ValueError if the tag is not made of dot separated numbers.
+@lru_cache(maxsize=4096)
+def parse_version_tag(version: str):
+    try:
+        parts = [int(part) for part in version.strip().split(".")]
+    except ValueError:
+        raise ValueError("Invalid version tag: {}. Expected dot separated numbers, e.g. 1.0.3".format(version))
+    while len(parts) > 1 and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+
+# Returns -1, 0 or 1 when version_a is lower, equal or higher than version_b
+def compare_versions(version_a: str, version_b: str):
+    parsed_a = parse_version_tag(version_a)
+    parsed_b = parse_version_tag(version_b)
+    return (parsed_a > parsed_b) - (parsed_a < parsed_b)
+
+
+# Returns the tag that follows a version: the revision is incremented (Major.Minor.Revision), and missing parts default
+# to Major.0.1. Parts after the revision are dropped.
+def get_next_version(version: str):
+    parts = version.strip().split(".")
+    major = parts[0]
+    minor = parts[1] if len(parts) > 1 else "0"
+    revision = str(int(parts[2]) + 1) if len(parts) > 2 else "1"
+    return "{}.{}.{}".format(major, minor, revision)
+
+
+# Returns the sorted, deduplicated version tags of an application history, to search with find_next_free_version
+def sort_version_history(versions: list):
+    return sorted(set(parse_version_tag(version) for version in versions))
+
+
+# Returns the first tag after base_version (see get_next_version) that is not in the sorted history (see
+# sort_version_history), trying at most max_tries tags, or None if they are all taken.
+# The tags tried only grow, so the history is searched once, from left to right.
+def find_next_free_version(base_version: str, sorted_history: list, max_tries: int):
+    candidate = get_next_version(base_version)
+    index = 0
+    for _ in range(max_tries):
+        parsed = parse_version_tag(candidate)
+        index = bisect_left(sorted_history, parsed, index)
+        if index == len(sorted_history) or sorted_history[index] != parsed:
+            return candidate
+        candidate = get_next_version(candidate)
+    return None
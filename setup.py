@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 import os
 
 NAME = 'outsystems-pipeline'
@@ -85,6 +85,8 @@ PACKAGES = [
     'outsystems.architecture_dashboard',
     'outsystems.bdd_framework',
     'outsystems.cicd_probe',
+    'outsystems.cli',
+    'outsystems.coordinator',
     'outsystems.exceptions',
     'outsystems.file_helpers',
     'outsystems.lifetime',
@@ -92,9 +94,16 @@ PACKAGES = [
     'outsystems.osp_tool',
     'outsystems.pipeline',
     'outsystems.properties',
-    'outsystems.vars'
+    'outsystems.vars',
+    'outsystems.versioning'
 ]
 
+ENTRY_POINTS = {
+    'console_scripts': [
+        'outsystems-pipeline = outsystems.cli.cli_base:main'
+    ]
+}
+
 if __name__ == '__main__':  # Do not run setup() when we import this module.
     if os.path.isfile("VERSION"):
         with open("VERSION", 'r') as version_file:
@@ -116,5 +125,6 @@ if __name__ == '__main__':  # Do not run setup() when we import this module.
         python_requires=PYTHON_REQUIRES,
         classifiers=CLASSIFIERS,
         packages=PACKAGES,
-        install_requires=REQUIREMENTS
+        install_requires=REQUIREMENTS,
+        entry_points=ENTRY_POINTS
     )
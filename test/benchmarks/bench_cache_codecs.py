@@ -0,0 +1,41 @@
+# Benchmark: write and read times of an applications cache (with modules and status per environment) for every
+# cache format available in this environment.
+# Usage: python -m test.benchmarks.bench_cache_codecs [number of applications]
+import os
+import sys
+import tempfile
+import timeit
+
+from outsystems.exceptions.cache_format_error import CacheFormatError
+from outsystems.file_helpers.file import load_data, store_data
+
+CACHE_FORMATS = ["json", "json-compact", "json-compact+gzip", "json-compact+zstd", "msgpack", "msgpack+zstd"]
+
+
+def _applications(app_count: int):
+    return [{"Key": "a1b2c3d4-0000-0000-0000-{:012d}".format(i), "Name": "Application {}".format(i),
+             "Description": "Application number {} of the benchmark".format(i), "Team": "", "Kind": "Web",
+             "IsActive": True, "Icon": "",
+             "Modules": [{"Key": "m{}-{}".format(i, m), "Name": "Module_{}_{}".format(i, m), "Kind": "eSpace"} for m in range(8)],
+             "AppStatusInEnvs": [{"EnvironmentKey": "env{}".format(e), "BaseApplicationVersionKey": "v{}-{}".format(i, e),
+                                  "IsModified": False, "DeploymentZoneKey": "", "ModuleStatusInEnvs": []} for e in range(4)]}
+            for i in range(app_count)]
+
+
+def main(app_count: int):
+    applications = _applications(app_count)
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        print("{:<20} {:>10} {:>10} {:>12}".format("format", "write (s)", "read (s)", "size (KB)"))
+        for cache_format in CACHE_FORMATS:
+            try:
+                write = min(timeit.repeat(lambda: store_data(artifact_dir, "applications.cache", applications, cache_format), number=1, repeat=3))
+            except CacheFormatError as error:
+                print("{:<20} skipped: {}".format(cache_format, error))
+                continue
+            read = min(timeit.repeat(lambda: load_data(artifact_dir, "applications.cache"), number=1, repeat=3))
+            size = os.path.getsize(os.path.join(artifact_dir, "applications.cache")) / 1024
+            print("{:<20} {:>10.3f} {:>10.3f} {:>12.0f}".format(cache_format, write, read, size))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,56 @@
+# Benchmark: import cost of the outsystems-pipeline command and of each subcommand, measured with python -X importtime
+# in a fresh interpreter (best of a few runs, in milliseconds).
+# When a history file is given, the results are appended to it (one JSON line per run) and compared with the last run,
+# to track the startup cost over time.
+# Usage: python -m test.benchmarks.bench_cli_startup [history file]
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from outsystems.cli.cli_base import PIPELINE_COMMANDS
+
+RUNS = 3
+
+
+# Returns the cumulative import time of a module, in milliseconds
+def _import_time(module: str):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {}".format(module)], capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise ValueError("Import time of {} not found in the python -X importtime output.".format(module))
+
+
+def _load_last_run(history_file: str):
+    if not os.path.isfile(history_file):
+        return None
+    with open(history_file) as infile:
+        lines = [line for line in infile if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main(history_file: str = None):
+    modules = {"outsystems-pipeline": "outsystems.cli.cli_base"}
+    modules.update({command: module for command, (module, _) in PIPELINE_COMMANDS.items()})
+    results = {command: min(_import_time(module) for _ in range(RUNS)) for command, module in modules.items()}
+
+    last_run = _load_last_run(history_file) if history_file else None
+    print("{:<42} {:>12} {:>12}".format("command", "import (ms)", "change (ms)"))
+    for command, import_ms in results.items():
+        change = ""
+        if last_run and command in last_run["results"]:
+            change = "{:+.1f}".format(import_ms - last_run["results"][command])
+        print("{:<42} {:>12.1f} {:>12}".format(command, import_ms, change))
+
+    if history_file:
+        with open(history_file, "a") as outfile:
+            outfile.write(json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "results": results}) + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,40 @@
+# Microbenchmark: application key lookups against a 5000 application cache.
+# Compares the previous behaviour (load the cache file and scan it on every lookup) with the in-process index.
+# Usage: python -m test.benchmarks.bench_lookup_index
+import tempfile
+import timeit
+
+from outsystems.file_helpers.file import load_data, store_data
+from outsystems.lifetime.lifetime_applications import _find_application_key
+from outsystems.lifetime.lifetime_lookup import invalidate_lookup_index
+from outsystems.vars.file_vars import APPLICATIONS_FILE
+
+APP_COUNT = 5000
+LOOKUPS = 200
+
+
+def _linear_find_application_key(artifact_dir: str, application_name: str):
+    for app in load_data(artifact_dir, APPLICATIONS_FILE):
+        if app["Name"] == application_name:
+            return app["Key"]
+    return ""
+
+
+def main():
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        applications = [{"Name": "App {}".format(i), "Key": "key-{}".format(i)} for i in range(APP_COUNT)]
+        store_data(artifact_dir, APPLICATIONS_FILE, applications)
+        names = ["App {}".format(i) for i in range(APP_COUNT - 1, 0, -(APP_COUNT // LOOKUPS))]
+
+        linear = timeit.timeit(lambda: [_linear_find_application_key(artifact_dir, name) for name in names], number=1)
+        invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+        indexed = timeit.timeit(lambda: [_find_application_key(artifact_dir, "http://unused", "", name) for name in names], number=1)
+        invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+
+        print("{} lookups over {} applications".format(len(names), APP_COUNT))
+        print("load + linear scan: {:.4f}s ({:.3f}ms/lookup)".format(linear, linear * 1000 / len(names)))
+        print("in-process index:   {:.4f}s ({:.3f}ms/lookup)".format(indexed, indexed * 1000 / len(names)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Minimal LifeTime API stand-in for tests.
+# routes maps "METHOD /path" (without query string) to (status, body) or (status, body, headers),
+# or to a callable(handler) returning one of those.
+class LifeTimeStubServer:
+    def __init__(self, routes: dict = None, delay: float = 0):
+        self.routes = routes or {}
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._build_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self._server.server_port)
+
+    @property
+    def lt_api(self):
+        return "{}/lifetimeapi/rest/v2".format(self.url)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _handle(self, handler):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.requests.append("{} {}".format(handler.command, handler.path))
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            route = "{} {}".format(handler.command, handler.path.split("?")[0])
+            result = self.routes.get(route, (404, {"Errors": ["Not found: {}".format(route)]}))
+            result = result(handler) if callable(result) else result
+            status, body, headers = result if len(result) == 3 else result + ({},)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        # Raw bytes are sent as-is (e.g. package downloads), anything else as JSON
+        if isinstance(body, bytes):
+            payload, content_type = body, "application/octet-stream"
+        else:
+            payload, content_type = b"" if body is None else json.dumps(body).encode(), "application/json"
+        headers = dict(headers)
+        # A declared Content-Length longer than the body simulates a connection dropped mid-transfer
+        content_length = headers.pop("Content-Length", str(len(payload)))
+        if content_length != str(len(payload)):
+            handler.close_connection = True
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", content_length)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _build_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.body = self.rfile.read(length) if length else b""
+                stub._handle(self)
+
+            def do_DELETE(self):
+                stub._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
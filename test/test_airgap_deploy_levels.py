@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+from outsystems.cicd_probe.cicd_dependencies import sort_app_dependencies_by_level
+from outsystems.exceptions.osptool_error import OSPToolDeploymentError
+from outsystems.pipeline import deploy_apps_to_target_env_with_airgap as airgap
+
+
+def _oap(key: str):
+    return {"app_name": key.upper(), "app_key": key, "version_key": "v-" + key, "app_version": "1.0", "filename": key + ".oap"}
+
+
+def test_sort_by_level():
+    # x is a producer outside the deployment; b and d depend on the first level only, c also on b
+    assert sort_app_dependencies_by_level({"c": {"a", "b"}, "d": {"a"}, "a": set(), "b": {"x"}}) == [["a", "x"], ["b", "d"], ["c"]]
+
+
+def test_deploy_by_level_runs_levels_in_order_and_apps_concurrently(tmp_path, monkeypatch):
+    running, events, lock = [0], [], threading.Lock()
+
+    def fake_osptool(osp_tool_path, package_file_path, env_hostname, credentials, log_file=None, queued_at=None):
+        with lock:
+            running[0] += 1
+            events.append(("start", package_file_path, running[0]))
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+            events.append(("end", package_file_path, running[0]))
+
+    monkeypatch.setattr(airgap, "call_osptool", fake_osptool)
+    levels = [[_oap("a"), _oap("b")], [_oap("c")]]
+    airgap.deploy_apps_oap_by_level(str(tmp_path), "env", "osp", "creds", levels, 4)
+    starts = [event for event in events if event[0] == "start"]
+    # a and b ran at the same time, c only after both finished
+    assert max(event[2] for event in starts) == 2
+    assert events[-2][0] == "start" and events[-2][1].endswith("c.oap")
+
+
+def test_deploy_by_level_fails_fast(tmp_path, monkeypatch):
+    deployed = []
+
+    def fake_osptool(osp_tool_path, package_file_path, env_hostname, credentials, log_file=None, queued_at=None):
+        if package_file_path.endswith("b.oap"):
+            raise OSPToolDeploymentError("failed, see {}".format(log_file))
+        deployed.append(package_file_path)
+
+    monkeypatch.setattr(airgap, "call_osptool", fake_osptool)
+    levels = [[_oap("a"), _oap("b")], [_oap("c")]]
+    with pytest.raises(OSPToolDeploymentError) as error:
+        airgap.deploy_apps_oap_by_level(str(tmp_path), "env", "osp", "creds", levels, 2)
+    assert "b.oap.log" in str(error.value)
+    assert not any(path.endswith("c.oap") for path in deployed)
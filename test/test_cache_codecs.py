@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from outsystems.exceptions.cache_format_error import CacheFormatError
+from outsystems.file_helpers import cache_codecs
+from outsystems.file_helpers.file import load_data, store_data
+
+DATA = [{"Key": "k1", "Name": "App ç", "Modules": [{"Key": "m1"}], "IsModified": False, "Size": 1.5}]
+
+
+@pytest.mark.parametrize("cache_format", ["json", "json-compact", "json+gzip", "json-compact+gzip"])
+def test_round_trip(tmp_path, cache_format):
+    store_data(str(tmp_path), "applications.cache", DATA, cache_format)
+    assert load_data(str(tmp_path), "applications.cache") == DATA
+
+
+def test_default_format_is_indented_json(tmp_path):
+    store_data(str(tmp_path), "applications.cache", DATA)
+    with open(str(tmp_path / "applications.cache")) as f:
+        content = f.read()
+    assert json.loads(content) == DATA
+    assert "\n    " in content
+
+
+def test_optional_backends(tmp_path):
+    for cache_format, module in (("msgpack", cache_codecs.msgpack), ("json+zstd", cache_codecs.zstandard)):
+        if module is None:
+            with pytest.raises(CacheFormatError):
+                store_data(str(tmp_path), "applications.cache", DATA, cache_format)
+        else:
+            store_data(str(tmp_path), "applications.cache", DATA, cache_format)
+            assert load_data(str(tmp_path), "applications.cache") == DATA
+
+
+def test_unknown_format():
+    with pytest.raises(CacheFormatError):
+        cache_codecs.encode_cache_data(DATA, "yaml")
+
+
+def test_failed_encoding_leaves_no_file(tmp_path):
+    with pytest.raises(CacheFormatError):
+        store_data(str(tmp_path), "applications.cache", DATA, "yaml")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,38 @@
+from outsystems.file_helpers.file import check_file, clear_cache
+from outsystems.lifetime.lifetime_applications import get_applications
+from outsystems.lifetime.lifetime_environments import get_environments
+from outsystems.vars.file_vars import APPLICATIONS_FILE, ENVIRONMENTS_FILE, CACHE_METADATA_SUFFIX
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+ENVIRONMENTS = [{"Key": "qa", "Name": "QA", "HostName": "qa.example.com"}]
+
+
+def _conditional_environments(handler):
+    if handler.headers.get("If-None-Match") == '"v1"':
+        return 304, None
+    return 200, ENVIRONMENTS, {"ETag": '"v1"'}
+
+
+def test_conditional_get_revalidates_cached_list(tmp_path):
+    artifact_dir = str(tmp_path)
+    with LifeTimeStubServer({"GET {}/environments".format(LT): _conditional_environments}) as server:
+        assert get_environments(artifact_dir, server.lt_api, "token") == ENVIRONMENTS
+        # Not Modified: served from the cache
+        assert get_environments(artifact_dir, server.lt_api, "token") == ENVIRONMENTS
+        assert len(server.requests) == 2
+    clear_cache(artifact_dir, ENVIRONMENTS_FILE)
+    assert not check_file(artifact_dir, ENVIRONMENTS_FILE + CACHE_METADATA_SUFFIX)
+
+
+def test_use_cache_skips_request_while_fresh(tmp_path):
+    artifact_dir = str(tmp_path)
+    routes = {"GET {}/applications".format(LT): (200, [{"Key": "k1", "Name": "App"}])}
+    with LifeTimeStubServer(routes) as server:
+        get_applications(artifact_dir, server.lt_api, "token", False)
+        assert get_applications(artifact_dir, server.lt_api, "token", False, True) == [{"Key": "k1", "Name": "App"}]
+        assert len(server.requests) == 1
+        # A list fetched with other params is not reused
+        get_applications(artifact_dir, server.lt_api, "token", True, True)
+        assert len(server.requests) == 2
+    assert check_file(artifact_dir, APPLICATIONS_FILE + CACHE_METADATA_SUFFIX)
@@ -0,0 +1,27 @@
+from urllib.parse import parse_qs, urlsplit
+
+from outsystems.pipeline.deploy_apps_to_target_env_with_airgap import generate_deployment_order
+from test.lifetime_stub import LifeTimeStubServer
+
+PRODUCERS = {"App A": [], "App B": ["a"], "App C": ["a", "b"]}
+
+
+def _dependencies(handler):
+    app_name = parse_qs(urlsplit(handler.path).query)["ApplicationName"][0]
+    return 200, [{"ApplicationKey": key} for key in PRODUCERS[app_name]]
+
+
+def _oap(key: str):
+    return {"app_name": "App " + key.upper(), "app_key": key, "version_key": "v-" + key, "app_version": "1.0", "filename": key + ".oap"}
+
+
+def test_dependencies_are_fetched_concurrently_and_cached(tmp_path):
+    app_oap_list = [_oap("c"), _oap("b"), _oap("a")]
+    with LifeTimeStubServer({"GET /probe/GetApplicationDependencies": _dependencies}, delay=0.1) as server:
+        probe_endpoint = "{}/probe".format(server.url)
+        order = generate_deployment_order(str(tmp_path), probe_endpoint, None, app_oap_list)
+        assert server.max_in_flight == 3
+        # A later step (e.g. the air-gap deploy after fetch_apps_packages) reuses the cached producers
+        assert generate_deployment_order(str(tmp_path), probe_endpoint, None, app_oap_list) == order
+        assert len(server.requests) == 3
+    assert [app["app_key"] for app in order] == ["a", "b", "c"]
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+from toposort import toposort
+
+from outsystems.cicd_probe.cicd_dependency_graph import DependencyGraph, map_keys_to_oap, load_dependency_graph, store_dependency_graph
+from outsystems.exceptions.dependency_cycle import DependencyCycleError
+
+
+def _random_dag(size: int, seed: int):
+    rng = random.Random(seed)
+    return {"n{}".format(i): {"n{}".format(j) for j in rng.sample(range(i), min(i, rng.randint(0, 3)))} for i in range(size)}
+
+
+def test_levels_match_toposort():
+    for seed in range(20):
+        dependencies = _random_dag(60, seed)
+        assert DependencyGraph(dependencies).get_levels() == [sorted(level) for level in toposort(dependencies)]
+
+
+def test_cycle_members_are_reported():
+    # a <-> b is a cycle, c only depends on it, d depends on itself
+    with pytest.raises(DependencyCycleError) as error:
+        DependencyGraph({"a": {"b"}, "b": {"a"}, "c": {"a"}, "d": {"d"}, "e": set()})
+    assert error.value.cycles == [["a", "b"], ["d"]]
+    assert error.value.data == {"a": {"b"}, "b": {"a"}, "d": {"d"}}
+
+
+def test_incremental_update_matches_full_sort():
+    rng = random.Random(7)
+    dependencies = _random_dag(200, 1)
+    graph = DependencyGraph(dependencies)
+    for _ in range(20):
+        node = "n{}".format(rng.randrange(1, 200))
+        index = int(node[1:])
+        dependencies[node] = {"n{}".format(j) for j in rng.sample(range(index), min(index, 2))}
+        affected = graph.update(dependencies)
+        assert node in affected and len(affected) < 200
+        assert graph.get_levels() == DependencyGraph(dependencies).get_levels()
+
+
+def test_failed_update_keeps_graph_and_graph_round_trips(tmp_path):
+    graph = DependencyGraph({"b": {"a"}})
+    with pytest.raises(DependencyCycleError):
+        graph.update({"b": {"a"}, "a": {"b"}})
+    assert graph.get_order() == ["a", "b"]
+    store_dependency_graph(str(tmp_path), graph)
+    loaded = load_dependency_graph(str(tmp_path))
+    assert loaded.update({"b": {"a"}, "c": {"b"}}) == ["c"]
+    assert loaded.get_levels() == [["a"], ["b"], ["c"]]
+
+
+def test_map_keys_to_oap():
+    app_oap_list = [{"app_key": "b", "filename": "b.oap"}, {"app_key": "a", "filename": "a.oap"}]
+    assert [oap["filename"] for oap in map_keys_to_oap(["a", "x", "b"], app_oap_list)] == ["a.oap", "b.oap"]
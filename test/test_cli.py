@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import outsystems.pipeline
+from outsystems.cli.cli_base import PIPELINE_COMMANDS, main
+
+
+def test_every_pipeline_script_is_a_command():
+    pipeline_dir = os.path.dirname(outsystems.pipeline.__file__)
+    scripts = set()
+    for filename in os.listdir(pipeline_dir):
+        if filename.endswith(".py"):
+            with open(os.path.join(pipeline_dir, filename)) as infile:
+                if "if __name__ == " in infile.read():
+                    scripts.add("outsystems.pipeline.{}".format(filename[:-3]))
+    assert scripts == set(module for module, _ in PIPELINE_COMMANDS.values())
+
+
+def test_command_runs_the_script_with_its_arguments(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["gc-package-store", "--help"])
+    assert exit_info.value.code == 0
+    assert capsys.readouterr().out.startswith("usage: outsystems-pipeline gc_package_store [-h]")
+
+
+def test_unknown_command(capsys):
+    assert main(["deploy_everything"]) == 2
+    assert "unknown command 'deploy_everything'" in capsys.readouterr().err
+    assert main([]) == 2
+
+
+def test_startup_does_not_load_the_scripts():
+    code = ("import sys\n"
+            "import outsystems.cli.cli_base\n"
+            "print(sorted(module for module in sys.modules if module.startswith('outsystems.pipeline.') or module == 'requests'))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,64 @@
+import os
+import threading
+
+import pytest
+
+from outsystems.cli.cli_base import main
+from outsystems.cli.cli_daemon import PipelineDaemon, forward_to_daemon
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    state_file = str(tmp_path / "daemon.json")
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("DAEMON_STATE_FILE", state_file)
+    daemon = PipelineDaemon("127.0.0.1", 0, state_file)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    while not os.path.isfile(state_file):
+        thread.join(0.01)
+    yield daemon
+    daemon.shutdown()
+    thread.join()
+    assert not os.path.isfile(state_file)
+
+
+def test_commands_are_forwarded_to_the_daemon(daemon, tmp_path, capsys):
+    cwd, environ = os.getcwd(), dict(os.environ)
+    assert main(["gc-package-store", "--help"]) == 0
+    assert capsys.readouterr().out.startswith("usage: outsystems-pipeline gc_package_store [-h]")
+    # Argument errors are reported by the script, with its exit code
+    assert forward_to_daemon("gc_package_store", ["--unknown"]) == 2
+    assert "unrecognized arguments: --unknown" in capsys.readouterr().err
+    assert daemon.scripts_run == 2
+    # The state changed by the scripts is restored
+    assert (os.getcwd(), dict(os.environ)) == (cwd, environ)
+
+
+def test_scripts_run_with_the_caller_environment(daemon, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PACKAGE_STORE_MAX_SIZE_IN_MB", "7")
+    assert forward_to_daemon("gc_package_store", ["-d", "relative_store"]) == 0
+    output = capsys.readouterr().out
+    assert output.startswith("Package store relative_store: 0 package(s) evicted")
+    # The size limit comes from the configuration of the caller
+    assert "(limit: 7 MB)" in output
+    assert daemon.scripts_run == 1
+
+
+def test_busy_daemon_refuses_scripts(daemon, capsys):
+    # A script of another pipeline is running
+    with daemon._run_lock:
+        assert forward_to_daemon("gc_package_store", ["--help"]) is None
+    assert "The pipeline daemon is busy running another script. Running it locally." in capsys.readouterr().err
+    assert daemon.scripts_run == 0
+    assert forward_to_daemon("gc_package_store", ["--help"]) == 0
+
+
+def test_no_daemon_running(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("DAEMON_STATE_FILE", str(tmp_path / "daemon.json"))
+    assert forward_to_daemon("gc_package_store", ["--help"]) is None
+    # Left behind by a daemon that was killed
+    (tmp_path / "daemon.json").write_text('{"host": "127.0.0.1", "port": 1, "token": "x", "pid": 1}')
+    assert forward_to_daemon("gc_package_store", ["--help"]) is None
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from outsystems.coordinator.coordinator_base import DeploymentCoordinator
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
+
+
+def test_pipelines_take_turns_in_fifo_order(tmp_path):
+    coordinator = DeploymentCoordinator(str(tmp_path / "coordinator.db"))
+    holder = coordinator.acquire("qa", timeout=5, description="first")
+    turns = []
+
+    def wait_turn(name: str):
+        ticket = coordinator.acquire("qa", timeout=10, description=name)
+        turns.append(name)
+        ticket.release()
+
+    waiters = []
+    for name in ["second", "third"]:
+        waiters.append(threading.Thread(target=wait_turn, args=(name,)))
+        waiters[-1].start()
+        # Make sure they are queued in order
+        while len(coordinator.get_queue("qa")) < len(waiters) + 1:
+            time.sleep(0.01)
+    # Other environments are not affected
+    coordinator.acquire("prd", timeout=1).release()
+    assert turns == []
+    # Still running: the environment stays taken
+    holder.on_deployment_transition(None, "running", {})
+    assert [entry["description"] for entry in coordinator.get_queue("qa")] == ["first", "second", "third"]
+    holder.on_deployment_transition("running", "finished_successful", {})
+    for waiter in waiters:
+        waiter.join(10)
+    assert turns == ["second", "third"]
+    assert coordinator.get_queue("qa") == []
+
+
+def test_timeout_leaves_the_queue_and_stale_entries_are_dropped(tmp_path):
+    coordinator = DeploymentCoordinator(str(tmp_path / "coordinator.db"))
+    holder = coordinator.acquire("qa", timeout=1)
+    with pytest.raises(DeploymentTimeoutError):
+        coordinator.acquire("qa", timeout=0.2)
+    assert len(coordinator.get_queue("qa")) == 1
+    # A holder that stopped sending heartbeats (e.g. a killed agent) no longer blocks the queue
+    with coordinator.transaction() as conn:
+        conn.execute("UPDATE deployment_queue SET heartbeat_at = 0")
+    coordinator.acquire("qa", timeout=1).release()
+    holder.release()
@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+
+import pytest
+
+from outsystems.coordinator.coordinator_base import get_deployment_coordinator
+from outsystems.coordinator.coordinator_batching import acquire_deployment_batch, merge_plan_requests
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
+
+
+def _app(key: str, version: str):
+    return {"Name": "App " + key, "Key": key, "Version": version, "VersionKey": key + version}
+
+
+def _request(*apps):
+    return {"dep_note": None, "applications": [dict(app, Operation={"ApplicationVersionKey": app["VersionKey"]}) for app in apps]}
+
+
+def test_merge_keeps_the_highest_version_of_each_application():
+    requests = [_request(_app("a", "1.2"), _app("b", "2.0")), _request(_app("a", "1.10"), _app("c", "0.1")), _request(_app("b", "1.9"))]
+    app_keys, app_names, applications = merge_plan_requests(requests)
+    assert app_keys == [{"ApplicationVersionKey": "a1.10"}, {"ApplicationVersionKey": "b2.0"}, {"ApplicationVersionKey": "c0.1"}]
+    assert app_names == ["App a", "App b", "App c"]
+    assert applications["a"]["Version"] == "1.10"
+
+
+def test_queued_requests_are_deployed_in_one_plan(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("COORDINATOR_ENABLED", "True")
+    monkeypatch.setenv("COORDINATOR_DB_FILE", str(tmp_path / "coordinator.db"))
+    monkeypatch.setenv("COORDINATOR_BATCH_WINDOW_IN_SECS", "1")
+    # Another pipeline is deploying to the environment, so both requests queue
+    holder = get_deployment_coordinator().acquire("qa", timeout=1)
+    batches = {}
+
+    def request(name: str, apps: list):
+        app_keys = [{"ApplicationVersionKey": app["VersionKey"]} for app in apps]
+        batches[name] = acquire_deployment_batch("qa", "dev", 2, apps, app_keys, "Note " + name)
+
+    threads = [threading.Thread(target=request, args=("first", [_app("a", "1.0")])),
+               threading.Thread(target=request, args=("second", [_app("a", "1.1"), _app("b", "3.0")]))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.2)
+    holder.release()
+    threads[0].join(10)
+    ticket, leader = batches["first"]
+    assert leader.is_leader
+    assert leader.app_keys == [{"ApplicationVersionKey": "a1.1"}, {"ApplicationVersionKey": "b3.0"}]
+    assert leader.dep_note == "Note first | Note second"
+    threads[1].join(10)
+    follower_ticket, follower = batches["second"]
+    assert follower_ticket is None and not follower.is_leader
+
+    leader.deployment_key = "plan1"
+    leader.on_deployment_transition("running", "finished_successful", {"DeploymentStatus": "finished_successful"})
+    ticket.release()
+    result = follower.wait_for_result(timeout=5)
+    assert result["DeploymentKey"] == "plan1"
+    assert result["DeploymentStatus"] == "finished_successful"
+    assert [(app["RequestedVersion"], app["DeployedVersion"]) for app in result["Applications"]] == [("1.1", "1.1"), ("3.0", "3.0")]
+
+
+def test_requests_of_failed_pipelines_are_not_deployed(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("COORDINATOR_ENABLED", "True")
+    monkeypatch.setenv("COORDINATOR_DB_FILE", str(tmp_path / "coordinator.db"))
+    monkeypatch.setenv("COORDINATOR_BATCH_WINDOW_IN_SECS", "1")
+    monkeypatch.setenv("QUEUE_TIMEOUT_IN_SECS", "1")
+    coordinator = get_deployment_coordinator()
+    holder = coordinator.acquire("qa", timeout=1)
+    # Times out in the queue
+    with pytest.raises(DeploymentTimeoutError):
+        acquire_deployment_batch("qa", "dev", 2, [_app("a", "1.0")], [{"ApplicationVersionKey": "a1.0"}], None)
+    # Killed while queued: its ticket is gone, its request is left pending
+    with coordinator.transaction() as conn:
+        conn.execute("INSERT INTO plan_requests (env_key, source_env_key, lt_api_version, applications, owner, state, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     ("qa", "dev", 2, json.dumps(_request(_app("c", "1.0"))["applications"]), "gone", "pending", time.time()))
+    holder.release()
+    ticket, leader = acquire_deployment_batch("qa", "dev", 2, [_app("b", "2.0")], [{"ApplicationVersionKey": "b2.0"}], None)
+    assert leader.is_leader
+    assert leader.app_keys == [{"ApplicationVersionKey": "b2.0"}]
+    leader.complete({"DeploymentStatus": "finished_successful"})
+    ticket.release()
+    with coordinator.transaction() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM plan_requests").fetchone()[0] == 1
@@ -0,0 +1,92 @@
+import hashlib
+import os
+
+from outsystems.file_helpers.file import download_oap, get_file_sha256
+from test.lifetime_stub import LifeTimeStubServer
+
+OAP = os.urandom(300 * 1024)
+ETAG = '"oap-v1"'
+
+
+def _oap_with_range(handler):
+    requested = handler.headers.get("Range")
+    if requested and handler.headers.get("If-Range") == ETAG:
+        start = int(requested.replace("bytes=", "").rstrip("-"))
+        return 206, OAP[start:], {"Content-Range": "bytes {}-{}/{}".format(start, len(OAP) - 1, len(OAP))}
+    return 200, OAP, {"ETag": ETAG}
+
+
+# Drops the connection of the first request after 100 KB, then answers with respond
+def _drop_first_request(seen: list, respond):
+    def route(handler):
+        seen.append((handler.headers.get("Range"), handler.headers.get("If-Range")))
+        if len(seen) == 1:
+            return 200, OAP[:100 * 1024], {"ETag": ETAG, "Content-Length": str(len(OAP))}
+        return respond(handler)
+    return route
+
+
+def test_download_streams_to_file_and_returns_sha256(tmp_path):
+    file_path = str(tmp_path / "application_oap" / "app.oap")
+    with LifeTimeStubServer({"GET /oap": _oap_with_range}) as server:
+        sha256 = download_oap(file_path, "token", "{}/oap".format(server.url))
+    assert sha256 == hashlib.sha256(OAP).hexdigest() == get_file_sha256(file_path)
+    assert not os.path.exists(file_path + ".part")
+
+
+def test_download_resumes_after_connection_drop(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("OAP_DOWNLOAD_CHUNK_SIZE", str(16 * 1024))
+    file_path = str(tmp_path / "app.oap")
+    seen = []
+    with LifeTimeStubServer({"GET /oap": _drop_first_request(seen, _oap_with_range)}) as server:
+        sha256 = download_oap(file_path, "token", "{}/oap".format(server.url))
+    with open(file_path, "rb") as f:
+        assert f.read() == OAP
+    assert sha256 == hashlib.sha256(OAP).hexdigest()
+    # Resumed only if the server still has the same file
+    assert len(seen) == 2 and seen[1][0].startswith("bytes=") and seen[1][1] == ETAG
+
+
+def test_download_ignores_partial_files_of_previous_runs(tmp_path):
+    file_path = str(tmp_path / "app.oap")
+    # e.g. left by the download of another application version
+    with open(file_path + ".part", "wb") as f:
+        f.write(os.urandom(100 * 1024))
+    seen = []
+
+    def route(handler):
+        seen.append(handler.headers.get("Range"))
+        return _oap_with_range(handler)
+
+    with LifeTimeStubServer({"GET /oap": route}) as server:
+        download_oap(file_path, "token", "{}/oap".format(server.url))
+    assert seen == [None]
+    with open(file_path, "rb") as f:
+        assert f.read() == OAP
+
+
+def test_download_restarts_on_unexpected_content_range(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("OAP_DOWNLOAD_CHUNK_SIZE", str(16 * 1024))
+    file_path = str(tmp_path / "app.oap")
+    seen = []
+
+    def wrong_range(handler):
+        if handler.headers.get("Range"):
+            return 206, OAP, {"Content-Range": "bytes 0-{}/{}".format(len(OAP) - 1, len(OAP))}
+        return 200, OAP, {"ETag": ETAG}
+
+    with LifeTimeStubServer({"GET /oap": _drop_first_request(seen, wrong_range)}) as server:
+        sha256 = download_oap(file_path, "token", "{}/oap".format(server.url))
+    assert [request[0] is None for request in seen] == [True, False, True]
+    assert get_file_sha256(file_path) == sha256 == hashlib.sha256(OAP).hexdigest()
+
+
+def test_download_restarts_when_range_is_ignored(tmp_path):
+    file_path = str(tmp_path / "app.oap")
+    with open(file_path + ".part", "wb") as f:
+        f.write(b"stale")
+    with LifeTimeStubServer({"GET /oap": (200, OAP)}) as server:
+        sha256 = download_oap(file_path, "token", "{}/oap".format(server.url))
+    assert get_file_sha256(file_path) == sha256 == hashlib.sha256(OAP).hexdigest()
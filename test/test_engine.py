@@ -0,0 +1,129 @@
+import sqlite3
+
+import pytest
+
+from outsystems.pipeline.engine import DeploymentContext, DeploymentEngine, SpecificTagsSource, validate_app_versions
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+
+
+# Version source with fixed application versions
+class FixedVersionsSource:
+    def __init__(self, app_data_list: list):
+        self.app_data_list = app_data_list
+
+    def get_app_data_list(self, context: DeploymentContext):
+        return self.app_data_list
+
+
+def _lifetime_routes(conflicts: list):
+    applications = [
+        {"Key": "app1", "Name": "App 1", "AppStatusInEnvs": []},
+        {"Key": "app2", "Name": "App 2", "AppStatusInEnvs": [
+            {"EnvironmentKey": "env-qa", "BaseApplicationVersionKey": "v2", "DeploymentZoneKey": "", "IsModified": False}]},
+    ]
+    environments = [{"Key": "env-dev", "Name": "Development"}, {"Key": "env-qa", "Name": "QA"}]
+    return {
+        "GET {}/applications".format(LT): (200, applications),
+        "GET {}/environments".format(LT): (200, environments),
+        "GET {}/deployments".format(LT): (204, None),
+        "POST {}/deployments".format(LT): (201, "plan1"),
+        "GET {}/deployments/plan1".format(LT): (200, {"ApplicationConflicts": conflicts}),
+        "DELETE {}/deployments/plan1".format(LT): (204, None),
+        "POST {}/deployments/plan1/start".format(LT): (202, None),
+        "GET {}/deployments/plan1/status".format(LT): (200, {"DeploymentStatus": "finished_successful", "Info": ""}),
+    }
+
+
+# Requests sent to the stub, without the query string
+def _sent(server: LifeTimeStubServer):
+    return [request.split("?")[0] for request in server.requests]
+
+
+def _engine(server: LifeTimeStubServer, artifact_dir: str, **options):
+    context = DeploymentContext(artifact_dir, server.lt_api, "token", 2, "Development", "env-dev", "QA", "env-qa")
+    source = FixedVersionsSource([{"Name": "App 1", "Key": "app1", "Version": "1.0.0", "VersionKey": "v1"},
+                                  {"Name": "App 2", "Key": "app2", "Version": "2.0.0", "VersionKey": "v2"}])
+    return DeploymentEngine(context, source, "Automated deploy", **options)
+
+
+def test_engine_deploys_only_the_missing_versions(tmp_path, capsys):
+    with LifeTimeStubServer(_lifetime_routes([])) as server:
+        assert _engine(server, str(tmp_path)).run() == 0
+        requests = _sent(server)
+    assert "POST {}/deployments/plan1/start".format(LT) in requests
+    # The snapshot is taken once for every application
+    assert requests.count("GET {}/applications".format(LT)) == 1
+    output = capsys.readouterr().out
+    assert "Skipping application App 2 with version 2.0.0" in output
+    assert "including applications: ['App 1']" in output
+    assert "Deployment plan finished with status finished_successful." in output
+
+
+def test_engine_conflicts_options(tmp_path):
+    conflicts = [{"ApplicationKey": "app1", "Details": "Missing dependency"}]
+    with LifeTimeStubServer(_lifetime_routes(conflicts)) as server:
+        assert _engine(server, str(tmp_path)).run() == 1
+        assert "DELETE {}/deployments/plan1".format(LT) in _sent(server)
+        server.requests.clear()
+        # Specific tags deployments keep the plan, manifest deployments may continue with errors
+        assert _engine(server, str(tmp_path), delete_on_conflicts=False).run() == 1
+        assert "DELETE {}/deployments/plan1".format(LT) not in _sent(server)
+        assert _engine(server, str(tmp_path), allow_continue_with_errors=True).run() == 0
+        assert "POST {}/deployments/plan1/start".format(LT) in _sent(server)
+    assert (tmp_path / "DeploymentConflicts").exists()
+
+
+def test_engine_batches_only_plans_watched_to_the_end(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("COORDINATOR_ENABLED", "True")
+    monkeypatch.setenv("COORDINATOR_DB_FILE", str(tmp_path / "coordinator.db"))
+    monkeypatch.setenv("COORDINATOR_BATCH_WINDOW_IN_SECS", "1")
+    with LifeTimeStubServer(_lifetime_routes([])) as server:
+        # The pipeline may leave after a 2-Step first step or a manual intervention
+        assert _engine(server, str(tmp_path), resume_on_intervention=False).run() == 0
+    with sqlite3.connect(str(tmp_path / "coordinator.db")) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'plan_requests'").fetchone() is None
+
+
+def test_validate_app_versions_reports_every_missing_version(tmp_path, capsys):
+    applications = [{"Key": "app{}".format(i), "Name": "App {}".format(i)} for i in range(1, 4)]
+    routes = {
+        "GET {}/applications".format(LT): (200, applications),
+        "GET {}/applications/app1/versions/v1".format(LT): (200, {"Key": "v1", "Version": "1.0.0"}),
+        "GET {}/applications/app2/versions/v2".format(LT): (404, None),
+        "GET {}/applications/app3/versions/v3".format(LT): (404, None),
+    }
+    app_data_list = [{"Name": "App {}".format(i), "Key": "app{}".format(i), "Version": "{}.0.0".format(i), "VersionKey": "v{}".format(i)}
+                     for i in range(1, 4)]
+    with LifeTimeStubServer(routes, delay=0.05) as server:
+        context = DeploymentContext(str(tmp_path), server.lt_api, "token", 2, "Development", "env-dev")
+        with pytest.raises(SystemExit):
+            validate_app_versions(context, app_data_list)
+        output = capsys.readouterr().out
+        assert "Application App 2 with version 2.0.0 no longer exists in Development." in output
+        assert "Application App 3 with version 3.0.0 no longer exists in Development." in output
+        assert "2 application version(s) in the manifest could not be validated." in output
+        assert server.max_in_flight > 1
+        # App 1 was confirmed (and cached) by the first validation
+        server.requests.clear()
+        validate_app_versions(context, app_data_list[:1])
+        assert _sent(server) == []
+
+
+def test_specific_tags_source_keeps_every_matching_version(tmp_path, monkeypatch):
+    # The deployment manifest is stored in the artifacts folder of the working directory
+    monkeypatch.chdir(tmp_path)
+    versions = [{"ApplicationKey": "app1", "Key": "v1-b", "Version": "1.0.1"}, {"ApplicationKey": "app1", "Key": "v1-a", "Version": "1.0.0"},
+                {"ApplicationKey": "app1", "Key": "v1-c", "Version": "1.0.1"}]
+    routes = {
+        "GET {}/applications".format(LT): (200, [{"Key": "app1", "Name": "App 1"}]),
+        "GET {}/applications/app1/versions".format(LT): (200, versions),
+    }
+    with LifeTimeStubServer(routes) as server:
+        context = DeploymentContext(str(tmp_path), server.lt_api, "token", 2, "Development", "env-dev")
+        app_data_list = SpecificTagsSource([{"app_name": " App 1 ", "app_version": "1.0.1"}]).get_app_data_list(context)
+        assert [app["VersionKey"] for app in app_data_list] == ["v1-b", "v1-c"]
+        with pytest.raises(SystemExit):
+            SpecificTagsSource([{"app_name": "App 1", "app_version": "2.0.0"}]).get_app_data_list(context)
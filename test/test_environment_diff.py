@@ -0,0 +1,59 @@
+import pytest
+
+from outsystems.pipeline.environment_diff import check_if_can_deploy
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+ENV_KEY = "env-qa"
+
+
+def _status_in_qa(version_key: str):
+    return [{"EnvironmentKey": ENV_KEY, "BaseApplicationVersionKey": version_key, "DeploymentZoneKey": "", "IsModified": False}]
+
+
+def _lifetime_routes():
+    applications = [
+        # app0 is not deployed in QA
+        {"Key": "app0", "Name": "App 0", "AppStatusInEnvs": []},
+        # app1 already runs the same version
+        {"Key": "app1", "Name": "App 1", "AppStatusInEnvs": _status_in_qa("v1-new")},
+        # app2 runs an older tag
+        {"Key": "app2", "Name": "App 2", "AppStatusInEnvs": _status_in_qa("v2-old")},
+        # app3 runs a newer tag
+        {"Key": "app3", "Name": "App 3", "AppStatusInEnvs": _status_in_qa("v3-newer")},
+    ]
+    routes = {
+        "GET {}/applications".format(LT): (200, applications),
+        "GET {}/environments".format(LT): (200, [{"Key": ENV_KEY, "Name": "QA", "HostName": "qa.example.com"}]),
+        "GET {}/applications/app2/versions/v2-old".format(LT): (200, {"Key": "v2-old", "Version": "1.0.1"}),
+        "GET {}/applications/app3/versions/v3-newer".format(LT): (200, {"Key": "v3-newer", "Version": "2.0.0"}),
+    }
+    return routes
+
+
+def _app(i: int, version_key: str, version: str):
+    return {"Name": "App {}".format(i), "Key": "app{}".format(i), "VersionKey": version_key, "Version": version}
+
+
+def test_check_if_can_deploy_keeps_app_order(tmp_path, capsys):
+    app_data_list = [_app(2, "v2-new", "1.0.2"), _app(0, "v0-new", "1.0.0"), _app(1, "v1-new", "1.0.0")]
+    with LifeTimeStubServer(_lifetime_routes(), delay=0.05) as server:
+        app_keys = check_if_can_deploy(str(tmp_path), server.lt_api, 2, "token", ENV_KEY, "QA", app_data_list)
+    assert app_keys == [{"ApplicationVersionKey": "v2-new", "DeploymentZoneKey": ""},
+                        {"ApplicationVersionKey": "v0-new", "DeploymentZoneKey": ""}]
+    # A single bulk call replaces the per-app environment lookups
+    assert len([r for r in server.requests if "/environments/" in r]) == 0
+    output = capsys.readouterr().out.splitlines()
+    assert output[0] == "Adding application App 2 with version 1.0.2, to be deployed in QA environment."
+    assert output[1] == "App App 0 with version 1.0.0 does not exist in QA environment. Ignoring check and deploying it."
+    assert output[2].startswith("Skipping application App 1 with version 1.0.0")
+
+
+def test_check_if_can_deploy_stale_manifest(tmp_path):
+    app_data_list = [_app(3, "v3-new", "1.5.0")]
+    with LifeTimeStubServer(_lifetime_routes()) as server:
+        with pytest.raises(SystemExit):
+            check_if_can_deploy(str(tmp_path), server.lt_api, 2, "token", ENV_KEY, "QA", app_data_list)
+        # Trigger manifest deployments are allowed to deploy a lower tag
+        app_keys = check_if_can_deploy(str(tmp_path), server.lt_api, 1, "token", ENV_KEY, "QA", app_data_list, abort_on_stale_manifest=False)
+    assert app_keys == ["v3-new"]
@@ -0,0 +1,42 @@
+import os
+import time
+
+from outsystems.file_helpers.download_limits import BandwidthLimiter
+from outsystems.pipeline.deploy_apps_to_target_env_with_airgap import export_apps_oap, generate_oap_list
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+
+
+def test_export_apps_oap_runs_concurrently_and_keeps_filenames(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("OAP_EXPORT_MAX_WORKERS", "3")
+    monkeypatch.setenv("OAP_RECORD_SHA256", "True")
+    app_data_list = [{"Name": "App {}".format(i), "Key": "app{}".format(i), "VersionKey": "v{}".format(i), "Version": "1.0.{}".format(i)}
+                     for i in range(6)]
+    app_oap_list = generate_oap_list(app_data_list, True)
+    with LifeTimeStubServer(delay=0.1) as server:
+        for i in range(6):
+            server.routes["GET {}/applications/app{}/versions/v{}/content".format(LT, i, i)] = (200, {"url": "{}/oap/{}".format(server.url, i)})
+            server.routes["GET /oap/{}".format(i)] = (200, "package {}".format(i).encode())
+        start = time.monotonic()
+        export_apps_oap(str(tmp_path), server.lt_api, "token", "env", app_oap_list)
+        elapsed = time.monotonic() - start
+        assert server.max_in_flight <= 3
+    # 12 requests of 0.1s, 3 at a time
+    assert elapsed < 1.0
+    for i, app in enumerate(app_oap_list):
+        assert app["filename"] == "App_{}_v1_0_{}.oap".format(i, i)
+        with open(os.path.join(str(tmp_path), "application_oap", app["filename"]), "rb") as f:
+            assert f.read() == "package {}".format(i).encode()
+        assert len(app["sha256"]) == 64
+    assert "[6/6]" in capsys.readouterr().out
+
+
+def test_bandwidth_limiter_throttles():
+    limiter = BandwidthLimiter(100 * 1024)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.consume(100 * 1024)
+    # The first second worth of bytes is a burst, the other two have to wait
+    assert time.monotonic() - start >= 1.5
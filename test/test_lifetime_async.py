@@ -0,0 +1,60 @@
+import asyncio
+import time
+from functools import partial
+
+import pytest
+
+from outsystems.lifetime.lifetime_async import async_send_get_request, async_send_post_request, gather_bounded, run_concurrently
+from outsystems.lifetime.lifetime_base import send_get_request
+from test.lifetime_stub import LifeTimeStubServer
+
+
+def _app_route(handler):
+    return 200, {"Key": handler.path.split("?")[0].rsplit("/", 1)[-1]}
+
+
+def _app_routes(count: int):
+    return {"GET /lifetimeapi/rest/v2/applications/app{}".format(i): _app_route for i in range(count)}
+
+
+def test_async_send_requests():
+    routes = {"GET /lifetimeapi/rest/v2/environments": (200, [{"Key": "env1"}]),
+              "POST /lifetimeapi/rest/v2/deployments": (201, "dep-key")}
+    with LifeTimeStubServer(routes) as server:
+        async def scenario():
+            return await asyncio.gather(async_send_get_request(server.lt_api, "token", "environments", None),
+                                        async_send_post_request(server.lt_api, "token", "deployments", "{}"))
+        get_response, post_response = asyncio.run(scenario())
+    assert (get_response["http_status"], get_response["response"]) == (200, [{"Key": "env1"}])
+    assert post_response == {"http_status": 201, "response": "dep-key"}
+
+
+def test_run_concurrently_respects_bound_and_keeps_order():
+    with LifeTimeStubServer(_app_routes(12), delay=0.1) as server:
+        calls = [partial(send_get_request, server.lt_api, "token", "applications/app{}".format(i), None) for i in range(12)]
+        start = time.monotonic()
+        responses = run_concurrently(calls, max_concurrency=4)
+        elapsed = time.monotonic() - start
+    assert [r["response"]["Key"] for r in responses] == ["app{}".format(i) for i in range(12)]
+    assert server.max_in_flight <= 4
+    # 12 calls of 0.1s in batches of 4 -> roughly 0.3s, far below the 1.2s of a sequential run
+    assert elapsed < 1.0
+
+
+def test_gather_bounded_mixes_coroutines_and_blocking_calls():
+    with LifeTimeStubServer(_app_routes(2)) as server:
+        calls = [partial(async_send_get_request, server.lt_api, "token", "applications/app0", None),
+                 partial(send_get_request, server.lt_api, "token", "applications/app1", None)]
+        responses = asyncio.run(gather_bounded(calls, max_concurrency=2))
+    assert [r["response"]["Key"] for r in responses] == ["app0", "app1"]
+
+
+def test_run_concurrently_propagates_or_returns_exceptions():
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        run_concurrently([fail, lambda: 1])
+    results = run_concurrently([fail, lambda: 1], return_exceptions=True)
+    assert isinstance(results[0], ValueError) and results[1] == 1
+    assert run_concurrently([]) == []
@@ -0,0 +1,33 @@
+from outsystems.lifetime.lifetime_base import LifeTimeClient, get_lifetime_client, send_get_request
+from test.lifetime_stub import LifeTimeStubServer
+
+
+def test_client_reuses_connections():
+    client = LifeTimeClient(pool_connections=1, pool_maxsize=1)
+    with LifeTimeStubServer({"GET /ping": (200, {})}) as server:
+        for _ in range(5):
+            assert client.get("{}/ping".format(server.url)).status_code == 200
+    client.close()
+    assert client.get_stats() == {"requests_sent": 5, "connections_opened": 1}
+
+
+def test_client_without_keep_alive_opens_one_connection_per_request():
+    client = LifeTimeClient(pool_connections=1, pool_maxsize=1, keep_alive=False)
+    with LifeTimeStubServer({"GET /ping": (200, {})}) as server:
+        for _ in range(3):
+            client.get("{}/ping".format(server.url))
+    client.close()
+    assert client.get_stats() == {"requests_sent": 3, "connections_opened": 3}
+
+
+def test_send_get_request_uses_shared_client():
+    routes = {"GET /lifetimeapi/rest/v2/applications": (200, [{"Key": "k1"}]),
+              "GET /lifetimeapi/rest/v2/environments": (200, [])}
+    with LifeTimeStubServer(routes) as server:
+        before = get_lifetime_client().get_stats()
+        response = send_get_request(server.lt_api, "token", "applications", None)
+        send_get_request(server.lt_api, "token", "environments", None)
+        after = get_lifetime_client().get_stats()
+    assert (response["http_status"], response["response"]) == (200, [{"Key": "k1"}])
+    assert after["requests_sent"] - before["requests_sent"] == 2
+    assert after["connections_opened"] - before["connections_opened"] == 1
@@ -0,0 +1,137 @@
+import datetime
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from outsystems.exceptions.deployment_timeout import DeploymentTimeoutError
+from outsystems.lifetime import lifetime_deployments
+from outsystems.lifetime.lifetime_deployments import DeploymentWatcher, get_running_deployment, get_saved_deployment
+from test.lifetime_stub import LifeTimeStubServer
+
+STATUS_ROUTE = "GET /lifetimeapi/rest/v2/deployments/plan1/status"
+
+
+# CreatedOn of a deployment created some hours ago, as returned by LifeTime
+def _created_on(hours_ago: int):
+    return (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# Fake clock: sleeping only moves the monotonic time forward
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, secs: float):
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(lifetime_deployments, "time", fake)
+    return fake
+
+
+def _status_sequence(statuses: list):
+    def route(handler):
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        return 200, {"DeploymentStatus": status, "Info": ""}
+    return route
+
+
+def test_watcher_backs_off_and_polls_fast_after_a_transition(tmp_path, fake_time):
+    statuses = ["running"] * 6 + ["needs_user_intervention", "running", "finished_successful"]
+    transitions = []
+    with LifeTimeStubServer({STATUS_ROUTE: _status_sequence(statuses)}) as server:
+        watcher = DeploymentWatcher(str(tmp_path), server.lt_api, "token", "plan1", timeout=3600,
+                                    on_transition=lambda old, new, dep_status: transitions.append((old, new)))
+        assert watcher.wait_while_running()["DeploymentStatus"] == "needs_user_intervention"
+        # The first poll is immediate, then the interval grows up to SLEEP_PERIOD_IN_SECS (jitter only shortens it)
+        assert len(fake_time.sleeps) == 6
+        for sleep, interval in zip(fake_time.sleeps, [2, 4, 8, 16, 20, 20]):
+            assert interval * 0.8 <= sleep <= interval
+        assert watcher.wait_while_running()["DeploymentStatus"] == "finished_successful"
+    # Back to the fast interval after the status changed
+    assert fake_time.sleeps[6] <= 2 and fake_time.sleeps[7] <= 4
+    assert transitions == [(None, "running"), ("running", "needs_user_intervention"),
+                           ("needs_user_intervention", "running"), ("running", "finished_successful")]
+
+
+def test_watcher_timeout_uses_the_deadline(tmp_path, fake_time):
+    with LifeTimeStubServer({STATUS_ROUTE: (200, {"DeploymentStatus": "running", "Info": ""})}) as server:
+        watcher = DeploymentWatcher(str(tmp_path), server.lt_api, "token", "plan1", timeout=30)
+        with pytest.raises(DeploymentTimeoutError):
+            watcher.wait_while_running()
+    # The last wait is cut short so the deadline is not overshot
+    assert fake_time.now == pytest.approx(30)
+
+
+def test_running_deployment_only_polls_non_terminal_plans_and_advances_min_date(tmp_path):
+    deployments = [
+        {"Key": "dep3", "TargetEnvironmentKey": "qa", "CreatedOn": _created_on(1)},
+        {"Key": "dep2", "TargetEnvironmentKey": "prd", "CreatedOn": _created_on(2)},
+        {"Key": "dep1", "TargetEnvironmentKey": "qa", "CreatedOn": _created_on(3)}]
+    statuses = {"dep1": "finished_successful", "dep3": "running"}
+    min_dates = []
+
+    def list_deployments(handler):
+        min_date = parse_qs(urlsplit(handler.path).query)["MinDate"][0]
+        min_dates.append(min_date)
+        listed = [dep for dep in deployments if "T" not in min_date or dep["CreatedOn"] >= min_date]
+        return 200, listed
+
+    def deployment_status(key):
+        return lambda handler: (200, {"DeploymentStatus": statuses[key], "Info": ""})
+
+    routes = {"GET /lifetimeapi/rest/v2/deployments": list_deployments}
+    routes.update({"GET /lifetimeapi/rest/v2/deployments/{}/status".format(key): deployment_status(key) for key in statuses})
+    with LifeTimeStubServer(routes) as server:
+        assert [dep["Key"] for dep in get_running_deployment(str(tmp_path), server.lt_api, "token", "qa")] == ["dep3"]
+        statuses["dep3"] = "finished_with_errors"
+        assert get_running_deployment(str(tmp_path), server.lt_api, "token", "qa") == []
+        assert get_running_deployment(str(tmp_path), server.lt_api, "token", "qa") == []
+        status_requests = [request for request in server.requests if request.endswith("/status")]
+    # The finished plans were checked once, the window starts at the newest known plan after the first listing
+    assert sorted(status_requests) == ["GET /lifetimeapi/rest/v2/deployments/dep1/status"] + \
+        ["GET /lifetimeapi/rest/v2/deployments/dep3/status"] * 2
+    assert min_dates[1:] == [deployments[0]["CreatedOn"]] * 2
+
+
+def test_saved_deployment_skips_deleted_plans(tmp_path):
+    deployments = [
+        {"Key": "dep5", "TargetEnvironmentKey": "qa", "CreatedOn": _created_on(1)},
+        {"Key": "dep4", "TargetEnvironmentKey": "qa", "CreatedOn": _created_on(2)}]
+    routes = {
+        "GET /lifetimeapi/rest/v2/deployments": (200, deployments),
+        # dep5 was deleted after being listed
+        "GET /lifetimeapi/rest/v2/deployments/dep5/status": (404, "Deployment not found"),
+        "GET /lifetimeapi/rest/v2/deployments/dep4/status": (200, {"DeploymentStatus": "saved", "Info": ""}),
+    }
+    with LifeTimeStubServer(routes) as server:
+        assert get_saved_deployment(str(tmp_path), server.lt_api, "token", "qa")["Key"] == "dep4"
+
+
+def test_deployments_leave_the_window_after_24h(tmp_path, monkeypatch):
+    listings = [[{"Key": "dep6", "TargetEnvironmentKey": "qa", "CreatedOn": _created_on(1)}]]
+    routes = {
+        # Listed once: the following listings have nothing new
+        "GET /lifetimeapi/rest/v2/deployments": lambda handler: (200, listings.pop()) if listings else (204, None),
+        "GET /lifetimeapi/rest/v2/deployments/dep6/status": (200, {"DeploymentStatus": "saved", "Info": ""}),
+    }
+
+    class TwoDaysLater(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.now(tz) + datetime.timedelta(days=2)
+
+    with LifeTimeStubServer(routes) as server:
+        assert get_saved_deployment(str(tmp_path), server.lt_api, "token", "qa")["Key"] == "dep6"
+        # A long-running process (e.g. the pipeline daemon) no longer sees the old plan
+        monkeypatch.setattr(lifetime_deployments, "datetime", SimpleNamespace(datetime=TwoDaysLater, timedelta=datetime.timedelta, date=datetime.date))
+        assert get_saved_deployment(str(tmp_path), server.lt_api, "token", "qa") is None
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from outsystems.exceptions.app_does_not_exist import AppDoesNotExistError
+from outsystems.file_helpers.file import store_data
+from outsystems.lifetime.lifetime_applications import _find_application_key, _find_application_name
+from outsystems.lifetime.lifetime_environments import _find_environment_url
+from outsystems.lifetime.lifetime_lookup import LookupIndex, invalidate_lookup_index
+from outsystems.vars.file_vars import APPLICATIONS_FILE, ENVIRONMENTS_FILE
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+
+
+def test_lookup_index_keeps_first_match():
+    index = LookupIndex([{"Name": "App", "Key": "k1"}, {"Name": "App", "Key": "k2"}])
+    assert index.get_key("App") == "k1"
+    assert index.get_name("k2") == "App"
+    assert index.get_key("Missing") is None
+
+
+def test_lookups_use_cache_then_refresh_on_miss(tmp_path):
+    artifact_dir = str(tmp_path)
+    invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+    store_data(artifact_dir, APPLICATIONS_FILE, [{"Name": "Old App", "Key": "old"}])
+    routes = {"GET {}/applications".format(LT): (200, [{"Name": "New App", "Key": "new"}])}
+    with LifeTimeStubServer(routes) as server:
+        # Hit from the cache file, no LifeTime call
+        assert _find_application_key(artifact_dir, server.lt_api, "token", "Old App") == "old"
+        assert server.requests == []
+        # Miss on the cached list: refreshed once from LifeTime
+        assert _find_application_name(artifact_dir, server.lt_api, "token", "new") == "New App"
+        assert len(server.requests) == 1
+        # Miss on the refreshed list: the app does not exist, and the miss is remembered
+        for _ in range(3):
+            with pytest.raises(AppDoesNotExistError):
+                _find_application_key(artifact_dir, server.lt_api, "token", "Old App")
+        assert len(server.requests) == 2
+    invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+
+
+def test_remembered_miss_expires_while_queried(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("LOOKUP_NEGATIVE_CACHE_TTL_IN_SECS", "1")
+    artifact_dir = str(tmp_path)
+    invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+    store_data(artifact_dir, APPLICATIONS_FILE, [{"Name": "Old App", "Key": "old"}])
+    routes = {"GET {}/applications".format(LT): (200, [{"Name": "New App", "Key": "new"}])}
+    with LifeTimeStubServer(routes) as server:
+        # Querying the missing app over and over does not keep the miss alive past its TTL
+        deadline = time.monotonic() + 1.5
+        while time.monotonic() < deadline:
+            with pytest.raises(AppDoesNotExistError):
+                _find_application_key(artifact_dir, server.lt_api, "token", "Missing App")
+            time.sleep(0.1)
+        assert len(server.requests) == 2
+    invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+
+
+def test_concurrent_misses_share_one_refresh(tmp_path):
+    artifact_dir = str(tmp_path)
+    invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+    store_data(artifact_dir, APPLICATIONS_FILE, [{"Name": "Old App", "Key": "old"}])
+    routes = {"GET {}/applications".format(LT): (200, [{"Name": "New App", "Key": "new"}])}
+    with LifeTimeStubServer(routes, delay=0.2) as server:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            keys = list(executor.map(lambda _: _find_application_key(artifact_dir, server.lt_api, "token", "New App"), range(8)))
+        assert keys == ["new"] * 8
+        assert len(server.requests) == 1
+    invalidate_lookup_index(artifact_dir, APPLICATIONS_FILE)
+
+
+def test_environment_url_lookup(tmp_path):
+    artifact_dir = str(tmp_path)
+    invalidate_lookup_index(artifact_dir, ENVIRONMENTS_FILE)
+    store_data(artifact_dir, ENVIRONMENTS_FILE, [{"Name": "QA", "Key": "qa", "HostName": "qa.example.com"}])
+    assert _find_environment_url(artifact_dir, "http://unused", "token", "QA") == "qa.example.com"
+    invalidate_lookup_index(artifact_dir, ENVIRONMENTS_FILE)
@@ -0,0 +1,19 @@
+from outsystems.lifetime.lifetime_snapshot import EnvironmentSnapshot
+
+APPLICATIONS = [
+    {"Key": "app1", "Name": "App 1", "AppStatusInEnvs": [
+        {"EnvironmentKey": "dev", "BaseApplicationVersionKey": "v1-dev", "IsModified": True},
+        {"EnvironmentKey": "qa", "BaseApplicationVersionKey": "v1-qa", "IsModified": False}]},
+    {"Key": "app2", "Name": "App 2"},
+]
+
+
+def test_snapshot_lookups():
+    snapshot = EnvironmentSnapshot(APPLICATIONS)
+    assert snapshot.get_application_key("App 1") == "app1"
+    assert snapshot.get_application_key("Missing") is None
+    assert snapshot.get_application("app2")["Name"] == "App 2"
+    assert snapshot.get_running_version_key("app1", "qa") == "v1-qa"
+    assert snapshot.get_app_status("app1", "dev")["IsModified"] is True
+    assert snapshot.get_running_version_key("app1", "prd") is None
+    assert snapshot.get_running_version_key("app2", "dev") is None
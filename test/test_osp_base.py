@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+
+import pytest
+
+from outsystems.exceptions.osptool_error import OSPToolDeploymentError
+from outsystems.exceptions.osptool_timeout import OSPToolTimeoutError
+from outsystems.file_helpers.file import load_data
+from outsystems.osp_tool.osp_base import _OSPToolTiming, call_osptool
+
+FAKE_OSP_TOOL = """
+import sys, time
+print("Uploading " + sys.argv[1], flush=True)
+print("Compiling...", flush=True)
+time.sleep(float(sys.argv[3]))
+print("Deploying...", flush=True)
+sys.exit(int(sys.argv[4]))
+"""
+
+
+@pytest.fixture
+def osp_tool(tmp_path):
+    script = tmp_path / "osptool.py"
+    script.write_text(FAKE_OSP_TOOL)
+    return "{} {}".format(sys.executable, script)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake tool command line is POSIX")
+def test_streams_output_and_records_timing(tmp_path, osp_tool, capsys):
+    package = str(tmp_path / "App.oap")
+    log_file = str(tmp_path / "logs" / "App.oap.log")
+    call_osptool(osp_tool, package, "env", "0.2 0", log_file, time.monotonic() - 1)
+    assert "[App.oap] Compiling..." in capsys.readouterr().out
+    with open(log_file) as f:
+        assert "Deploying..." in f.read()
+    timing = load_data(str(tmp_path), "App.oap.timing.cache")
+    assert timing["ReturnCode"] == 0 and timing["QueueSecs"] >= 1
+    assert timing["CompileSecs"] >= 0.2 and timing["PublishSecs"] is not None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="fake tool command line is POSIX")
+def test_failure_and_timeout(tmp_path, osp_tool, monkeypatch):
+    package = str(tmp_path / "App.oap")
+    with pytest.raises(OSPToolDeploymentError):
+        call_osptool(osp_tool, package, "env", "0 3")
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("OSP_TOOL_TIMEOUT_IN_SECS", "1")
+    start = time.monotonic()
+    with pytest.raises(OSPToolTimeoutError):
+        call_osptool(osp_tool, package, "env", "30 0")
+    assert time.monotonic() - start < 10
+    assert load_data(str(tmp_path), "App.oap.timing.cache")["TimedOut"] is True
+
+
+def test_markers_overridden_as_text(monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("OSP_TOOL_COMPILE_MARKERS", "Building")
+    monkeypatch.setenv("OSP_TOOL_PUBLISH_MARKERS", "Activating, Going live")
+    timing = _OSPToolTiming(None)
+    # Not a marker, even if it shares letters with them
+    timing.on_output("Uploading App.oap")
+    assert timing._compile_started is None
+    timing.on_output("Building...")
+    timing.on_output("Going live...")
+    assert timing._compile_started is not None and timing._publish_started is not None
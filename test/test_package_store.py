@@ -0,0 +1,86 @@
+import os
+import time
+
+from outsystems.file_helpers.package_store import PackageStore, get_package_store
+from outsystems.lifetime.lifetime_applications import export_app_oap
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+
+
+def _write(path, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def test_get_links_stored_package(tmp_path):
+    store = PackageStore(str(tmp_path / "store"), 1024 * 1024)
+    _write(str(tmp_path / "a.oap"), b"package")
+    store.put("vkey1", str(tmp_path / "a.oap"), "sha")
+    assert store.get("vkey1", str(tmp_path / "out" / "b.oap")) == "sha"
+    with open(str(tmp_path / "out" / "b.oap"), "rb") as f:
+        assert f.read() == b"package"
+    assert store.get("missing", str(tmp_path / "c.oap")) is None
+
+
+def test_get_misses_package_evicted_meanwhile(tmp_path):
+    store = PackageStore(str(tmp_path / "store"), 1024 * 1024)
+    _write(str(tmp_path / "a.oap"), b"package")
+    store.put("vkey1", str(tmp_path / "a.oap"), "sha")
+    # Another pipeline removed the package, but not yet its checksum
+    os.remove(store._package_path("vkey1"))
+    assert store.get("vkey1", str(tmp_path / "b.oap")) is None
+
+
+def test_gc_evicts_least_recently_used(tmp_path):
+    store = PackageStore(str(tmp_path / "store"), 250)
+    for i in range(3):
+        _write(str(tmp_path / "p{}.oap".format(i)), b"x" * 100)
+        store.put("vkey{}".format(i), str(tmp_path / "p{}.oap".format(i)), "sha{}".format(i))
+        time.sleep(0.05)
+    # vkey0 was evicted when vkey2 was added
+    assert store.get("vkey0", str(tmp_path / "out.oap")) is None
+    # Using vkey1 makes vkey2 the least recently used
+    time.sleep(0.05)
+    assert store.get("vkey1", str(tmp_path / "out.oap")) == "sha1"
+    evicted, freed = store.gc(100)
+    assert evicted == ["vkey2"] and freed == 100
+    assert store.get_size() == 100
+
+
+def test_gc_keeps_temp_files_being_written(tmp_path):
+    store = PackageStore(str(tmp_path / "store"), 1024)
+    os.makedirs(str(tmp_path / "store" / "vk"))
+    fresh, stale = str(tmp_path / "store" / "vk" / "vkey1.1.2.tmp"), str(tmp_path / "store" / "vk" / "vkey2.1.2.tmp")
+    _write(fresh, b"x" * 10)
+    _write(stale, b"x" * 10)
+    # Left behind by an interrupted write, long ago
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+    assert store.gc() == ([], 10)
+    assert os.path.isfile(fresh) and not os.path.exists(stale)
+
+
+def test_get_package_store_is_shared_per_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("PACKAGE_STORE_ENABLED", "True")
+    monkeypatch.setenv("PACKAGE_STORE_DIR", str(tmp_path / "store1"))
+    store = get_package_store()
+    assert get_package_store() is store
+    monkeypatch.setenv("PACKAGE_STORE_MAX_SIZE_IN_MB", "2")
+    assert get_package_store() is store and store.max_size_bytes == 2 * 1024 * 1024
+    monkeypatch.setenv("PACKAGE_STORE_DIR", str(tmp_path / "store2"))
+    assert get_package_store() is not store
+
+
+def test_export_app_oap_uses_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("OVERRIDE_CONFIG_IN_USE", "True")
+    monkeypatch.setenv("PACKAGE_STORE_ENABLED", "True")
+    monkeypatch.setenv("PACKAGE_STORE_DIR", str(tmp_path / "store"))
+    with LifeTimeStubServer() as server:
+        server.routes["GET {}/applications/app1/versions/v1/content".format(LT)] = (200, {"url": "{}/oap".format(server.url)})
+        server.routes["GET /oap"] = (200, b"package")
+        first = export_app_oap(str(tmp_path / "run1" / "app.oap"), server.lt_api, "token", "env", "app1", "v1")
+        second = export_app_oap(str(tmp_path / "run2" / "app.oap"), server.lt_api, "token", "env", "app1", "v1")
+        assert len(server.requests) == 2
+    assert first == second
+    assert os.path.isfile(str(tmp_path / "run2" / "app.oap"))
@@ -0,0 +1,61 @@
+import json
+
+from outsystems.lifetime.lifetime_snapshot import get_environment_snapshot
+from outsystems.pipeline.tag_modified_apps import get_tagging_plan, apply_tagging_plan
+from test.lifetime_stub import LifeTimeStubServer
+
+LT = "/lifetimeapi/rest/v2"
+ENV_KEY = "env-dev"
+
+
+def _status_in_dev(version_key: str, is_modified: bool, mobile_apps: list = None):
+    return [{"EnvironmentKey": ENV_KEY, "BaseApplicationVersionKey": version_key, "IsModified": is_modified, "MobileAppsStatus": mobile_apps or []}]
+
+
+def _lifetime_routes(tags: dict):
+    android = {"NativePlatform": "Android", "VersionNumber": "1.0", "IsModified": True}
+    applications = [
+        # app1 runs 1.0.3, while 1.0.4 was already taken
+        {"Key": "app1", "Name": "App 1", "AppStatusInEnvs": _status_in_dev("v1-3", True, [android])},
+        # app2 runs an old version, not in the last tags
+        {"Key": "app2", "Name": "App 2", "AppStatusInEnvs": _status_in_dev("v2-1", True)},
+        # app3 is not modified
+        {"Key": "app3", "Name": "App 3", "AppStatusInEnvs": _status_in_dev("v3-1", False)},
+    ]
+
+    def create_tag(app_key: str):
+        def route(handler):
+            tags[app_key] = json.loads(handler.body)
+            return 201, "new-version"
+        return route
+
+    return {
+        "GET {}/applications".format(LT): (200, applications),
+        "GET {}/applications/app1/versions".format(LT): (200, [{"Key": "v1-4", "Version": "1.0.4"}, {"Key": "v1-3", "Version": "1.0.3"}]),
+        "GET {}/applications/app2/versions".format(LT): (200, [{"Key": "v2-9", "Version": "2.0.9"}]),
+        "GET {}/applications/app2/versions/v2-1".format(LT): (200, {"Key": "v2-1", "Version": "2.0.1"}),
+        "POST {}/environments/{}/applications/app1/versions".format(LT, ENV_KEY): create_tag("app1"),
+        "POST {}/environments/{}/applications/app2/versions".format(LT, ENV_KEY): create_tag("app2"),
+    }
+
+
+def test_tagging_plan_picks_the_next_free_tag(tmp_path):
+    tags = {}
+    with LifeTimeStubServer(_lifetime_routes(tags), delay=0.05) as server:
+        snapshot = get_environment_snapshot(str(tmp_path), server.lt_api, "token")
+        tagging_plan = get_tagging_plan(str(tmp_path), server.lt_api, "token", ENV_KEY, snapshot, ["App 1", "App 2", "App 3"], "Tagged")
+        assert [(app_tag["ApplicationName"], app_tag["Version"]) for app_tag in tagging_plan] == [("App 1", "1.0.5"), ("App 2", "2.0.2")]
+        assert apply_tagging_plan(server.lt_api, "token", ENV_KEY, "Development", tagging_plan, "Tagged") == 0
+        # The version histories and the new tags are requested concurrently
+        assert server.max_in_flight == 2
+    assert tags["app1"] == {"ChangeLog": "Tagged", "Version": "1.0.5",
+                            "MobileVersions": [{"NativePlatform": "Android", "VersionNumber": "1.0.1", "VersionDescription": "Tagged"}]}
+    assert tags["app2"]["Version"] == "2.0.2"
+
+
+def test_apply_tagging_plan_reports_failures(tmp_path, capsys):
+    routes = {"POST {}/environments/{}/applications/app1/versions".format(LT, ENV_KEY): (500, "Failed")}
+    tagging_plan = [{"ApplicationName": "App 1", "ApplicationKey": "app1", "Version": "1.0.5", "MobileVersions": []}]
+    with LifeTimeStubServer(routes) as server:
+        assert apply_tagging_plan(server.lt_api, "token", ENV_KEY, "Development", tagging_plan, "Tagged") == 1
+    assert "Failed to tag Application 'App 1' to version 1.0.5" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+import pytest
+from hypothesis import given, strategies as st
+
+from outsystems.versioning.versioning_base import parse_version_tag, compare_versions, get_next_version, \
+    sort_version_history, find_next_free_version
+
+version_parts = st.lists(st.integers(min_value=0, max_value=30), min_size=1, max_size=5)
+version_tags = version_parts.map(lambda parts: ".".join(str(part) for part in parts))
+
+
+# Reference ordering: versions padded with zeros to the same length
+def _padded(version: str, length: int = 6):
+    parts = [int(part) for part in version.split(".")]
+    return parts + [0] * (length - len(parts))
+
+
+@given(version_tags, version_tags)
+def test_compare_versions_matches_zero_padded_order(version_a, version_b):
+    expected = (_padded(version_a) > _padded(version_b)) - (_padded(version_a) < _padded(version_b))
+    assert compare_versions(version_a, version_b) == expected
+    assert compare_versions(version_b, version_a) == -expected
+
+
+@given(version_tags, st.integers(min_value=1, max_value=3))
+def test_trailing_zeros_do_not_matter(version, zeros):
+    assert parse_version_tag(version + ".0" * zeros) == parse_version_tag(version)
+
+
+@given(version_tags, st.lists(version_tags), st.integers(min_value=1, max_value=10))
+def test_find_next_free_version_matches_linear_search(base_version, history, max_tries):
+    expected = None
+    candidate = get_next_version(base_version)
+    for _ in range(max_tries):
+        if all(compare_versions(candidate, version) != 0 for version in history):
+            expected = candidate
+            break
+        candidate = get_next_version(candidate)
+    assert find_next_free_version(base_version, sort_version_history(history), max_tries) == expected
+
+
+def test_next_version():
+    assert get_next_version("2") == "2.0.1"
+    assert get_next_version("2.3") == "2.3.1"
+    assert get_next_version("2.3.9") == "2.3.10"
+    assert get_next_version("2.3.4.5") == "2.3.5"
+    # Taken tags are skipped, 2.3.10 is taken as well since it's the same as 2.3.10.0
+    assert find_next_free_version("2.3.8", sort_version_history(["2.3.9", "2.3.10.0", "1.0"]), 5) == "2.3.11"
+    assert find_next_free_version("2.3.8", sort_version_history(["2.3.9", "2.3.10"]), 2) is None
+
+
+def test_invalid_tags():
+    with pytest.raises(ValueError):
+        parse_version_tag("1.0.0-beta")
+
+
+def test_pipeline_scripts_do_not_load_pkg_resources():
+    code = ("import importlib, pkgutil, sys\n"
+            "import outsystems.pipeline\n"
+            "for module in pkgutil.iter_modules(outsystems.pipeline.__path__):\n"
+            "    importlib.import_module('outsystems.pipeline.' + module.name)\n"
+            "print('pkg_resources' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"